@@ -0,0 +1,2 @@
+# @author: adibarra (Alec Ibarra)
+# @description: init file for the server commands package
@@ -0,0 +1,137 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Benchmarks the hot database queries with and without prepared statements
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from psycopg import AsyncConnection
+
+from config import SERVICE_POSTGRES_URI, SESSION_LIFETIME
+from services.database.mixins.questions import SELECT_QUESTION
+from services.database.mixins.sessions import (
+    SELECT_LATEST_SESSION_BY_USER,
+    SELECT_SESSION_BY_TOKEN,
+)
+from services.database.mixins.statistics import SELECT_STATISTICS, UPDATE_STATISTICS
+
+
+async def measure(
+    conn: AsyncConnection, query: str, params: list, prepare: bool, rounds: int
+) -> list[float]:
+    """
+    Measures the latency of executing a query and fetching its results.
+
+    Args:
+        conn (AsyncConnection): The connection to run the query on.
+        query (str): The query to run.
+        params (list): The parameters to pass to the query.
+        prepare (bool): Whether to execute the query as a prepared statement.
+        rounds (int): The number of times to run the query.
+
+    Returns:
+        list[float]: The latency of every run in microseconds.
+    """
+
+    samples = []
+    async with conn.cursor() as cursor:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await cursor.execute(query, params, prepare=prepare)
+            if cursor.description:
+                await cursor.fetchall()
+            samples.append((time.perf_counter() - start) * 1_000_000)
+    return samples
+
+
+async def benchmark(rounds: int, warmup: int) -> None:
+    """
+    Runs every hot query unprepared and then prepared, each on a fresh connection, and prints the results.
+
+    Args:
+        rounds (int): The number of measured runs per query and mode.
+        warmup (int): The number of unmeasured runs per query and mode.
+    """
+
+    async with await AsyncConnection.connect(
+        SERVICE_POSTGRES_URI, autocommit=True
+    ) as conn:
+        user = await (
+            await conn.execute(
+                "SELECT u.uuid, s.token FROM users u"
+                " LEFT JOIN sessions s ON s.user_uuid = u.uuid LIMIT 1"
+            )
+        ).fetchone()
+        question = await (
+            await conn.execute("SELECT id FROM questions LIMIT 1")
+        ).fetchone()
+
+    if not user:
+        raise SystemExit("The benchmark needs at least one user in the database")
+
+    user_uuid, token = user[0], user[1] or uuid.uuid4()
+    question_id = question[0] if question else 1
+    queries = {
+        "get_session (token)": (SELECT_SESSION_BY_TOKEN, [token, SESSION_LIFETIME]),
+        "get_session (user)": (
+            SELECT_LATEST_SESSION_BY_USER,
+            [user_uuid, SESSION_LIFETIME],
+        ),
+        "get_question": (SELECT_QUESTION, [question_id]),
+        "get_statistics": (SELECT_STATISTICS, [user_uuid]),
+        "update_statistics": (UPDATE_STATISTICS, [user_uuid, 0, 0, 0]),
+    }
+
+    print(f"{'query':<22}{'mode':<12}{'mean us':>10}{'p50 us':>10}{'p95 us':>10}")
+    for name, (query, params) in queries.items():
+        means = {}
+        for prepare in (False, True):
+            async with await AsyncConnection.connect(
+                SERVICE_POSTGRES_URI, autocommit=True
+            ) as conn:
+                await measure(conn, query, params, prepare, warmup)
+                samples = await measure(conn, query, params, prepare, rounds)
+
+            mode = "prepared" if prepare else "unprepared"
+            means[mode] = statistics.mean(samples)
+            p95 = statistics.quantiles(samples, n=20)[-1]
+            print(
+                f"{name:<22}{mode:<12}{means[mode]:>10.1f}"
+                f"{statistics.median(samples):>10.1f}{p95:>10.1f}"
+            )
+
+        saved = 1 - means["prepared"] / means["unprepared"]
+        print(f"{'':<22}{'saved':<12}{saved:>10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hot database queries with and without prepared statements."
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=2000,
+        help="measured runs per query and mode (default: 2000)",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=200,
+        help="unmeasured runs per query and mode (default: 200)",
+    )
+    parser.add_argument(
+        "--production",
+        "--prod",
+        action="store_true",
+        help="use the .env.production database",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.rounds, args.warmup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Compares the size and lookup speed of CHAR(36) and native UUID keys
+
+import argparse
+import asyncio
+import random
+import statistics
+import uuid
+
+from psycopg import AsyncConnection
+
+from commands.benchmark_statements import measure
+from config import SERVICE_POSTGRES_URI
+
+# the key types compared, with the value of each key as it is passed to the query
+KEY_TYPES = {"CHAR(36)": str, "UUID": lambda key: key}
+
+SCHEMA = """
+    CREATE TEMP TABLE Bench_Users (
+      uuid {type} NOT NULL,
+      username VARCHAR(16) NOT NULL,
+      PRIMARY KEY (uuid)
+    );
+    CREATE TEMP TABLE Bench_Sessions (
+      user_uuid {type} NOT NULL REFERENCES Bench_Users (uuid),
+      token {type} NOT NULL,
+      created_at TIMESTAMP DEFAULT now() NOT NULL,
+      PRIMARY KEY (token)
+    );
+    CREATE INDEX ON Bench_Sessions (user_uuid, created_at);
+"""
+
+
+async def run(conn: AsyncConnection, key_type: str, users: list, tokens: list, args):
+    """
+    Loads the sample users and sessions with keys of the given type, then prints their sizes and lookup latencies.
+
+    Args:
+        conn (AsyncConnection): The connection to run the benchmark on.
+        key_type (str): The column type of the keys, one of `KEY_TYPES`.
+        users (list): The sample user uuids.
+        tokens (list): The sample session tokens, one per user.
+        args: The parsed command line arguments.
+    """
+
+    key = KEY_TYPES[key_type]
+    await conn.execute("DROP TABLE IF EXISTS Bench_Sessions, Bench_Users")
+    await conn.execute(SCHEMA.format(type=key_type))
+    async with conn.cursor() as cursor:
+        async with cursor.copy("COPY Bench_Users (uuid, username) FROM STDIN") as copy:
+            for i, user in enumerate(users):
+                await copy.write_row((str(user), f"user{i}"))
+        async with cursor.copy(
+            "COPY Bench_Sessions (user_uuid, token) FROM STDIN"
+        ) as copy:
+            for user, token in zip(users, tokens):
+                await copy.write_row((str(user), str(token)))
+    await conn.execute("VACUUM ANALYZE Bench_Users")
+    await conn.execute("VACUUM ANALYZE Bench_Sessions")
+
+    for table in ("Bench_Users", "Bench_Sessions"):
+        sizes = await (
+            await conn.execute(
+                "SELECT pg_relation_size(%s), pg_indexes_size(%s)", [table, table]
+            )
+        ).fetchone()
+        print(
+            f"{key_type:<10}{table:<16}{'table KiB':<14}{sizes[0] / 1024:>10.0f}"
+            f"\n{key_type:<10}{table:<16}{'indexes KiB':<14}{sizes[1] / 1024:>10.0f}"
+        )
+
+    sample = random.sample(range(len(users)), args.batch)
+    queries = {
+        "user by uuid": (
+            "SELECT * FROM Bench_Users WHERE uuid = %s",
+            [key(users[sample[0]])],
+        ),
+        "session by token": (
+            "SELECT s.*, u.username FROM Bench_Sessions s"
+            " JOIN Bench_Users u ON u.uuid = s.user_uuid WHERE s.token = %s",
+            [key(tokens[sample[0]])],
+        ),
+        f"{args.batch} users by uuid": (
+            f"SELECT * FROM Bench_Users WHERE uuid = ANY(%s::{key_type}[])",
+            [[key(users[i]) for i in sample]],
+        ),
+    }
+    for name, (query, params) in queries.items():
+        await measure(conn, query, params, True, args.warmup)
+        samples = await measure(conn, query, params, True, args.rounds)
+        p95 = statistics.quantiles(samples, n=20)[-1]
+        print(
+            f"{key_type:<10}{name:<30}{statistics.mean(samples):>10.1f}"
+            f"{statistics.median(samples):>10.1f}{p95:>10.1f}"
+        )
+
+    await conn.execute("DROP TABLE Bench_Sessions, Bench_Users")
+
+
+async def benchmark(args) -> None:
+    """
+    Runs the benchmark for every key type on the same sample of keys.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    users = [uuid.uuid4() for _ in range(args.rows)]
+    tokens = [uuid.uuid4() for _ in range(args.rows)]
+
+    async with await AsyncConnection.connect(
+        SERVICE_POSTGRES_URI, autocommit=True
+    ) as conn:
+        print(f"{args.rows} users with one session each, latencies in us")
+        print(f"{'type':<10}{'query':<30}{'mean':>10}{'p50':>10}{'p95':>10}")
+        for key_type in KEY_TYPES:
+            await run(conn, key_type, users, tokens, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the size and lookup speed of CHAR(36) and native UUID keys."
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=100_000,
+        help="sample users and sessions to load (default: 100000)",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=1000,
+        help="users looked up at once by the batch query (default: 1000)",
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=2000,
+        help="measured runs per query and type (default: 2000)",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=200,
+        help="unmeasured runs per query and type (default: 200)",
+    )
+    parser.add_argument(
+        "--production",
+        "--prod",
+        action="store_true",
+        help="use the .env.production database",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Benchmarks argon2 on this host to pick parameters for a target verify latency
+
+import argparse
+import statistics
+import time
+
+from argon2 import PasswordHasher
+
+
+def measure(time_cost: int, memory_cost: int, parallelism: int, rounds: int) -> float:
+    """
+    Measures the median time it takes to verify a password with the given argon2 parameters.
+
+    Args:
+        time_cost (int): The number of argon2 iterations.
+        memory_cost (int): The argon2 memory usage in KiB.
+        parallelism (int): The number of argon2 lanes.
+        rounds (int): The number of verifications to take the median of.
+
+    Returns:
+        float: The median verify latency in milliseconds.
+    """
+
+    ph = PasswordHasher(
+        time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+    )
+    password_hash = ph.hash("calibration-password")
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        ph.verify(password_hash, "calibration-password")
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def calibrate(
+    target_ms: float,
+    memory_cost: int,
+    parallelism: int,
+    rounds: int,
+    max_time_cost: int,
+) -> tuple[int, int, float]:
+    """
+    Finds the argon2 parameters with the highest cost whose verify latency stays within the target.
+
+    The memory cost is halved until a single iteration fits the target, then iterations are added
+    for as long as the latency stays within the target.
+
+    Args:
+        target_ms (float): The target verify latency in milliseconds.
+        memory_cost (int): The starting argon2 memory usage in KiB.
+        parallelism (int): The number of argon2 lanes.
+        rounds (int): The number of verifications measured per candidate.
+        max_time_cost (int): The highest number of iterations to try.
+
+    Returns:
+        tuple[int, int, float]: The chosen time cost, memory cost and their measured latency in milliseconds.
+    """
+
+    min_memory_cost = 8 * parallelism
+    latency = measure(1, memory_cost, parallelism, rounds)
+    print(f"  t=1 m={memory_cost} KiB: {latency:.1f} ms", flush=True)
+    while latency > target_ms and memory_cost // 2 >= min_memory_cost:
+        memory_cost //= 2
+        latency = measure(1, memory_cost, parallelism, rounds)
+        print(f"  t=1 m={memory_cost} KiB: {latency:.1f} ms", flush=True)
+
+    time_cost = 1
+    while time_cost < max_time_cost:
+        candidate = measure(time_cost + 1, memory_cost, parallelism, rounds)
+        print(
+            f"  t={time_cost + 1} m={memory_cost} KiB: {candidate:.1f} ms", flush=True
+        )
+        if candidate > target_ms:
+            break
+        time_cost, latency = time_cost + 1, candidate
+
+    return time_cost, memory_cost, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark argon2 on this host and print parameters that hit a target verify latency."
+    )
+    parser.add_argument(
+        "--target-ms",
+        type=float,
+        default=250,
+        help="target password verify latency in milliseconds (default: 250)",
+    )
+    parser.add_argument(
+        "--memory-cost",
+        type=int,
+        default=65536,
+        help="starting argon2 memory usage in KiB (default: 65536)",
+    )
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=4,
+        help="number of argon2 lanes (default: 4)",
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=5,
+        help="verifications measured per candidate (default: 5)",
+    )
+    parser.add_argument(
+        "--max-time-cost",
+        type=int,
+        default=20,
+        help="highest number of argon2 iterations to try (default: 20)",
+    )
+    args = parser.parse_args()
+
+    print(f"Calibrating argon2 for a {args.target_ms:.0f} ms verify latency...")
+    time_cost, memory_cost, latency = calibrate(
+        args.target_ms,
+        args.memory_cost,
+        args.parallelism,
+        args.rounds,
+        args.max_time_cost,
+    )
+
+    if latency > args.target_ms:
+        print(f"Warning: even the cheapest parameters take {latency:.1f} ms")
+
+    print(f"Measured {latency:.1f} ms. Add these to your .env file:\n")
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_cost}")
+    print(f"ARGON2_PARALLELISM={args.parallelism}")
+    print(
+        "\nExisting hashes are upgraded to the new parameters the next time each user logs in."
+    )
+
+
+if __name__ == "__main__":
+    main()
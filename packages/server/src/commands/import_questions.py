@@ -0,0 +1,98 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Bulk imports a CSV or JSONL question bank into the database
+
+import argparse
+import asyncio
+import os
+import time
+
+from config import IMPORT_WORKERS
+from helpers.question_bank import prepare_question_bank
+from services.database import Database
+
+
+def _read_question_bank(path: str) -> str:
+    with open(path, "r", encoding="utf-8-sig") as file:
+        return file.read()
+
+
+async def run(path: str, format: str, workers: int, max_errors: int) -> None:
+    """
+    Validates a question bank, imports its valid rows and prints a report of the rejected ones.
+
+    Args:
+        path (str): The path of the question bank.
+        format (str): Either "csv" or "jsonl".
+        workers (int): The maximum number of worker processes to validate with.
+        max_errors (int): The maximum number of rejected rows to print.
+    """
+
+    start = time.perf_counter()
+    content = await asyncio.to_thread(_read_question_bank, path)
+    rows, errors = await asyncio.to_thread(
+        prepare_question_bank, content, format, workers
+    )
+    validated = time.perf_counter()
+
+    db = Database()
+    try:
+        result = await db.import_questions(rows)
+    finally:
+        await db.close()
+    if not result:
+        raise SystemExit("Failed to import the questions, nothing was imported")
+
+    received = len(rows) + len(errors)
+    errors = sorted(errors + result["errors"], key=lambda error: error["line"])
+    for error in errors[:max_errors]:
+        print(f"line {error['line']}: {error['error']}")
+    if len(errors) > max_errors:
+        print(f"... and {len(errors) - max_errors} more")
+
+    print(
+        f"Imported {result['imported']} of {received} questions"
+        f" with {result['tags']} tags, rejected {len(errors)}"
+        f" (validated in {validated - start:.2f}s,"
+        f" imported in {time.perf_counter() - validated:.2f}s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bulk import a CSV or JSONL question bank into the database."
+    )
+    parser.add_argument("path", help="the question bank to import")
+    parser.add_argument(
+        "--format",
+        choices=["csv", "jsonl"],
+        help="the question bank format (default: from the file extension)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=IMPORT_WORKERS,
+        help=f"worker processes used to validate rows (default: {IMPORT_WORKERS})",
+    )
+    parser.add_argument(
+        "--max-errors",
+        type=int,
+        default=50,
+        help="rejected rows to print (default: 50)",
+    )
+    parser.add_argument(
+        "--production",
+        "--prod",
+        action="store_true",
+        help="use the .env.production database",
+    )
+    args = parser.parse_args()
+
+    format = args.format
+    if format is None:
+        format = "csv" if os.path.splitext(args.path)[1].lower() == ".csv" else "jsonl"
+
+    asyncio.run(run(args.path, format, args.workers, args.max_errors))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Applies pending schema migrations, or lists which are applied and pending
+
+import argparse
+import asyncio
+
+from psycopg import AsyncConnection
+
+from config import SERVICE_POSTGRES_URI
+from services.database.migrations import (
+    current_version,
+    load_migrations,
+    migrate,
+    seed,
+)
+
+
+async def run(status: bool, load: bool) -> None:
+    """
+    Migrates the database, or prints the state of every migration.
+
+    Args:
+        status (bool): Whether to only print which migrations are applied and pending.
+        load (bool): Whether to also load the demo data after migrating.
+    """
+
+    migrations = load_migrations()
+    async with await AsyncConnection.connect(SERVICE_POSTGRES_URI) as conn:
+        if status:
+            version = await current_version(conn)
+            for migration in migrations:
+                state = "applied" if migration.version <= version else "pending"
+                print(f"{migration.version:>6}  {state:<9}{migration.name}")
+            return
+
+        applied = await migrate(conn, migrations)
+        for migration in applied:
+            print(f"Applied migration {migration.version}: {migration.name}")
+        if not applied:
+            print("Database schema is up to date")
+
+        if load:
+            await seed(conn)
+            print("Loaded demo data")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Apply pending schema migrations to the database."
+    )
+    parser.add_argument(
+        "--status",
+        action="store_true",
+        help="list applied and pending migrations without applying any",
+    )
+    parser.add_argument(
+        "--seed",
+        action="store_true",
+        help="also load the demo data, never use against a production database",
+    )
+    parser.add_argument(
+        "--production",
+        "--prod",
+        action="store_true",
+        help="use the .env.production database",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args.status, args.seed))
+
+
+if __name__ == "__main__":
+    main()
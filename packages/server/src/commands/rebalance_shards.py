@@ -0,0 +1,282 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Moves users to the shard their uuid hashes to and rebuilds the user directory
+
+import argparse
+import asyncio
+from collections import Counter
+from typing import Dict, List
+from uuid import UUID
+
+from psycopg import AsyncConnection
+
+from config import SERVICE_POSTGRES_SHARD_URIS, SERVICE_POSTGRES_URI
+from services.database.migrations import migrate
+from services.database.shards import shard_index
+
+# the lowest uuid, where scanning a table by uuid starts
+FIRST_UUID = UUID(int=0)
+
+
+async def move_users(
+    source: AsyncConnection, target: AsyncConnection, target_index: int, users: list
+) -> int:
+    """
+    Copies users, with their statistics and sessions, to another shard and deletes them from their old one.
+
+    The users are locked on the old shard until they are deleted from it, so nothing written to them in
+    the meantime is lost. The copy is idempotent, if the tool stops between the two commits it can be
+    run again. Sessions whose token does not hash to the new shard could not be found there anymore,
+    and are dropped instead, so their users have to log in again.
+
+    Args:
+        source (AsyncConnection): The connection to the users' current shard.
+        target (AsyncConnection): The connection to the users' new shard.
+        target_index (int): The index of the new shard.
+        users (list): The uuids of the users to move.
+
+    Returns:
+        int: The number of sessions dropped.
+    """
+
+    async with source.transaction(), target.transaction():
+        async with source.cursor() as cursor:
+            await cursor.execute(
+                "SELECT uuid, username, password_hash FROM users WHERE uuid = ANY(%s) FOR UPDATE",
+                [users],
+            )
+            user_rows = await cursor.fetchall()
+            await cursor.execute(
+                "SELECT user_uuid, xp, wins, losses FROM statistics WHERE user_uuid = ANY(%s)",
+                [users],
+            )
+            statistics_rows = await cursor.fetchall()
+            await cursor.execute(
+                "SELECT user_uuid, token, device, created_at FROM sessions WHERE user_uuid = ANY(%s)",
+                [users],
+            )
+            session_rows = await cursor.fetchall()
+
+        count = len(SERVICE_POSTGRES_SHARD_URIS)
+        kept = [
+            row for row in session_rows if shard_index(row[1], count) == target_index
+        ]
+        async with target.cursor() as cursor:
+            await cursor.executemany(
+                "INSERT INTO users (uuid, username, password_hash) VALUES (%s, %s, %s)"
+                " ON CONFLICT (uuid) DO NOTHING",
+                user_rows,
+            )
+            await cursor.executemany(
+                "INSERT INTO statistics (user_uuid, xp, wins, losses) VALUES (%s, %s, %s, %s)"
+                " ON CONFLICT (user_uuid) DO UPDATE"
+                " SET xp = EXCLUDED.xp, wins = EXCLUDED.wins, losses = EXCLUDED.losses",
+                statistics_rows,
+            )
+            await cursor.executemany(
+                "INSERT INTO sessions (user_uuid, token, device, created_at) VALUES (%s, %s, %s, %s)"
+                " ON CONFLICT DO NOTHING",
+                kept,
+            )
+
+        # the sessions and statistics go with the users through the cascade
+        await source.execute("DELETE FROM users WHERE uuid = ANY(%s)", [users])
+
+    return len(session_rows) - len(kept)
+
+
+async def drop_unreachable_sessions(
+    conn: AsyncConnection, index: int, batch: int, dry_run: bool
+) -> int:
+    """
+    Deletes the sessions of a shard whose token hashes to another shard, e.g. sessions created before
+    sharding was enabled. They cannot be found from their token anymore.
+
+    Args:
+        conn (AsyncConnection): The connection to the shard.
+        index (int): The index of the shard.
+        batch (int): The number of sessions scanned per query.
+        dry_run (bool): Whether to only count the sessions.
+
+    Returns:
+        int: The number of sessions dropped, or which would be.
+    """
+
+    count = len(SERVICE_POSTGRES_SHARD_URIS)
+    dropped = 0
+    after = FIRST_UUID
+    while True:
+        rows = await (
+            await conn.execute(
+                "SELECT token FROM sessions WHERE token > %s ORDER BY token LIMIT %s",
+                [after, batch],
+            )
+        ).fetchall()
+        if not rows:
+            return dropped
+        after = rows[-1][0]
+
+        tokens = [row[0] for row in rows if shard_index(row[0], count) != index]
+        dropped += len(tokens)
+        if tokens and not dry_run:
+            await conn.execute("DELETE FROM sessions WHERE token = ANY(%s)", [tokens])
+
+
+async def rebuild_directory(
+    primary: AsyncConnection, shards: List[AsyncConnection]
+) -> int:
+    """
+    Adds every user found on the shards to the user directory on the primary, replacing entries which
+    disagree with the shards. Entries of users being created concurrently are left alone.
+
+    Args:
+        primary (AsyncConnection): The connection to the primary.
+        shards (List[AsyncConnection]): The connections to every shard.
+
+    Returns:
+        int: The number of entries added to the directory.
+    """
+
+    users = []
+    for conn in shards:
+        users += await (
+            await conn.execute("SELECT username, uuid FROM users")
+        ).fetchall()
+
+    async with primary.transaction():
+        await primary.execute(
+            "CREATE TEMP TABLE Directory_Import (username VARCHAR(16), user_uuid UUID)"
+            " ON COMMIT DROP"
+        )
+        async with primary.cursor() as cursor:
+            async with cursor.copy(
+                "COPY Directory_Import (username, user_uuid) FROM STDIN"
+            ) as copy:
+                for row in users:
+                    await copy.write_row(row)
+            await cursor.execute(
+                """
+                DELETE FROM User_Directory d
+                USING Directory_Import i
+                WHERE (d.username = i.username OR d.user_uuid = i.user_uuid)
+                AND (d.username, d.user_uuid) <> (i.username, i.user_uuid)
+                """
+            )
+            await cursor.execute(
+                """
+                INSERT INTO User_Directory (username, user_uuid)
+                SELECT username, user_uuid
+                FROM Directory_Import
+                ON CONFLICT DO NOTHING
+                """
+            )
+            return cursor.rowcount
+
+
+async def rebalance(args) -> None:
+    """
+    Moves every user to their shard under the configured shard list, then drops unreachable sessions and
+    rebuilds the user directory.
+
+    Args:
+        args: The parsed command line arguments.
+    """
+
+    uris = SERVICE_POSTGRES_SHARD_URIS
+    if not uris:
+        raise SystemExit(
+            "Sharding is not configured, set SERVICE_POSTGRES_SHARD_URIS first"
+        )
+
+    # the primary is also scanned when it is not a shard, e.g. when sharding is first enabled
+    sources = uris + [SERVICE_POSTGRES_URI] * (SERVICE_POSTGRES_URI not in uris)
+    conns: Dict[str, AsyncConnection] = {}
+    try:
+        for uri in dict.fromkeys(sources):
+            conns[uri] = await AsyncConnection.connect(uri, autocommit=True)
+            await migrate(conns[uri])
+
+        moves = Counter()
+        dropped = 0
+        for source in dict.fromkeys(sources):
+            after = FIRST_UUID
+            while True:
+                rows = await (
+                    await conns[source].execute(
+                        "SELECT uuid FROM users WHERE uuid > %s ORDER BY uuid LIMIT %s",
+                        [after, args.batch],
+                    )
+                ).fetchall()
+                if not rows:
+                    break
+                after = rows[-1][0]
+
+                by_target: Dict[int, list] = {}
+                for (user,) in rows:
+                    index = shard_index(user, len(uris))
+                    if uris[index] != source:
+                        by_target.setdefault(index, []).append(user)
+
+                for index, users in by_target.items():
+                    moves[(source, index)] += len(users)
+                    if not args.dry_run:
+                        dropped += await move_users(
+                            conns[source], conns[uris[index]], index, users
+                        )
+
+        for (source, index), moved in sorted(moves.items()):
+            source_name = (
+                f"shard {uris.index(source)}" if source in uris else "the primary"
+            )
+            print(
+                f"{'Would move' if args.dry_run else 'Moved'} {moved} users from {source_name} to shard {index}"
+            )
+        if not moves:
+            print("Every user is already on their shard")
+
+        for index, uri in enumerate(uris):
+            dropped += await drop_unreachable_sessions(
+                conns[uri], index, args.batch, args.dry_run
+            )
+        print(
+            f"{'Would drop up to' if args.dry_run else 'Dropped'} {dropped} unreachable sessions"
+        )
+
+        if not args.dry_run:
+            added = await rebuild_directory(
+                conns[SERVICE_POSTGRES_URI],
+                [conns[uri] for uri in dict.fromkeys(uris)],
+            )
+            print(f"Added {added} users to the user directory")
+    finally:
+        for conn in conns.values():
+            await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move users to the shard their uuid hashes to, after the list of shards changed."
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=500,
+        help="users moved per transaction (default: 500)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only print how many users and sessions would move",
+    )
+    parser.add_argument(
+        "--production",
+        "--prod",
+        action="store_true",
+        help="use the .env.production databases",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(rebalance(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -31,3 +31,165 @@ API_HOST: str = os.environ.get("API_HOST")
 API_PORT: int = int(os.environ.get("API_PORT"))
 API_CORS_ORIGINS_REGEX: str = os.environ.get("API_CORS_ORIGINS_REGEX")
 SERVICE_POSTGRES_URI: str = os.environ.get("SERVICE_POSTGRES_URI")
+SERVICE_POSTGRES_REPLICA_URIS: list[str] = [
+    uri.strip()
+    for uri in os.environ.get("SERVICE_POSTGRES_REPLICA_URIS", "").split(",")
+    if uri.strip()
+]
+# databases holding the per-user tables, sharded by user uuid, none keeps them on the primary
+SERVICE_POSTGRES_SHARD_URIS: list[str] = [
+    uri.strip()
+    for uri in os.environ.get("SERVICE_POSTGRES_SHARD_URIS", "").split(",")
+    if uri.strip()
+]
+# where the tables live, `postgres`, or `memory` to keep them in process memory for tests and benchmarks
+DATABASE_BACKEND: str = os.environ.get("DATABASE_BACKEND", "postgres")
+
+# database connection pool configuration
+DATABASE_POOL_MIN: int = int(os.environ.get("DATABASE_POOL_MIN", 1))
+DATABASE_POOL_MAX: int = int(os.environ.get("DATABASE_POOL_MAX", 20))
+DATABASE_POOL_TIMEOUT: float = float(os.environ.get("DATABASE_POOL_TIMEOUT", 5))
+DATABASE_POOL_MAX_LIFETIME: float = float(
+    os.environ.get("DATABASE_POOL_MAX_LIFETIME", 1800)
+)
+DATABASE_POOL_PING_AFTER: float = float(os.environ.get("DATABASE_POOL_PING_AFTER", 30))
+DATABASE_PREPARED_STATEMENTS: bool = os.environ.get(
+    "DATABASE_PREPARED_STATEMENTS", "true"
+).lower() in ("1", "true", "yes")
+DATABASE_PREPARED_MAX: int = int(os.environ.get("DATABASE_PREPARED_MAX", 100))
+DATABASE_QUERY_LOG: bool = os.environ.get("DATABASE_QUERY_LOG", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# rows fetched per round trip when streaming a table through a server-side cursor
+DATABASE_STREAM_CHUNK_SIZE: int = int(
+    os.environ.get("DATABASE_STREAM_CHUNK_SIZE", 1000)
+)
+
+# demo data is only loaded into development databases
+DATABASE_SEED: bool = (
+    os.environ.get("DATABASE_SEED") or str(not IS_PRODUCTION)
+).lower() in ("1", "true", "yes")
+
+# read replica configuration
+DATABASE_REPLICA_MAX_LAG: float = float(os.environ.get("DATABASE_REPLICA_MAX_LAG", 1))
+DATABASE_REPLICA_CHECK_INTERVAL: float = float(
+    os.environ.get("DATABASE_REPLICA_CHECK_INTERVAL", 2)
+)
+
+# circuit breaker configuration, consecutive failures which open it (0 disables it) and seconds before a probe
+DATABASE_BREAKER_FAILURES: int = int(os.environ.get("DATABASE_BREAKER_FAILURES", 5))
+DATABASE_BREAKER_RESET: float = float(os.environ.get("DATABASE_BREAKER_RESET", 5))
+
+# connection pool partitions as comma separated `name:limit` pairs, partitions not listed are not limited
+DATABASE_POOL_PARTITIONS: dict[str, int] = {
+    name.strip(): int(limit)
+    for name, limit in (
+        pair.split(":")
+        for pair in os.environ.get("DATABASE_POOL_PARTITIONS", "admin:5").split(",")
+        if pair.strip()
+    )
+}
+
+# seconds a request may spend on database calls before it is cancelled with a 504 (0 disables it), and
+# per-route overrides as comma separated `METHOD /path:seconds` pairs, with the path as declared on the route
+REQUEST_DEADLINE: float = float(os.environ.get("REQUEST_DEADLINE", 10))
+REQUEST_DEADLINES: dict[str, float] = {
+    route.strip(): float(seconds)
+    for route, seconds in (
+        pair.rsplit(":", 1)
+        for pair in os.environ.get(
+            "REQUEST_DEADLINES", "POST /api/v1/questions/import:120"
+        ).split(",")
+        if pair.strip()
+    )
+}
+
+# write-behind statistics, increments are kept in memory and written in batches every interval seconds,
+# or once that many users have pending increments, the memory backend always writes them immediately
+STATISTICS_WRITE_BEHIND: bool = os.environ.get(
+    "STATISTICS_WRITE_BEHIND", "false"
+).lower() in ("1", "true", "yes")
+STATISTICS_FLUSH_INTERVAL: float = float(
+    os.environ.get("STATISTICS_FLUSH_INTERVAL", 0.5)
+)
+STATISTICS_FLUSH_USERS: int = int(os.environ.get("STATISTICS_FLUSH_USERS", 500))
+
+if DATABASE_BACKEND not in ("postgres", "memory"):
+    print("DATABASE_BACKEND must be either 'postgres' or 'memory'", flush=True)
+    sys.exit(1)
+
+if not 0 <= DATABASE_POOL_MIN <= DATABASE_POOL_MAX or DATABASE_POOL_MAX < 1:
+    print(
+        "DATABASE_POOL_MIN must be between 0 and DATABASE_POOL_MAX, which must be at least 1",
+        flush=True,
+    )
+    sys.exit(1)
+
+if not all(
+    1 <= limit <= DATABASE_POOL_MAX for limit in DATABASE_POOL_PARTITIONS.values()
+):
+    print(
+        "DATABASE_POOL_PARTITIONS limits must be between 1 and DATABASE_POOL_MAX",
+        flush=True,
+    )
+    sys.exit(1)
+
+if REQUEST_DEADLINE < 0 or any(seconds < 0 for seconds in REQUEST_DEADLINES.values()):
+    print("REQUEST_DEADLINE and REQUEST_DEADLINES must not be negative", flush=True)
+    sys.exit(1)
+
+if STATISTICS_FLUSH_INTERVAL <= 0 or STATISTICS_FLUSH_USERS < 1:
+    print(
+        "STATISTICS_FLUSH_INTERVAL must be positive and STATISTICS_FLUSH_USERS at least 1",
+        flush=True,
+    )
+    sys.exit(1)
+
+# session configuration
+SESSION_LIFETIME: int = int(os.environ.get("SESSION_LIFETIME", 604800))
+SESSION_MAX_PER_USER: int = int(os.environ.get("SESSION_MAX_PER_USER", 5))
+SESSION_SWEEP_INTERVAL: float = float(os.environ.get("SESSION_SWEEP_INTERVAL", 300))
+SESSION_SWEEP_BATCH_SIZE: int = int(os.environ.get("SESSION_SWEEP_BATCH_SIZE", 500))
+
+# session cache configuration
+SESSION_CACHE_SIZE: int = int(os.environ.get("SESSION_CACHE_SIZE", 10000))
+SESSION_CACHE_TTL: float = float(os.environ.get("SESSION_CACHE_TTL", 30))
+
+# session token configuration
+SESSION_TOKEN_MODE: str = os.environ.get("SESSION_TOKEN_MODE", "opaque")
+SESSION_TOKEN_SECRET: str = os.environ.get("SESSION_TOKEN_SECRET", "")
+SESSION_REVOCATION_REFRESH: float = float(
+    os.environ.get("SESSION_REVOCATION_REFRESH", 15)
+)
+
+if SESSION_TOKEN_MODE not in ("opaque", "signed"):
+    print("SESSION_TOKEN_MODE must be either 'opaque' or 'signed'", flush=True)
+    sys.exit(1)
+
+if SESSION_TOKEN_MODE == "signed" and not SESSION_TOKEN_SECRET:
+    print("SESSION_TOKEN_SECRET must be set when using signed tokens", flush=True)
+    sys.exit(1)
+
+# password hashing configuration
+HASH_WORKERS: int = int(
+    os.environ.get("HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+)
+HASH_QUEUE_DEPTH: int = int(os.environ.get("HASH_QUEUE_DEPTH", 32))
+
+# argon2 parameters, see `pnpm calibrate` to tune them for the host
+ARGON2_TIME_COST: int = int(os.environ.get("ARGON2_TIME_COST", 3))
+ARGON2_MEMORY_COST: int = int(os.environ.get("ARGON2_MEMORY_COST", 65536))
+ARGON2_PARALLELISM: int = int(os.environ.get("ARGON2_PARALLELISM", 4))
+
+# admission control for the password hashing endpoints
+ADMISSION_CLIENT_RATE: float = float(os.environ.get("ADMISSION_CLIENT_RATE", 1))
+ADMISSION_CLIENT_BURST: int = int(os.environ.get("ADMISSION_CLIENT_BURST", 10))
+ADMISSION_USERNAME_RATE: float = float(os.environ.get("ADMISSION_USERNAME_RATE", 0.2))
+ADMISSION_USERNAME_BURST: int = int(os.environ.get("ADMISSION_USERNAME_BURST", 5))
+
+# bulk question import configuration
+IMPORT_WORKERS: int = int(os.environ.get("IMPORT_WORKERS", os.cpu_count() or 1))
+IMPORT_MAX_BYTES: int = int(os.environ.get("IMPORT_MAX_BYTES", 64 * 1024 * 1024))
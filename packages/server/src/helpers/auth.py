@@ -4,9 +4,16 @@
 import re
 from enum import Enum
 
-from argon2 import PasswordHasher
+from argon2 import PasswordHasher, extract_parameters
+from argon2.exceptions import InvalidHashError
 
-ph = PasswordHasher()
+from config import ARGON2_MEMORY_COST, ARGON2_PARALLELISM, ARGON2_TIME_COST
+
+ph = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM,
+)
 
 
 class Auth:
@@ -127,6 +134,8 @@ class Auth:
         """
         Verifies if the given password matches the password hash.
 
+        Only argon2 hashes can match, legacy hashes (see `is_legacy_hash`) never do.
+
         Args:
             password (str): The password to be verified.
             password_hash (str): The password hash to compare against.
@@ -140,3 +149,38 @@ class Auth:
             return True
         except:  # noqa: E722
             return False
+
+    def is_legacy_hash(password_hash: str) -> bool:
+        """
+        Checks if the given password hash is not an argon2 hash, e.g. the hashes in the seed data.
+
+        Such a hash cannot be verified, so the user must reset their password.
+
+        Args:
+            password_hash (str): The password hash to check.
+
+        Returns:
+            bool: True if the password hash is a legacy hash, False otherwise.
+        """
+
+        try:
+            extract_parameters(password_hash)
+            return False
+        except InvalidHashError:
+            return True
+
+    def needs_rehash(password_hash: str) -> bool:
+        """
+        Checks if the given password hash should be replaced by a hash using the current argon2 parameters.
+
+        Args:
+            password_hash (str): The password hash to check.
+
+        Returns:
+            bool: True if the password hash is a legacy hash or uses outdated parameters, False otherwise.
+        """
+
+        if Auth.is_legacy_hash(password_hash):
+            return True
+
+        return ph.check_needs_rehash(password_hash)
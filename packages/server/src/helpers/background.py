@@ -0,0 +1,35 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Helpers for running periodic background jobs
+
+import asyncio
+from typing import Awaitable, Callable
+
+
+def run_periodically(
+    name: str,
+    interval: float,
+    job: Callable[[], Awaitable[object]],
+) -> asyncio.Task:
+    """
+    Runs a coroutine job every `interval` seconds on the running event loop until the returned task is cancelled.
+
+    Exceptions raised by the job are printed and do not stop later runs.
+
+    Args:
+        name (str): The name of the background task.
+        interval (float): The number of seconds to wait between runs.
+        job (Callable[[], Awaitable[object]]): The job to run.
+
+    Returns:
+        asyncio.Task: The task running the job, cancel it to stop the job.
+    """
+
+    async def loop():
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await job()
+            except Exception as e:
+                print(f"Background job {name} failed:", e, flush=True)
+
+    return asyncio.get_running_loop().create_task(loop(), name=name)
@@ -0,0 +1,130 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Circuit breaker which stops calls to a failing dependency until it recovers
+
+import time
+from typing import Any, Callable, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker tracking the health of a dependency, e.g. the database.
+
+    While closed, calls go through and consecutive failures are counted, any success resets the count.
+    After `failure_threshold` consecutive failures the breaker opens and callers should fail fast
+    instead of calling the dependency. Once `reset_timeout` seconds have passed, one caller is let
+    through `begin_probe` to check the dependency (half-open): a success closes the breaker again, a
+    failure opens it for another `reset_timeout` seconds.
+
+    The breaker only keeps state, running the probe is up to its owner.
+
+    Attributes:
+        failure_threshold (int): The number of consecutive failures which open the breaker.
+        reset_timeout (float): The number of seconds the breaker stays open before a probe is allowed.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        if reset_timeout < 0:
+            raise ValueError("reset_timeout must be non-negative")
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._timer = timer
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trips = 0
+        self._rejected = 0
+        self._probes = 0
+
+    @property
+    def state(self) -> str:
+        """
+        The state of the breaker, one of `closed`, `open` or `half_open`.
+        """
+
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Returns whether a call may go through, counting it as rejected if not.
+
+        Returns:
+            bool: True if the breaker is closed.
+        """
+
+        if self._state == CLOSED:
+            return True
+        self._rejected += 1
+        return False
+
+    def begin_probe(self) -> bool:
+        """
+        Half-opens the breaker if it has been open for at least `reset_timeout` seconds. The caller
+        must then check the dependency and report the outcome with `record_success` or `record_failure`.
+
+        Returns:
+            bool: True if the caller should probe the dependency now.
+        """
+
+        if self._state != OPEN or self._timer() - self._opened_at < self.reset_timeout:
+            return False
+        self._state = HALF_OPEN
+        self._probes += 1
+        return True
+
+    def record_success(self) -> None:
+        """
+        Records a successful call, closing the breaker if it was probing.
+        """
+
+        self._failures = 0
+        if self._state == HALF_OPEN:
+            self._state = CLOSED
+
+    def record_failure(self) -> None:
+        """
+        Records a failed call, opening the breaker after too many in a row or if it was probing.
+        """
+
+        if self._state == OPEN:
+            return
+        self._failures += 1
+        if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state == CLOSED:
+                self._trips += 1
+            self._state = OPEN
+            self._opened_at = self._timer()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the state of the breaker and its counters.
+
+        Returns:
+            Dict[str, Any]: The state, the consecutive failures, and the number of trips, rejected calls and probes.
+        """
+
+        return {
+            "state": self._state,
+            "failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "open_for": (
+                round(self._timer() - self._opened_at, 3)
+                if self._state != CLOSED
+                else 0
+            ),
+            "trips": self._trips,
+            "rejected": self._rejected,
+            "probes": self._probes,
+        }
@@ -0,0 +1,157 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Bounded in-process cache with per-entry expiry and LRU eviction
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded cache where every entry expires after a fixed time-to-live.
+
+    When the cache is full, the least recently used entry is evicted to make room for new ones.
+
+    Attributes:
+        maxsize (int): The maximum number of entries held at once.
+        ttl (float): The number of seconds an entry stays valid after being set.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        if maxsize < 0:
+            raise ValueError("maxsize must be non-negative")
+        if ttl < 0:
+            raise ValueError("ttl must be non-negative")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Retrieves a value from the cache.
+
+        Args:
+            key (Hashable): The key to look up.
+
+        Returns:
+            Optional[Any]: The cached value, or None if the key is missing or expired.
+        """
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self._timer():
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value in the cache, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (Hashable): The key to store the value under.
+            value (Any): The value to store.
+        """
+
+        if self.maxsize == 0 or self.ttl == 0:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = (self._timer() + self.ttl, value)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """
+        Removes a single entry from the cache.
+
+        Args:
+            key (Hashable): The key to remove.
+
+        Returns:
+            bool: True if an entry was removed, False otherwise.
+        """
+
+        with self._lock:
+            if self._data.pop(key, None) is None:
+                return False
+            self._invalidations += 1
+            return True
+
+    def delete_where(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        Removes every entry whose value matches the given predicate.
+
+        Args:
+            predicate (Callable[[Any], bool]): Called with each cached value, entries returning True are removed.
+
+        Returns:
+            int: The number of entries removed.
+        """
+
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """
+        Removes every entry from the cache.
+        """
+
+        with self._lock:
+            self._invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the cache counters, useful for tuning its size and time-to-live.
+
+        Returns:
+            Dict[str, int]: The current size, capacity, and hit/miss/eviction/expiration/invalidation counts.
+        """
+
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,99 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Registry of in-process metric sources exposed by the metrics route
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+_lock = threading.Lock()
+
+
+class LatencyStats:
+    """
+    A thread-safe accumulator of observed durations.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._last: Optional[float] = None
+
+    def observe(self, seconds: float) -> None:
+        """
+        Records a single observed duration.
+
+        Args:
+            seconds (float): The observed duration in seconds.
+        """
+
+        with self._lock:
+            self._count += 1
+            self._total += seconds
+            self._max = max(self._max, seconds)
+            self._last = seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns a summary of the observed durations, in milliseconds.
+
+        Returns:
+            Dict[str, float]: The number of observations and their average, maximum, last and total duration.
+        """
+
+        with self._lock:
+            count, total, peak, last = self._count, self._total, self._max, self._last
+
+        return {
+            "count": count,
+            "avg_ms": round(total / count * 1000, 3) if count else 0.0,
+            "max_ms": round(peak * 1000, 3),
+            "last_ms": round((last or 0.0) * 1000, 3),
+            "total_ms": round(total * 1000, 3),
+        }
+
+
+def register(name: str, source: Callable[[], Dict[str, Any]]) -> None:
+    """
+    Registers a metric source under the given name, replacing any previous source with that name.
+
+    Args:
+        name (str): The name the metrics are reported under.
+        source (Callable[[], Dict[str, Any]]): Called on every collection, returns the current metric values.
+    """
+
+    with _lock:
+        _sources[name] = source
+
+
+def unregister(name: str) -> None:
+    """
+    Removes a previously registered metric source.
+
+    Args:
+        name (str): The name of the metric source to remove.
+    """
+
+    with _lock:
+        _sources.pop(name, None)
+
+
+def collect() -> Dict[str, Dict[str, Any]]:
+    """
+    Collects the current values of every registered metric source.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: A dictionary mapping each source name to its current metric values.
+    """
+
+    with _lock:
+        sources = dict(_sources)
+
+    results = {}
+    for name, source in sorted(sources.items()):
+        try:
+            results[name] = source()
+        except Exception as e:
+            print(f"Failed to collect metrics for {name}:", e, flush=True)
+    return results
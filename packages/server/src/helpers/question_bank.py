@@ -0,0 +1,227 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Parses and validates question banks for bulk import
+
+import csv
+import io
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from helpers.types import QuestionImportErrorDict
+
+# limits of the Questions table
+MAX_QUESTION_LENGTH = 500
+MAX_OPTION_LENGTH = 50
+MIN_OPTIONS = 2
+MAX_OPTIONS = 4
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
+# rows per task handed to a worker process, large enough to amortize the pickling
+CHUNK_SIZE = 5000
+
+CSV_COLUMNS = ("question", "difficulty", "option1", "option2", "option3", "option4")
+
+# a validated row, ready to be copied into the database:
+# (line, question, difficulty, option1, option2, option3, option4, tag ids)
+QuestionRow = tuple
+
+
+def parse_question_bank(content: str, format: str) -> List[tuple[int, Any]]:
+    """
+    Splits a question bank into raw rows, without validating them.
+
+    CSV banks need a header with the columns `question`, `difficulty`, `option1` to `option4` and an
+    optional `tags` column of tag ids separated by `;`. JSONL banks hold one object per line with the
+    same fields as `POST /api/v1/questions`, i.e. `question`, `difficulty`, `options` and `tags`.
+
+    Args:
+        content (str): The question bank.
+        format (str): Either "csv" or "jsonl".
+
+    Returns:
+        List[tuple[int, Any]]: The line number and raw value of every row.
+
+    Raises:
+        ValueError: If the format is unknown or the CSV header is missing required columns.
+    """
+
+    rows = []
+    if format == "csv":
+        reader = csv.DictReader(io.StringIO(content))
+        missing = set(CSV_COLUMNS[:4]) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"CSV header is missing {', '.join(sorted(missing))}")
+        for record in reader:
+            options = [record.get(column) for column in CSV_COLUMNS[2:]]
+            rows.append(
+                (
+                    reader.line_num,
+                    {
+                        "question": record.get("question"),
+                        "difficulty": record.get("difficulty"),
+                        "options": [option for option in options if option],
+                        "tags": [
+                            tag for tag in (record.get("tags") or "").split(";") if tag
+                        ],
+                    },
+                )
+            )
+    elif format == "jsonl":
+        for line, text in enumerate(content.splitlines(), start=1):
+            if text.strip():
+                rows.append((line, text))
+    else:
+        raise ValueError(f"Unknown question bank format: {format}")
+    return rows
+
+
+def validate_question(
+    line: int, raw: Any
+) -> tuple[Optional[QuestionRow], Optional[str]]:
+    """
+    Validates a single raw row against the limits of the Questions table.
+
+    Args:
+        line (int): The line number of the row in the question bank.
+        raw (Any): A dictionary parsed from CSV, or the unparsed text of a JSONL line.
+
+    Returns:
+        tuple[Optional[QuestionRow], Optional[str]]: The validated row and None, or None and the reason the row is invalid.
+    """
+
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except json.JSONDecodeError as e:
+            return None, f"Invalid JSON: {e.msg}"
+    if not isinstance(raw, dict):
+        return None, "Row must be an object"
+
+    question = raw.get("question")
+    if not isinstance(question, str) or not question.strip():
+        return None, "Question must be a non-empty string"
+    question = question.strip()
+    if len(question) > MAX_QUESTION_LENGTH:
+        return None, f"Question must be at most {MAX_QUESTION_LENGTH} characters"
+
+    difficulty = raw.get("difficulty")
+    try:
+        if isinstance(difficulty, (bool, float)):
+            raise ValueError
+        difficulty = int(difficulty)
+    except (TypeError, ValueError):
+        return None, "Difficulty must be an integer"
+    if not MIN_DIFFICULTY <= difficulty <= MAX_DIFFICULTY:
+        return None, f"Difficulty must be between {MIN_DIFFICULTY} and {MAX_DIFFICULTY}"
+
+    options = raw.get("options")
+    if not isinstance(options, list) or not all(
+        isinstance(option, str) and option.strip() for option in options
+    ):
+        return None, "Options must be a list of non-empty strings"
+    options = [option.strip() for option in options]
+    if not MIN_OPTIONS <= len(options) <= MAX_OPTIONS:
+        return (
+            None,
+            f"A question must have between {MIN_OPTIONS} and {MAX_OPTIONS} options",
+        )
+    if any(len(option) > MAX_OPTION_LENGTH for option in options):
+        return None, f"Options must be at most {MAX_OPTION_LENGTH} characters"
+    if len(set(options)) != len(options):
+        return None, "Options must be unique"
+
+    tags = raw.get("tags") or []
+    try:
+        if not isinstance(tags, list) or any(isinstance(tag, bool) for tag in tags):
+            raise ValueError
+        tags = sorted({int(tag) for tag in tags})
+    except (TypeError, ValueError):
+        return None, "Tags must be a list of tag ids"
+
+    options += [None] * (MAX_OPTIONS - len(options))
+    return (line, question, difficulty, *options, tags), None
+
+
+def validate_chunk(
+    rows: List[tuple[int, Any]],
+) -> tuple[List[QuestionRow], List[QuestionImportErrorDict]]:
+    """
+    Validates a chunk of raw rows, in a worker process.
+
+    Args:
+        rows (List[tuple[int, Any]]): The line number and raw value of every row.
+
+    Returns:
+        tuple[List[QuestionRow], List[QuestionImportErrorDict]]: The valid rows, and an error for every invalid one.
+    """
+
+    valid, errors = [], []
+    for line, raw in rows:
+        row, error = validate_question(line, raw)
+        if error:
+            errors.append(QuestionImportErrorDict(line=line, error=error))
+        else:
+            valid.append(row)
+    return valid, errors
+
+
+def prepare_question_bank(
+    content: str, format: str, workers: int = 1
+) -> tuple[List[QuestionRow], List[QuestionImportErrorDict]]:
+    """
+    Parses, validates and dedupes a question bank.
+
+    Rows are validated in chunks of `CHUNK_SIZE` on up to `workers` processes. When a question appears
+    more than once, its first occurrence is kept and the others are reported as duplicates.
+
+    Args:
+        content (str): The question bank.
+        format (str): Either "csv" or "jsonl".
+        workers (int): The maximum number of worker processes to validate with.
+
+    Returns:
+        tuple[List[QuestionRow], List[QuestionImportErrorDict]]: The rows to import, in file order, and an error for every rejected row.
+
+    Raises:
+        ValueError: If the format is unknown or the CSV header is missing required columns.
+    """
+
+    rows = parse_question_bank(content, format)
+    chunks = [rows[i : i + CHUNK_SIZE] for i in range(0, len(rows), CHUNK_SIZE)]
+
+    if workers > 1 and len(chunks) > 1:
+        # callers run this on a to_thread worker, so the process is multi-threaded and forking it
+        # could deadlock, validate_chunk only needs this module so a forkserver worker starts cheaply
+        context = (
+            multiprocessing.get_context("forkserver")
+            if "forkserver" in multiprocessing.get_all_start_methods()
+            else None
+        )
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)), mp_context=context
+        ) as executor:
+            results = list(executor.map(validate_chunk, chunks))
+    else:
+        results = [validate_chunk(chunk) for chunk in chunks]
+
+    valid, errors = [], []
+    first_seen: Dict[str, int] = {}
+    for chunk_valid, chunk_errors in results:
+        errors.extend(chunk_errors)
+        for row in chunk_valid:
+            line, question = row[0], row[1]
+            if question in first_seen:
+                errors.append(
+                    QuestionImportErrorDict(
+                        line=line,
+                        error=f"Duplicate of the question on line {first_seen[question]}",
+                    )
+                )
+                continue
+            first_seen[question] = line
+            valid.append(row)
+
+    errors.sort(key=lambda error: error["line"])
+    return valid, errors
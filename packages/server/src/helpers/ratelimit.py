@@ -0,0 +1,104 @@
+# @author: adibarra (Alec Ibarra)
+# @description: In-memory token bucket rate limiter
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+
+class TokenBucketLimiter:
+    """
+    A thread-safe token bucket rate limiter with one bucket per key.
+
+    Every key starts with `burst` tokens, which refill at `rate` tokens per second. Each admitted
+    operation takes one token. Only the `max_keys` most recently used buckets are kept; a bucket
+    that is dropped starts over full, which only matters for keys idle long enough to be refilled.
+
+    Attributes:
+        rate (float): The number of tokens added to a bucket per second.
+        burst (int): The maximum number of tokens a bucket can hold.
+        max_keys (int): The maximum number of buckets kept in memory.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_keys: int = 10000,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._timer = timer
+        self._lock = threading.Lock()
+        # key -> (tokens, last refill time)
+        self._buckets: "OrderedDict[Hashable, tuple[float, float]]" = OrderedDict()
+        self._allowed = 0
+        self._rejected = 0
+
+    def _refill(self, key: Hashable, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (float(self.burst), now))
+        return min(float(self.burst), tokens + (now - updated_at) * self.rate)
+
+    def allow(self, key: Hashable) -> bool:
+        """
+        Takes a token from the key's bucket if one is available.
+
+        Args:
+            key (Hashable): The key to rate limit on, e.g. a username or client address.
+
+        Returns:
+            bool: True if the operation is admitted, False if it should be rejected.
+        """
+
+        with self._lock:
+            now = self._timer()
+            tokens = self._refill(key, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+                self._allowed += 1
+            else:
+                self._rejected += 1
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+    def retry_after(self, key: Hashable) -> int:
+        """
+        Returns how long until the key's bucket holds a token again.
+
+        Args:
+            key (Hashable): The key to rate limit on.
+
+        Returns:
+            int: The number of whole seconds to wait, 0 if a token is available now.
+        """
+
+        with self._lock:
+            tokens = self._refill(key, self._timer())
+            return 0 if tokens >= 1 else math.ceil((1 - tokens) / self.rate)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the limiter counters.
+
+        Returns:
+            Dict[str, int]: The number of tracked keys and of allowed and rejected operations.
+        """
+
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "allowed": self._allowed,
+                "rejected": self._rejected,
+            }
@@ -0,0 +1,50 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Helper function to rate limit the routes which hash passwords.
+
+from fastapi import HTTPException, Request, status
+
+from config import (
+    ADMISSION_CLIENT_BURST,
+    ADMISSION_CLIENT_RATE,
+    ADMISSION_USERNAME_BURST,
+    ADMISSION_USERNAME_RATE,
+)
+from helpers import metrics
+from helpers.ratelimit import TokenBucketLimiter
+
+clientLimiter = TokenBucketLimiter(ADMISSION_CLIENT_RATE, ADMISSION_CLIENT_BURST)
+usernameLimiter = TokenBucketLimiter(ADMISSION_USERNAME_RATE, ADMISSION_USERNAME_BURST)
+
+metrics.register(
+    "admission",
+    lambda: {"client": clientLimiter.stats(), "username": usernameLimiter.stats()},
+)
+
+
+def requireAdmission(request: Request, username: str) -> None:
+    """
+    Admits or rejects a request which is about to run an expensive password hash.
+
+    Requests are rate limited both per client address and per username, so neither a single client
+    nor a burst of attempts against a single account can saturate the password hashing workers.
+
+    Args:
+        request (Request): The incoming request, used for the client address.
+        username (str): The username the request targets.
+
+    Raises:
+        HTTPException: If either rate limit is exceeded (429 Too Many Requests).
+    """
+
+    client = request.client.host if request.client else "unknown"
+
+    for limiter, key in (
+        (clientLimiter, client),
+        (usernameLimiter, username.lower()),
+    ):
+        if not limiter.allow(key):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too Many Requests: Try again later",
+                headers={"Retry-After": str(max(1, limiter.retry_after(key)))},
+            )
@@ -17,6 +17,7 @@ async def requireAuth(
 
     This function checks if the Authorization header is properly formatted as "Bearer <token>", validates if the
     token exists in the database, and returns a dictionary with the token owner (associated with the token) and the token.
+    When signed tokens are enabled, the token's signature, expiry and revocation status are checked in memory instead.
 
     If the Authorization header is missing or improperly formatted, a 400 Bad Request HTTPException is raised.
     If the token is invalid or not found in the database, a 401 Unauthorized HTTPException is raised.
@@ -26,8 +27,8 @@ async def requireAuth(
 
     Returns:
         SessionDict: A validated dictionary containing:
-            - "user_uuid" (str): The owner of the token.
-            - "token" (str): The token.
+            - "user_uuid" (UUID): The owner of the token.
+            - "token" (UUID | str): The token.
 
     Raises:
         HTTPException: If the Authorization header is missing or improperly formatted (400 Bad Request).
@@ -47,7 +48,7 @@ async def requireAuth(
             detail="Bad Request: Malformed Authorization Header",
         )
 
-    session = db.get_session(token=parts[1])
+    session = await db.get_session(token=parts[1])
     if session is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
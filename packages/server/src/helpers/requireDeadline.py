@@ -0,0 +1,30 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Helper function to bound the database time of every request by a deadline.
+
+from typing import AsyncIterator
+
+from fastapi import Request
+
+from config import REQUEST_DEADLINE, REQUEST_DEADLINES
+from services.database.deadlines import use_deadline
+
+
+async def requireDeadline(request: Request) -> AsyncIterator[None]:
+    """
+    Gives the database calls made while handling the request `REQUEST_DEADLINE` seconds, or the
+    route's override in `REQUEST_DEADLINES`, keyed by method and path as declared on the route, e.g.
+    `POST /api/v1/questions/import`. Once the deadline passes, the running statement is cancelled on
+    the database and the request fails with 504 Gateway Timeout. Streamed response bodies are only
+    bound until their first row.
+
+    It is installed as an application dependency with `scope="function"`, so it runs before, and
+    covers, every route dependency.
+    """
+
+    route = request.scope.get("route")
+    seconds = REQUEST_DEADLINE
+    if route is not None:
+        seconds = REQUEST_DEADLINES.get(f"{request.method} {route.path}", seconds)
+
+    with use_deadline(seconds):
+        yield
@@ -0,0 +1,31 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Helper function to declare the connection pool partition used by a route.
+
+from typing import AsyncIterator, Callable
+
+from services.database.partitions import use_partition
+
+
+def requirePartition(name: str) -> Callable[[], AsyncIterator[None]]:
+    """
+    Returns a route dependency which checks out the connections of every database call made while
+    handling the request from the given pool partition, e.g. to keep slow administrative routes from
+    holding the connections gameplay routes need. Database methods which declare their own partition,
+    like the session lookup done by `requireAuth`, keep using it.
+
+    Use it as a route dependency with `scope="function"`, so it also covers the other dependencies:
+
+        @router.post("/...", dependencies=[Depends(requirePartition(ADMIN), scope="function")])
+
+    Args:
+        name (str): The partition name, see `services.database.partitions`.
+
+    Returns:
+        Callable[[], AsyncIterator[None]]: The dependency.
+    """
+
+    async def dependency() -> AsyncIterator[None]:
+        with use_partition(name):
+            yield
+
+    return dependency
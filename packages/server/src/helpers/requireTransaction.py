@@ -0,0 +1,38 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Helper function to run all database calls of a route in one transaction.
+
+from typing import AsyncIterator
+
+from fastapi import Header
+
+from services.database import Database
+
+db = Database()
+
+
+async def requireTransaction(
+    authorization: str = Header(None),
+) -> AsyncIterator[None]:
+    """
+    Runs every database call made while handling the request on one connection and in one transaction.
+
+    The transaction is opened on the pool of the shard holding the caller's session, which also holds
+    the rest of their rows when sharding is enabled. Calls to other shards, e.g. for other users, are
+    not part of it and commit on their own. Without an Authorization header the primary is used.
+
+    The connection is checked out on the first database call, including the session lookup done by
+    `requireAuth`, and the transaction is committed once the route returns, before the response is
+    sent. If the route raises, everything is rolled back.
+
+    Use it as the first route dependency with `scope="function"`, so it wraps the other dependencies
+    and commits before the response goes out:
+
+        @router.patch("/...", dependencies=[Depends(requireTransaction, scope="function")])
+
+    Avoid it on routes which hash passwords, as the connection would stay checked out while hashing.
+    """
+
+    token = authorization.split(" ")[-1] if authorization else None
+    pool = db.pool_for_session(token) if token else db.connectionPool
+    async with pool.transaction():
+        yield
@@ -0,0 +1,120 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Streams database rows to the client as a JSON array or as NDJSON
+
+from typing import Any, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+
+# bytes collected before a chunk is written, so large responses are not sent one row at a time
+CHUNK_BYTES = 64 * 1024
+
+
+def _dumps(value: Any) -> bytes:
+    # serializes dictionaries and the records returned by the database alike, without per-row copies
+    return to_json(value, fallback=str)
+
+
+async def _prime(items: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    # fetch the first item before the response starts, so failing to query (e.g. the pool timing out)
+    # still produces a proper error response instead of a truncated 200
+    try:
+        first = await anext(items)
+    except StopAsyncIteration:
+        return _empty()
+    return _chain(first, items)
+
+
+async def _empty() -> AsyncIterator[Any]:
+    return
+    yield
+
+
+async def _chain(first: Any, rest: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    try:
+        yield first
+        async for item in rest:
+            yield item
+    finally:
+        await rest.aclose()
+
+
+async def _buffered(parts: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer, size = [], 0
+    async for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def stream_json(
+    items: AsyncIterator[Any], code: int = 200, message: str = "Ok"
+) -> StreamingResponse:
+    """
+    Streams items as the `data` array of the usual `{"code", "message", "data"}` response body.
+
+    The body is identical to the buffered response, but it is written a chunk at a time as the items
+    are produced, so memory use does not grow with the number of items.
+
+    Args:
+        items (AsyncIterator[Any]): The JSON serializable items, e.g. from a `Database.stream_*` method.
+        code (int): The status code, both of the response and in the body.
+        message (str): The message in the body.
+
+    Returns:
+        StreamingResponse: The response streaming the items.
+
+    Raises:
+        DatabaseUnavailableError: If the items could not be queried at all.
+    """
+
+    items = await _prime(items)
+
+    async def body() -> AsyncIterator[bytes]:
+        yield b'{"code":%d,"message":%s,"data":[' % (code, _dumps(message))
+        separator = b""
+        async for item in items:
+            yield separator
+            yield _dumps(item)
+            separator = b","
+        yield b"]}"
+
+    return StreamingResponse(
+        _buffered(body()), status_code=code, media_type="application/json"
+    )
+
+
+async def stream_ndjson(
+    items: AsyncIterator[Any], filename: str | None = None
+) -> StreamingResponse:
+    """
+    Streams items as newline delimited JSON, one item per line.
+
+    Args:
+        items (AsyncIterator[Any]): The JSON serializable items, e.g. from a `Database.stream_*` method.
+        filename (str | None): Offers the response as a download with this file name.
+
+    Returns:
+        StreamingResponse: The response streaming the items.
+
+    Raises:
+        DatabaseUnavailableError: If the items could not be queried at all.
+    """
+
+    items = await _prime(items)
+
+    async def body() -> AsyncIterator[bytes]:
+        async for item in items:
+            yield _dumps(item)
+            yield b"\n"
+
+    headers = {}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(
+        _buffered(body()), media_type="application/x-ndjson", headers=headers
+    )
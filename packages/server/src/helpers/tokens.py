@@ -0,0 +1,338 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Signed, stateless session tokens and their revocation list
+
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from helpers.types import SessionTokenClaims
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class SessionTokens:
+    """
+    Issues and verifies HMAC-SHA256 signed session tokens.
+
+    A token has the form `<payload>.<signature>`, where the payload is the base64url encoded JSON of the
+    session id (the `token` column of the `Sessions` row), the owner's UUID, the creation time and the expiry.
+    Verifying a token only needs the secret, no database access.
+
+    Attributes:
+        lifetime (int): The number of seconds an issued token stays valid.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        lifetime: int,
+        timer: Callable[[], float] = time.time,
+    ):
+        if not secret:
+            raise ValueError("A secret is required to sign session tokens")
+
+        self.lifetime = lifetime
+        self._secret = secret.encode("utf-8")
+        self._timer = timer
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._secret, payload.encode("ascii"), hashlib.sha256)
+        return _b64encode(digest.digest())
+
+    def issue(self, session_id: UUID, user_uuid: UUID, created_at: datetime) -> str:
+        """
+        Issues a signed token for an existing session.
+
+        Args:
+            session_id (UUID): The id of the session row backing the token.
+            user_uuid (UUID): The UUID of the session owner (user).
+            created_at (datetime): The timestamp when the session was created.
+
+        Returns:
+            str: The signed session token.
+        """
+
+        payload = _b64encode(
+            json.dumps(
+                {
+                    "sid": str(session_id),
+                    "sub": str(user_uuid),
+                    "iat": created_at.isoformat(),
+                    "exp": int(self._timer()) + self.lifetime,
+                },
+                separators=(",", ":"),
+            ).encode("utf-8")
+        )
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token: str) -> Optional[SessionTokenClaims]:
+        """
+        Verifies the signature and expiry of a token.
+
+        Args:
+            token (str): The signed session token.
+
+        Returns:
+            Optional[SessionTokenClaims]: The claims carried by the token, or None if it is malformed,
+                tampered with or expired.
+        """
+
+        payload, _, signature = token.partition(".")
+        if not payload or not signature:
+            return None
+
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+
+        try:
+            data = json.loads(_b64decode(payload))
+            claims = SessionTokenClaims(
+                session_id=UUID(data["sid"]),
+                user_uuid=UUID(data["sub"]),
+                created_at=datetime.fromisoformat(data["iat"]),
+                expires_at=int(data["exp"]),
+            )
+        except (ValueError, KeyError, TypeError):
+            return None
+
+        if claims["expires_at"] <= self._timer():
+            return None
+
+        return claims
+
+    @staticmethod
+    def is_signed(token: UUID | str) -> bool:
+        """
+        Checks whether a token looks like a signed token rather than an opaque session id.
+
+        Args:
+            token (UUID | str): The session token.
+
+        Returns:
+            bool: True if the token has the signed token form, False otherwise.
+        """
+
+        return isinstance(token, str) and "." in token
+
+
+# how far back cutoffs are fetched again, so cutoffs committed late by a slow transaction are not missed
+CUTOFF_OVERLAP = timedelta(minutes=1)
+
+
+class RevocationList:
+    """
+    Tracks which signed tokens have been revoked.
+
+    Tokens revoked by this process are added immediately. Tokens revoked elsewhere (another worker, or
+    a deleted account) are found by `refresh`, which checks every session id this process has seen
+    against the `Sessions` table. Only unexpired tokens are remembered, so the list stays small.
+
+    Revoking every session of a user at once also records a cutoff, the database time of the
+    revocation, and every token of the user created at or before it is rejected, including tokens this
+    process never saw. Cutoffs are stored in the database, and other processes load them with
+    `apply_cutoffs`. A cutoff is forgotten once every token it covers has expired.
+
+    Attributes:
+        lifetime (int): The lifetime of issued tokens, used when a revoked token's expiry is unknown.
+    """
+
+    def __init__(self, lifetime: int, timer: Callable[[], float] = time.time):
+        self.lifetime = lifetime
+        self._timer = timer
+        self._lock = threading.Lock()
+        # session id -> (user uuid, expires at)
+        self._seen: Dict[UUID, tuple[UUID, int]] = {}
+        # session id -> expires at
+        self._revoked: Dict[UUID, int] = {}
+        # user uuid -> (revoked at, forgotten at)
+        self._cutoffs: Dict[UUID, Tuple[datetime, int]] = {}
+        # the latest cutoff loaded with `apply_cutoffs`
+        self._latest_cutoff: Optional[datetime] = None
+        self._refreshes = 0
+        self._last_refresh: Optional[float] = None
+
+    def observe(self, claims: SessionTokenClaims) -> None:
+        """
+        Records a verified token so that later refreshes can detect its revocation.
+
+        Args:
+            claims (SessionTokenClaims): The claims of the verified token.
+        """
+
+        with self._lock:
+            self._seen[claims["session_id"]] = (
+                claims["user_uuid"],
+                claims["expires_at"],
+            )
+
+    def is_revoked(self, claims: SessionTokenClaims) -> bool:
+        """
+        Checks whether a token has been revoked.
+
+        Args:
+            claims (SessionTokenClaims): The claims of the verified token.
+
+        Returns:
+            bool: True if the token has been revoked, False otherwise.
+        """
+
+        with self._lock:
+            if claims["session_id"] in self._revoked:
+                return True
+            cutoff = self._cutoffs.get(claims["user_uuid"])
+            return cutoff is not None and claims["created_at"] <= cutoff[0]
+
+    def _add_cutoff(self, user_uuid: UUID, revoked_at: datetime) -> bool:
+        cutoff = self._cutoffs.get(user_uuid)
+        if cutoff is not None and cutoff[0] >= revoked_at:
+            return False
+        self._cutoffs[user_uuid] = (revoked_at, int(self._timer()) + self.lifetime)
+        return True
+
+    def revoke(
+        self,
+        session_id: Optional[UUID] = None,
+        user_uuid: Optional[UUID] = None,
+        expires_at: Optional[int] = None,
+        revoked_at: Optional[datetime] = None,
+    ) -> None:
+        """
+        Revokes a single session, or every session of a user.
+
+        Args:
+            session_id (Optional[UUID]): The id of the session to revoke.
+            user_uuid (Optional[UUID]): Revokes every seen session owned by this user.
+            expires_at (Optional[int]): When the revoked token expires anyway, defaults to the seen expiry.
+            revoked_at (Optional[datetime]): With `user_uuid`, also rejects every token of the user
+                created at or before this database time, seen or not.
+        """
+
+        with self._lock:
+            if session_id:
+                seen = self._seen.pop(session_id, None)
+                if expires_at is None:
+                    expires_at = seen[1] if seen else int(self._timer()) + self.lifetime
+                self._revoked[session_id] = expires_at
+            if user_uuid:
+                for sid, (owner, exp) in list(self._seen.items()):
+                    if owner == user_uuid:
+                        del self._seen[sid]
+                        self._revoked[sid] = exp
+                if revoked_at:
+                    self._add_cutoff(user_uuid, revoked_at)
+
+    def cutoffs_since(self) -> Optional[datetime]:
+        """
+        Returns the database time from which cutoffs must be loaded, see `apply_cutoffs`.
+
+        Returns:
+            Optional[datetime]: Shortly before the latest loaded cutoff, or None if none were loaded yet,
+                in which case every cutoff younger than the token lifetime must be loaded.
+        """
+
+        with self._lock:
+            if self._latest_cutoff is None:
+                return None
+            return self._latest_cutoff - CUTOFF_OVERLAP
+
+    def apply_cutoffs(self, cutoffs: Iterable[Tuple[UUID, datetime]]) -> int:
+        """
+        Adds the cutoffs recorded in the database, e.g. by other processes.
+
+        Args:
+            cutoffs (Iterable[Tuple[UUID, datetime]]): The user uuids and revocation times to add.
+
+        Returns:
+            int: The number of new or later cutoffs.
+        """
+
+        with self._lock:
+            added = 0
+            for user_uuid, revoked_at in cutoffs:
+                added += self._add_cutoff(user_uuid, revoked_at)
+                if self._latest_cutoff is None or revoked_at > self._latest_cutoff:
+                    self._latest_cutoff = revoked_at
+            return added
+
+    def refresh(self, fetch_live: Callable[[Iterable[UUID]], Set[UUID]]) -> int:
+        """
+        Revokes every seen session that no longer exists, and forgets expired tokens.
+
+        Args:
+            fetch_live (Callable[[Iterable[UUID]], Set[UUID]]): Given session ids, returns those still in the database.
+
+        Returns:
+            int: The number of newly revoked sessions.
+        """
+
+        candidates = self.refresh_candidates()
+        return self.apply_refresh(
+            candidates, fetch_live(candidates) if candidates else set()
+        )
+
+    def refresh_candidates(self) -> List[UUID]:
+        """
+        Forgets expired tokens and returns the session ids which must be checked against the database.
+        Together with `apply_refresh`, this lets callers fetch the live sessions asynchronously.
+
+        Returns:
+            List[UUID]: The ids of the seen, unexpired sessions.
+        """
+
+        now = int(self._timer())
+        with self._lock:
+            self._seen = {s: v for s, v in self._seen.items() if v[1] > now}
+            self._revoked = {s: e for s, e in self._revoked.items() if e > now}
+            self._cutoffs = {u: c for u, c in self._cutoffs.items() if c[1] > now}
+            return list(self._seen)
+
+    def apply_refresh(self, candidates: Iterable[UUID], live: Set[UUID]) -> int:
+        """
+        Revokes every candidate session which is not live.
+
+        Args:
+            candidates (Iterable[UUID]): The session ids returned by `refresh_candidates`.
+            live (Set[UUID]): The subset of `candidates` which still exist in the database.
+
+        Returns:
+            int: The number of newly revoked sessions.
+        """
+
+        with self._lock:
+            revoked = 0
+            for sid in candidates:
+                if sid not in live and sid in self._seen:
+                    self._revoked[sid] = self._seen.pop(sid)[1]
+                    revoked += 1
+            self._refreshes += 1
+            self._last_refresh = self._timer()
+            return revoked
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the revocation list counters.
+
+        Returns:
+            Dict[str, float]: The number of tracked and revoked tokens and of cutoffs, and refresh statistics.
+        """
+
+        with self._lock:
+            return {
+                "tracked": len(self._seen),
+                "revoked": len(self._revoked),
+                "cutoffs": len(self._cutoffs),
+                "refreshes": self._refreshes,
+                "last_refresh": self._last_refresh,
+            }
@@ -2,7 +2,8 @@
 # @description: Types for the server
 
 from datetime import datetime
-from typing import Optional, TypedDict
+from typing import Literal, Optional, TypedDict
+from uuid import UUID
 
 
 class QuestionWithTagsDict(TypedDict):
@@ -23,31 +24,46 @@ class QuestionDict(TypedDict):
     option4: Optional[str]
 
 
+class QuestionImportErrorDict(TypedDict):
+    line: int
+    error: str
+
+
+class QuestionImportDict(TypedDict):
+    received: int
+    imported: int
+    tags: int
+    errors: list[QuestionImportErrorDict]
+
+
 class QuestionTagDict(TypedDict):
     question_id: int
     tag_id: int
 
 
+class QuestionTagUpdateDict(TypedDict):
+    question_id: int
+    tag_id: int
+    action: Literal["assign", "remove"]
+    status: str
+
+
 class SessionDict(TypedDict):
-    user_uuid: str
-    token: str
+    user_uuid: UUID
+    # the session id, or a signed token when signed tokens are enabled
+    token: UUID | str
+    device: Optional[str]
     created_at: datetime
 
 
-class StatisticsDict(TypedDict):
-    user_uuid: str
-    xp: int
-    wins: int
-    losses: int
+class SessionTokenClaims(TypedDict):
+    session_id: UUID
+    user_uuid: UUID
+    created_at: datetime
+    expires_at: int
 
 
 class TagDict(TypedDict):
     id: int
     name: str
     description: str
-
-
-class UserDict(TypedDict):
-    uuid: str
-    username: str
-    password_hash: str
@@ -1,23 +1,54 @@
 # @author: adibarra (Alec Ibarra)
 # @description: The main entry point for the server.
 
+import math
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
 
-from config import API_CORS_ORIGINS_REGEX, API_HOST, API_PORT
+from config import (
+    API_CORS_ORIGINS_REGEX,
+    API_HOST,
+    API_PORT,
+    DATABASE_BREAKER_RESET,
+    DATABASE_QUERY_LOG,
+)
+from helpers.requireDeadline import requireDeadline
 from routes.api.health import router as api_health_router
+from routes.api.metrics import router as api_metrics_router
 from routes.api.v1.question_tags import router as api_v1_question_tags_router
 from routes.api.v1.questions import router as api_v1_questions_router
 from routes.api.v1.sessions import router as api_v1_sessions_router
 from routes.api.v1.statistics import router as api_v1_statistics_router
 from routes.api.v1.tags import router as api_v1_tags_router
 from routes.api.v1.users import router as api_v1_users_router
+from services.database import Database
+from services.database.errors import (
+    CircuitOpenError,
+    DatabaseUnavailableError,
+    DeadlineExceededError,
+    PoolTimeoutError,
+)
+from services.database.instrumentation import track_queries
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = Database()
+    await db.open()
+    yield
+    await db.close()
+
+
+app = FastAPI(
+    lifespan=lifespan,
+    dependencies=[Depends(requireDeadline, scope="function")],
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,9 +56,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "Server-Timing"],
 )
 
 
+@app.middleware("http")
+async def query_stats_middleware(request: Request, call_next):
+    with track_queries() as stats:
+        response = await call_next(request)
+
+    response.headers["X-DB-Queries"] = str(stats.queries)
+    response.headers["Server-Timing"] = f"db;dur={stats.db_time * 1000:.2f}"
+    if DATABASE_QUERY_LOG:
+        print(
+            f"{request.method} {request.url.path} {response.status_code}:",
+            f"queries={stats.queries} rows={stats.rows} checkouts={stats.checkouts}",
+            f"db={stats.db_time * 1000:.2f}ms",
+            flush=True,
+        )
+    return response
+
+
 @app.exception_handler(ValidationError)
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, e: RequestValidationError):
@@ -38,17 +87,45 @@ async def validation_exception_handler(request, e: RequestValidationError):
     )
 
 
+@app.exception_handler(DatabaseUnavailableError)
+async def database_unavailable_handler(request, e: DatabaseUnavailableError):
+    if isinstance(e, DeadlineExceededError):
+        print("Deadline exceeded:", e, flush=True)
+        return JSONResponse(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            content={"code": 504, "message": "Gateway Timeout: Request took too long"},
+        )
+
+    print("Database unavailable:", e, flush=True)
+    if isinstance(e, CircuitOpenError):
+        message = "Service Unavailable: Database is down"
+        retry_after = max(1, math.ceil(DATABASE_BREAKER_RESET))
+    elif isinstance(e, PoolTimeoutError):
+        message = "Service Unavailable: Database is busy"
+        retry_after = 1
+    else:
+        message = "Service Unavailable: Database is unreachable"
+        retry_after = 1
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"code": 503, "message": message},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, e: HTTPException):
     print("HTTP error:", e)
     return JSONResponse(
         status_code=e.status_code,
         content={"code": e.status_code, "message": e.detail},
+        headers=e.headers,
     )
 
 
 # TODO: add all routers here
 app.include_router(api_health_router)
+app.include_router(api_metrics_router)
 app.include_router(api_v1_question_tags_router)
 app.include_router(api_v1_questions_router)
 app.include_router(api_v1_sessions_router)
@@ -3,12 +3,15 @@
 
 from typing import Optional
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Response, status
 from pydantic import BaseModel
 
+from services.database import Database
+
 router = APIRouter(
     prefix="/api",
 )
+db = Database()
 
 
 class HealthCheckResponse(BaseModel):
@@ -20,8 +23,27 @@ class HealthCheckResponse(BaseModel):
         exclude_none = True
 
 
+def _breaker_state(pool) -> str:
+    # lets health checks drive recovery while no requests reach the database
+    pool.probe_if_due()
+    return pool.breaker.state if pool.breaker is not None else "disabled"
+
+
 @router.get(
     "/health", response_model=HealthCheckResponse, status_code=status.HTTP_200_OK
 )
-async def health_check():
-    return HealthCheckResponse(code=200, message="Ok", data={"status": "Healthy"})
+async def health_check(response: Response):
+    database = _breaker_state(db.connectionPool)
+    data = {
+        "status": "Healthy" if database in ("closed", "disabled") else "Unavailable",
+        "database": database,
+    }
+    if db.replicas.pools:
+        data["replicas"] = [_breaker_state(pool) for pool in db.replicas.pools]
+
+    if data["status"] != "Healthy":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return HealthCheckResponse(
+            code=503, message="Service Unavailable: Database is down", data=data
+        )
+    return HealthCheckResponse(code=200, message="Ok", data=data)
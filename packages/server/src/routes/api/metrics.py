@@ -0,0 +1,27 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Metrics route for the API
+
+from typing import Optional
+
+from fastapi import APIRouter, status
+from pydantic import BaseModel
+
+from helpers import metrics
+
+router = APIRouter(
+    prefix="/api",
+)
+
+
+class MetricsResponse(BaseModel):
+    code: int
+    message: str
+    data: Optional[dict] = None
+
+    class Config:
+        exclude_none = True
+
+
+@router.get("/metrics", response_model=MetricsResponse, status_code=status.HTTP_200_OK)
+async def get_metrics():
+    return MetricsResponse(code=200, message="Ok", data=metrics.collect())
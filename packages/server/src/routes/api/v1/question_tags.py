@@ -1,14 +1,17 @@
 # @author: Adi-K527 (Adi Kandakurtikar)
 # @description: Question tag routes for the API
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from fastapi import APIRouter, Body, Depends, HTTPException, status
 from pydantic import BaseModel
 
 from helpers.requireAuth import requireAuth
+from helpers.requirePartition import requirePartition
+from helpers.streaming import stream_json
 from helpers.types import SessionDict
 from services.database import Database
+from services.database.partitions import ADMIN
 
 db = Database()
 router = APIRouter(
@@ -26,6 +29,27 @@ class QuestionTagRequest(BaseModel):
     tag_id: int
 
 
+class QuestionTagBatchRequest(BaseModel):
+    assign: List[QuestionTagRequest] = []
+    remove: List[QuestionTagRequest] = []
+
+
+class QuestionTagBatchData(BaseModel):
+    question_id: int
+    tag_id: int
+    action: Literal["assign", "remove"]
+    status: str
+
+
+class QuestionTagBatchResponse(BaseModel):
+    code: int
+    message: str
+    data: Optional[List[QuestionTagBatchData]] = None
+
+    class Config:
+        exclude_none = True
+
+
 class QuestionTagResponse(BaseModel):
     code: int
     message: str
@@ -40,11 +64,10 @@ class QuestionTagResponse(BaseModel):
     response_model=QuestionTagResponse,
     status_code=status.HTTP_200_OK,
 )
-def get_tags(
+async def get_tags(
     session: SessionDict = Depends(requireAuth),
 ):
-    tags = db.get_question_tags()
-    return QuestionTagResponse(code=200, message="Ok", data=tags)
+    return await stream_json(db.stream_question_tags())
 
 
 @router.get(
@@ -52,12 +75,12 @@ def get_tags(
     response_model=QuestionTagResponse,
     status_code=status.HTTP_200_OK,
 )
-def get_tag(
+async def get_tag(
     question_id: int,
     tag_id: int,
     session: SessionDict = Depends(requireAuth),
 ):
-    question_tag = db.get_question_tag(question_id, tag_id)
+    question_tag = await db.get_question_tag(question_id, tag_id)
     if not question_tag:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -71,12 +94,13 @@ def get_tag(
     "/question-tags",
     response_model=QuestionTagResponse,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(requirePartition(ADMIN), scope="function")],
 )
-def create_question_tag(
+async def create_question_tag(
     request: QuestionTagRequest = Body(...),
     session: SessionDict = Depends(requireAuth),
 ):
-    new_question_tag_data = db.create_question_tag(request)
+    new_question_tag_data = await db.create_question_tag(request)
     if not new_question_tag_data:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -88,17 +112,49 @@ def create_question_tag(
     )
 
 
+@router.post(
+    "/question-tags/batch",
+    response_model=QuestionTagBatchResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(requirePartition(ADMIN), scope="function")],
+)
+async def update_question_tags(
+    request: QuestionTagBatchRequest = Body(...),
+    session: SessionDict = Depends(requireAuth),
+):
+    assign = [pair.model_dump() for pair in request.assign]
+    remove = [pair.model_dump() for pair in request.remove]
+    conflicting = {tuple(pair.values()) for pair in assign} & {
+        tuple(pair.values()) for pair in remove
+    }
+    if conflicting:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bad Request: Cannot both assign and remove {min(conflicting)}",
+        )
+
+    results = await db.update_question_tags(assign, remove)
+    if results is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update question tags",
+        )
+
+    return QuestionTagBatchResponse(code=200, message="Ok", data=results)
+
+
 @router.delete(
     "/question-tags/{question_id}/{tag_id}",
     response_model=QuestionTagResponse,
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(requirePartition(ADMIN), scope="function")],
 )
-def delete_tag(
+async def delete_tag(
     question_id: int,
     tag_id: int,
     session: SessionDict = Depends(requireAuth),
 ):
-    if not db.delete_question_tag(question_id, tag_id):
+    if not await db.delete_question_tag(question_id, tag_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Question tag {(question_id, tag_id)} not found",
@@ -1,14 +1,21 @@
 # @author: Adi-K527 (Adi Kandakurtikar)
 # @description: Questions routes for the API
 
-from typing import List
+import asyncio
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from config import IMPORT_MAX_BYTES, IMPORT_WORKERS
+from helpers.question_bank import prepare_question_bank
 from helpers.requireAuth import requireAuth
+from helpers.requirePartition import requirePartition
+from helpers.streaming import stream_json, stream_ndjson
 from helpers.types import QuestionWithTagsDict, SessionDict
 from services.database import Database
+from services.database.partitions import ADMIN
 
 db = Database()
 router = APIRouter(
@@ -40,16 +47,48 @@ class QuestionResponse(BaseModel):
         exclude_none = True
 
 
+class QuestionImportError(BaseModel):
+    line: int
+    error: str
+
+
+class QuestionImportData(BaseModel):
+    received: int
+    imported: int
+    tags: int
+    errors: List[QuestionImportError]
+
+
+class QuestionImportResponse(BaseModel):
+    code: int
+    message: str
+    data: QuestionImportData = None
+
+    class Config:
+        exclude_none = True
+
+
 @router.get(
     "/questions",
     response_model=QuestionResponse,
     status_code=status.HTTP_200_OK,
 )
-def get_questions(
+async def get_questions(
     session: SessionDict = Depends(requireAuth),
 ):
-    questions = db.get_questions()
-    return QuestionResponse(code=200, message="Ok", data=questions)
+    return await stream_json(db.stream_questions())
+
+
+@router.get(
+    "/questions/export",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def export_questions(
+    session: SessionDict = Depends(requireAuth),
+):
+    # one question per line, in the format accepted by /questions/import
+    return await stream_ndjson(db.stream_questions(), filename="questions.jsonl")
 
 
 @router.get(
@@ -57,11 +96,11 @@ def get_questions(
     response_model=QuestionResponse,
     status_code=status.HTTP_200_OK,
 )
-def get_question(
+async def get_question(
     question_id: int,
     session: SessionDict = Depends(requireAuth),
 ):
-    question = db.get_question(question_id)
+    question = await db.get_question(question_id)
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -75,12 +114,13 @@ def get_question(
     "/questions",
     response_model=QuestionResponse,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(requirePartition(ADMIN), scope="function")],
 )
-def create_question(
+async def create_question(
     request: QuestionRequest,
     session: SessionDict = Depends(requireAuth),
 ):
-    new_question = db.create_question(
+    new_question = await db.create_question(
         QuestionWithTagsDict(
             question=request.question,
             difficulty=request.difficulty,
@@ -97,6 +137,56 @@ def create_question(
     return QuestionResponse(code=201, message="Created", data=[new_question])
 
 
+@router.post(
+    "/questions/import",
+    response_model=QuestionImportResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(requirePartition(ADMIN), scope="function")],
+)
+async def import_questions(
+    request: Request,
+    format: Optional[Literal["csv", "jsonl"]] = None,
+    session: SessionDict = Depends(requireAuth),
+):
+    content_type = request.headers.get("content-type", "")
+    if format is None:
+        format = "csv" if "csv" in content_type else "jsonl"
+
+    content = bytearray()
+    async for chunk in request.stream():
+        content += chunk
+        if len(content) > IMPORT_MAX_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Content Too Large: Question banks may be at most {IMPORT_MAX_BYTES} bytes",
+            )
+
+    try:
+        # parsing and validation are CPU bound, keep them off the event loop
+        rows, errors = await asyncio.to_thread(
+            prepare_question_bank,
+            content.decode("utf-8-sig"),
+            format,
+            IMPORT_WORKERS,
+        )
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bad Request: {e}",
+        )
+
+    result = await db.import_questions(rows)
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import the questions",
+        )
+
+    result["received"] += len(errors)
+    result["errors"] = sorted(errors + result["errors"], key=lambda e: e["line"])
+    return QuestionImportResponse(code=200, message="Ok", data=result)
+
+
 # @router.delete(
 #     "/questions/{question_id}",
 #     response_model=QuestionResponse,
@@ -106,7 +196,7 @@ def create_question(
 #     question_id: int,
 #     session: SessionDict = Depends(requireAuth),
 # ):
-#     if not db.delete_question(question_id):
+#     if not await db.delete_question(question_id):
 #         raise HTTPException(
 #             status_code=status.HTTP_404_NOT_FOUND,
 #             detail=f"Question with id {question_id} not found",
@@ -3,16 +3,28 @@
 
 from datetime import datetime
 from typing import Optional
-
-from fastapi import APIRouter, Body, Depends, HTTPException, status
-from pydantic import UUID4, BaseModel
+from uuid import UUID
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Body,
+    Depends,
+    HTTPException,
+    Request,
+    status,
+)
+from pydantic import UUID4, BaseModel, Field
 
 from helpers.auth import Auth
+from helpers.requireAdmission import requireAdmission
 from helpers.requireAuth import requireAuth
 from helpers.types import SessionDict
 from services.database import Database
+from services.hashing import HashingQueueFullError, HashingService
 
 db = Database()
+hasher = HashingService()
 router = APIRouter(
     prefix="/api/v1",
 )
@@ -20,13 +32,15 @@ router = APIRouter(
 
 class SessionData(BaseModel):
     user_uuid: UUID4
-    token: UUID4
+    token: UUID | str
+    device: Optional[str] = None
     created_at: datetime
 
 
 class SessionRequest(BaseModel):
     username: str
     password: str
+    device: Optional[str] = Field(None, max_length=64)
 
 
 class SessionResponse(BaseModel):
@@ -38,26 +52,65 @@ class SessionResponse(BaseModel):
         exclude_none = True
 
 
+async def rehash_password(user_uuid: UUID, password: str, password_hash: str):
+    """
+    Upgrades a user's stale password hash to the current argon2 parameters.
+
+    Runs after the login response has been sent, so the extra hash does not add to login latency.
+    """
+
+    try:
+        new_password_hash = await hasher.hash_password(password)
+    except HashingQueueFullError:
+        # try again on the next login
+        return
+
+    await db.replace_password_hash(user_uuid, password_hash, new_password_hash)
+
+
 @router.post(
     "/sessions", response_model=SessionResponse, status_code=status.HTTP_201_CREATED
 )
-def create_session(
+async def create_session(
+    request: Request,
+    background_tasks: BackgroundTasks,
     data: SessionRequest = Body(...),
 ):
-    user = db.get_user(username=data.username)
+    requireAdmission(request, data.username)
+
+    user = await db.get_user(username=data.username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Not Found: User not found",
         )
 
-    if not Auth.verify_password(data.password, user["password_hash"]):
+    if Auth.is_legacy_hash(user["password_hash"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Forbidden: Password must be reset",
+        )
+
+    try:
+        verified = await hasher.verify_password(data.password, user["password_hash"])
+    except HashingQueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service Unavailable: Too many login attempts, try again later",
+        )
+
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Forbidden: Incorrect password",
         )
 
-    session = db.create_session(str(user["uuid"]))
+    if Auth.needs_rehash(user["password_hash"]):
+        background_tasks.add_task(
+            rehash_password, user["uuid"], data.password, user["password_hash"]
+        )
+
+    session = await db.create_session(user["uuid"], device=data.device)
     if session is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -70,10 +123,10 @@ def create_session(
 @router.delete(
     "/sessions", response_model=SessionResponse, status_code=status.HTTP_200_OK
 )
-def delete_session(
+async def delete_session(
     session: SessionDict = Depends(requireAuth),
 ):
-    if not db.delete_session(token=session["token"]):
+    if not await db.delete_session(token=session["token"]):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Not Found: Session not found",
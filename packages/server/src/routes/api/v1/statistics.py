@@ -7,6 +7,7 @@ from fastapi import APIRouter, Body, Depends, HTTPException, status
 from pydantic import UUID4, BaseModel
 
 from helpers.requireAuth import requireAuth
+from helpers.requireTransaction import requireTransaction
 from helpers.types import SessionDict
 from services.database import Database
 
@@ -40,11 +41,12 @@ class SessionResponse(BaseModel):
     "/statistics",
     response_model=SessionResponse,
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(requireTransaction, scope="function")],
 )
-def get_statistics(
+async def get_statistics(
     session: SessionDict = Depends(requireAuth),
 ):
-    statistics = db.get_statistics(uuid=session["user_uuid"])
+    statistics = await db.get_statistics(uuid=session["user_uuid"])
     if not statistics:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -58,21 +60,22 @@ def get_statistics(
     "/statistics",
     response_model=SessionResponse,
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(requireTransaction, scope="function")],
 )
-def update_statistics(
+async def update_statistics(
     data: StatisticsRequest = Body(...),
     session: SessionDict = Depends(requireAuth),
 ):
-    if not db.update_statistics(
+    statistics = await db.update_statistics(
         uuid=session["user_uuid"],
         xp_increment=10 if data.correct else 2,
         wins_increment=1 if data.correct else 0,
         losses_increment=0 if data.correct else 1,
-    ):
+    )
+    if not statistics:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error",
         )
 
-    statistics = db.get_statistics(uuid=session["user_uuid"])
     return SessionResponse(code=200, message="Ok", data=statistics)
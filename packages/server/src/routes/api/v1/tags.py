@@ -7,8 +7,11 @@ from fastapi import APIRouter, Body, Depends, HTTPException, status
 from pydantic import BaseModel
 
 from helpers.requireAuth import requireAuth
+from helpers.requirePartition import requirePartition
+from helpers.streaming import stream_json
 from helpers.types import SessionDict
 from services.database import Database
+from services.database.partitions import ADMIN
 
 db = Database()
 router = APIRouter(
@@ -41,11 +44,10 @@ class TagResponse(BaseModel):
     response_model=TagResponse,
     status_code=status.HTTP_200_OK,
 )
-def get_tags(
+async def get_tags(
     session: SessionDict = Depends(requireAuth),
 ):
-    tags = db.get_tags()
-    return TagResponse(code=200, message="Ok", data=tags)
+    return await stream_json(db.stream_tags())
 
 
 @router.get(
@@ -53,11 +55,11 @@ def get_tags(
     response_model=TagResponse,
     status_code=status.HTTP_200_OK,
 )
-def get_tag(
+async def get_tag(
     tag_id: int,
     session: SessionDict = Depends(requireAuth),
 ):
-    tag = db.get_tag(tag_id)
+    tag = await db.get_tag(tag_id)
     if not tag:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -71,12 +73,13 @@ def get_tag(
     "/tags",
     response_model=TagResponse,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(requirePartition(ADMIN), scope="function")],
 )
-def create_tag(
+async def create_tag(
     request: TagRequest = Body(...),
     session: SessionDict = Depends(requireAuth),
 ):
-    new_tag_data = db.create_tag(request)
+    new_tag_data = await db.create_tag(request)
     print(new_tag_data)
     if not new_tag_data:
         raise HTTPException(
@@ -91,12 +94,13 @@ def create_tag(
     "/tags/{tag_id}",
     response_model=TagResponse,
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(requirePartition(ADMIN), scope="function")],
 )
-def delete_tag(
+async def delete_tag(
     tag_id: int,
     session: SessionDict = Depends(requireAuth),
 ):
-    if not db.delete_tag(tag_id):
+    if not await db.delete_tag(tag_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Tag with id {tag_id} not found",
@@ -3,15 +3,18 @@
 
 from typing import Optional
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Request, status
 from pydantic import UUID4, BaseModel
 
 from helpers.auth import Auth
+from helpers.requireAdmission import requireAdmission
 from helpers.requireAuth import requireAuth
 from helpers.types import SessionDict
 from services.database import Database
+from services.hashing import HashingQueueFullError, HashingService
 
 db = Database()
+hasher = HashingService()
 router = APIRouter(prefix="/api/v1")
 
 
@@ -47,7 +50,7 @@ class UserResponse(BaseModel):
     response_model=UserResponse,
     status_code=status.HTTP_201_CREATED,
 )
-def create_user(data: CreateUserRequest = Body(...)):
+async def create_user(request: Request, data: CreateUserRequest = Body(...)):
     try:
         Auth.validate_username(data.username)
         Auth.validate_password(data.password)
@@ -57,7 +60,17 @@ def create_user(data: CreateUserRequest = Body(...)):
             detail="Bad Request: Username or password invalid",
         )
 
-    user = db.create_user(data.username, Auth.hash_password(data.password))
+    requireAdmission(request, data.username)
+
+    try:
+        password_hash = await hasher.hash_password(data.password)
+    except HashingQueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service Unavailable: Too many requests, try again later",
+        )
+
+    user = await db.create_user(data.username, password_hash)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -72,18 +85,17 @@ def create_user(data: CreateUserRequest = Body(...)):
     response_model=UserResponse,
     status_code=status.HTTP_200_OK,
 )
-def get_user(
+async def get_user(
     uuid: UUID4 = Path(...),
     session: SessionDict = Depends(requireAuth),
 ):
-    if str(uuid) != session["user_uuid"]:
+    if uuid != session["user_uuid"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Forbidden: User does not have permission",
         )
 
-    user = db.get_user(uuid=str(uuid))
-    user["password_hash"] = None
+    user = await db.get_user(uuid=uuid)
     return UserResponse(code=200, message="Ok", data=user)
 
 
@@ -92,7 +104,7 @@ def get_user(
     response_model=UserResponse,
     status_code=status.HTTP_200_OK,
 )
-def patch_user(
+async def patch_user(
     data: UpdateUserRequest = Body(...),
     session: SessionDict = Depends(requireAuth),
 ):
@@ -107,18 +119,27 @@ def patch_user(
             detail="Bad Request: Username or password invalid",
         )
 
-    if not db.update_user(
+    try:
+        password_hash = (
+            await hasher.hash_password(data.password) if data.password else None
+        )
+    except HashingQueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service Unavailable: Too many requests, try again later",
+        )
+
+    user = await db.update_user(
         session["user_uuid"],
         username=data.username,
-        password_hash=Auth.hash_password(data.password) if data.password else None,
-    ):
+        password_hash=password_hash,
+    )
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Conflict",
         )
 
-    user = db.get_user(uuid=session["user_uuid"])
-    user["password_hash"] = None
     return UserResponse(code=200, message="Ok", data=user)
 
 
@@ -127,10 +148,10 @@ def patch_user(
     response_model=UserResponse,
     status_code=status.HTTP_200_OK,
 )
-def delete_user(
+async def delete_user(
     session: SessionDict = Depends(requireAuth),
 ):
-    if not db.delete_user(uuid=session["user_uuid"]):
+    if not await db.delete_user(uuid=session["user_uuid"]):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal Server Error",
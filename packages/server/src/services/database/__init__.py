@@ -1,4 +1,10 @@
 # @author: adibarra (Alec Ibarra)
 # @description: Exports the Database class for use in other modules
 
-from .database import Database  # noqa: F401
+from config import DATABASE_BACKEND
+
+# the backend is picked once, every `Database()` returns the same instance of it
+if DATABASE_BACKEND == "memory":
+    from .memory import MemoryDatabase as Database  # noqa: F401
+else:
+    from .database import Database  # noqa: F401
@@ -0,0 +1,227 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Write-behind aggregator which batches statistics increments into one statement per flush
+
+import asyncio
+import contextvars
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+
+from services.database.partitions import GAMEPLAY
+from services.database.rows import Record, record_maker
+
+if TYPE_CHECKING:
+    from services.database.pool import ConnectionPool
+    from services.database.shards import ShardSet
+
+STATISTICS = record_maker(("user_uuid", "xp", "wins", "losses"))
+
+# one upsert for every user of a flush, in uuid order so concurrent flushes lock rows in the same order,
+# increments of users deleted in the meantime are dropped
+FLUSH_STATISTICS = """
+    INSERT INTO Statistics (user_uuid, xp, wins, losses)
+    SELECT d.user_uuid, d.xp, d.wins, d.losses
+    FROM unnest(%s::uuid[], %s::bigint[], %s::int[], %s::int[]) AS d(user_uuid, xp, wins, losses)
+    JOIN Users ON Users.uuid = d.user_uuid
+    ORDER BY d.user_uuid
+    ON CONFLICT (user_uuid) DO UPDATE
+    SET xp = Statistics.xp + EXCLUDED.xp,
+        wins = Statistics.wins + EXCLUDED.wins,
+        losses = Statistics.losses + EXCLUDED.losses
+"""
+
+
+def _accumulate(deltas: Dict[UUID, List[int]], uuid: UUID, delta: List[int]) -> None:
+    pending = deltas.get(uuid)
+    if pending is None:
+        deltas[uuid] = list(delta)
+    else:
+        for i, value in enumerate(delta):
+            pending[i] += value
+
+
+class StatisticsAggregator:
+    """
+    Accumulates the xp, wins and losses increments of every user in memory, and writes them with one
+    batched upsert per shard instead of one statement and commit per answered question. A flush runs
+    every `STATISTICS_FLUSH_INTERVAL` seconds (see `Database.open`), or as soon as `max_users` users
+    have pending increments.
+
+    Reads go through `read`, which adds the increments not committed yet to the row read from the
+    database. Increments of a failed flush are kept for the next one, and `close` flushes whatever is
+    left on shutdown. If the outcome of a commit is unknown, e.g. the connection dropped while
+    committing, its increments are kept as well, so they are applied at least once.
+
+    Attributes:
+        max_users (int): The number of users with pending increments which triggers a flush.
+    """
+
+    def __init__(self, shards: "ShardSet", max_users: int):
+        self.shards = shards
+        self.max_users = max_users
+        self._pending: Dict[UUID, List[int]] = {}
+        # increments taken by the running flush, not committed yet
+        self._flushing: Dict[UUID, List[int]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # odd while a flush commits, so a read can tell whether a commit raced with it, like a seqlock
+        self._epoch = 0
+        self._committed = asyncio.Event()
+        self._committed.set()
+        self._flushes = 0
+        self._flushed_users = 0
+        self._failures = 0
+        self._last_flush_ms = 0.0
+
+    def add(self, uuid: UUID, xp: int, wins: int, losses: int) -> None:
+        """
+        Adds increments to a user's pending statistics, starting a flush if enough users have some.
+        Must be called from the running event loop.
+
+        Args:
+            uuid (UUID): The UUID of the user.
+            xp (int): The amount to add to the user's XP.
+            wins (int): The number of wins to add.
+            losses (int): The number of losses to add.
+        """
+
+        _accumulate(self._pending, uuid, [xp, wins, losses])
+        if len(self._pending) >= self.max_users and (
+            self._task is None or self._task.done()
+        ):
+            # in a fresh context, so the flush is neither bound by the request deadline nor counted
+            # as queries of the request
+            self._task = asyncio.get_running_loop().create_task(
+                self.flush(), context=contextvars.Context()
+            )
+
+    def _merge(self, record: Record) -> Record:
+        xp, wins, losses = record["xp"], record["wins"], record["losses"]
+        for deltas in (self._flushing, self._pending):
+            delta = deltas.get(record["user_uuid"])
+            if delta is not None:
+                xp, wins, losses = xp + delta[0], wins + delta[1], losses + delta[2]
+        return STATISTICS([record["user_uuid"], xp, wins, losses])
+
+    async def read(
+        self, read: Callable[[], Awaitable[Optional[Record]]]
+    ) -> Optional[Record]:
+        """
+        Reads a user's statistics and adds their increments not committed yet.
+
+        The row is read again if a flush committed while it was being read, since it may or may not
+        include that flush's increments.
+
+        Args:
+            read (Callable[[], Awaitable[Optional[Record]]]): Reads the user's statistics from the database.
+
+        Returns:
+            Optional[Record]: The user's statistics with their pending increments, or None if `read` failed.
+        """
+
+        while True:
+            epoch = self._epoch
+            if epoch % 2:
+                await self._committed.wait()
+                continue
+
+            record = await read()
+            if record is None:
+                return None
+            if self._epoch == epoch:
+                return self._merge(record)
+
+    async def _flush_to(self, pool: "ConnectionPool", users: List[UUID]) -> bool:
+        conn = None
+        try:
+            conn = await pool.getconn(partition=GAMEPLAY)
+            deltas = [self._flushing[uuid] for uuid in users]
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    FLUSH_STATISTICS,
+                    [users] + [[delta[i] for delta in deltas] for i in range(3)],
+                    prepare=pool.prepare,
+                )
+
+            self._epoch += 1
+            self._committed.clear()
+            try:
+                await conn.commit()
+                for uuid in users:
+                    del self._flushing[uuid]
+            finally:
+                self._epoch += 1
+                self._committed.set()
+            return True
+        except Exception as e:
+            print("Failed to flush statistics:", e, flush=True)
+            self._failures += 1
+            return False
+        finally:
+            if conn:
+                await pool.putconn(conn)
+
+    async def flush(self) -> int:
+        """
+        Writes the pending increments of every user, with one statement and commit per shard.
+
+        Returns:
+            int: The number of users whose increments were written.
+        """
+
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            start = time.perf_counter()
+            self._flushing, self._pending = self._pending, {}
+            by_pool: Dict[Any, List[UUID]] = {}
+            for uuid in self._flushing:
+                by_pool.setdefault(self.shards.pool_for(uuid), []).append(uuid)
+
+            flushed = 0
+            try:
+                for pool, users in by_pool.items():
+                    users.sort()
+                    if await self._flush_to(pool, users):
+                        flushed += len(users)
+            finally:
+                # the increments which could not be written, e.g. because the flush was cancelled,
+                # wait for the next flush
+                for uuid, delta in self._flushing.items():
+                    _accumulate(self._pending, uuid, delta)
+                self._flushing = {}
+
+            self._flushes += 1
+            self._flushed_users += flushed
+            self._last_flush_ms = round((time.perf_counter() - start) * 1000, 3)
+            return flushed
+
+    async def close(self) -> None:
+        """
+        Flushes the pending increments, e.g. on shutdown before the connection pools are closed.
+        """
+
+        await self.flush()
+        if self._pending:
+            print(
+                f"Could not flush the statistics of {len(self._pending)} users on shutdown",
+                flush=True,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the aggregator gauges and counters.
+
+        Returns:
+            Dict[str, Any]: The number of users with pending increments, and the flush counters and timing.
+        """
+
+        return {
+            "pending_users": len(self._pending) + len(self._flushing),
+            "max_users": self.max_users,
+            "flushes": self._flushes,
+            "flushed_users": self._flushed_users,
+            "failures": self._failures,
+            "last_flush_ms": self._last_flush_ms,
+        }
@@ -1,12 +1,48 @@
 # @author: adibarra (Alec Ibarra)
 # @description: Database class for handling database interactions
 
-import os
+import asyncio
+from typing import List
 
-import psycopg2
-from psycopg2 import pool
+import psycopg
 
-from config import SERVICE_POSTGRES_URI
+from config import (
+    DATABASE_BREAKER_FAILURES,
+    DATABASE_BREAKER_RESET,
+    DATABASE_POOL_MAX,
+    DATABASE_POOL_MAX_LIFETIME,
+    DATABASE_POOL_MIN,
+    DATABASE_POOL_PARTITIONS,
+    DATABASE_POOL_PING_AFTER,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_PREPARED_MAX,
+    DATABASE_PREPARED_STATEMENTS,
+    DATABASE_REPLICA_CHECK_INTERVAL,
+    DATABASE_REPLICA_MAX_LAG,
+    DATABASE_SEED,
+    SERVICE_POSTGRES_REPLICA_URIS,
+    SERVICE_POSTGRES_SHARD_URIS,
+    SERVICE_POSTGRES_URI,
+    SESSION_CACHE_SIZE,
+    SESSION_CACHE_TTL,
+    SESSION_LIFETIME,
+    SESSION_REVOCATION_REFRESH,
+    SESSION_SWEEP_BATCH_SIZE,
+    SESSION_SWEEP_INTERVAL,
+    SESSION_TOKEN_MODE,
+    SESSION_TOKEN_SECRET,
+    STATISTICS_FLUSH_INTERVAL,
+    STATISTICS_FLUSH_USERS,
+    STATISTICS_WRITE_BEHIND,
+)
+from helpers import metrics
+from helpers.background import run_periodically
+from helpers.breaker import CircuitBreaker
+from helpers.cache import TTLCache
+from helpers.tokens import RevocationList, SessionTokens
+from services.database.aggregator import StatisticsAggregator
+from services.database.errors import DatabaseUnavailableError
+from services.database.migrations import migrate, seed
 
 # import all mixins here
 from services.database.mixins.meta import MetaMixin
@@ -16,6 +52,29 @@ from services.database.mixins.sessions import SessionsMixin
 from services.database.mixins.statistics import StatisticsMixin
 from services.database.mixins.tags import TagsMixin
 from services.database.mixins.users import UsersMixin
+from services.database.pool import ConnectionPool
+from services.database.replicas import ReplicaSet
+from services.database.shards import ShardSet
+from services.database.sweeper import SessionSweeper
+
+
+def _create_pool(dsn: str) -> ConnectionPool:
+    return ConnectionPool(
+        dsn,
+        minconn=DATABASE_POOL_MIN,
+        maxconn=DATABASE_POOL_MAX,
+        timeout=DATABASE_POOL_TIMEOUT,
+        max_lifetime=DATABASE_POOL_MAX_LIFETIME,
+        ping_after=DATABASE_POOL_PING_AFTER,
+        prepare=DATABASE_PREPARED_STATEMENTS,
+        prepared_max=DATABASE_PREPARED_MAX,
+        breaker=(
+            CircuitBreaker(DATABASE_BREAKER_FAILURES, DATABASE_BREAKER_RESET)
+            if DATABASE_BREAKER_FAILURES > 0
+            else None
+        ),
+        partitions=DATABASE_POOL_PARTITIONS,
+    )
 
 
 # add all imported mixins here
@@ -33,53 +92,157 @@ class Database(
     A class representing the database.
     """
 
-    connectionPool: pool.SimpleConnectionPool = None
+    connectionPool: ConnectionPool = None
+    replicas: ReplicaSet = None
+    shards: ShardSet = None
+    sessionCache: TTLCache = None
+    sessionTokens: SessionTokens = None
+    sessionRevocations: RevocationList = None
+    sessionSweeper: SessionSweeper = None
+    statisticsAggregator: StatisticsAggregator = None
+    backgroundJobs: List[asyncio.Task] = None
 
     def __new__(cls):
         """
         Creates a new instance of the Database class if it doesn't already exist.
         If an instance already exists, returns the existing instance.
 
+        The instance does not connect until it is used, call `open` on startup to initialize the
+        schema and start the background jobs, and `close` on shutdown.
+
         To see the available methods, refer to the mixin classes in the `services.database.mixins` package.
+        All of them are coroutines.
 
         Returns:
             Database: The Database instance.
         """
 
         if not hasattr(cls, "instance"):
-            conn = None
             cls.instance = super(Database, cls).__new__(cls)
+            cls.instance.backgroundJobs = []
+            cls.instance.connectionPool = _create_pool(SERVICE_POSTGRES_URI)
+            metrics.register("database_pool", cls.instance.connectionPool.stats)
+
+            cls.instance.replicas = ReplicaSet(
+                [_create_pool(uri) for uri in SERVICE_POSTGRES_REPLICA_URIS],
+                DATABASE_REPLICA_MAX_LAG,
+            )
+            metrics.register("database_replicas", cls.instance.replicas.stats)
+
+            cls.instance.shards = ShardSet(
+                cls.instance.connectionPool,
+                [
+                    cls.instance.connectionPool
+                    if uri == SERVICE_POSTGRES_URI
+                    else _create_pool(uri)
+                    for uri in SERVICE_POSTGRES_SHARD_URIS
+                ],
+            )
+            metrics.register("database_shards", cls.instance.shards.stats)
+
+            cls.instance.sessionCache = TTLCache(
+                maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL
+            )
+            metrics.register("session_cache", cls.instance.sessionCache.stats)
 
-            try:
-                print("Connecting to PostgreSQL database...", flush=True)
-                cls.instance.connectionPool = pool.SimpleConnectionPool(
-                    1, 20, SERVICE_POSTGRES_URI
+            if SESSION_TOKEN_MODE == "signed":
+                cls.instance.sessionTokens = SessionTokens(
+                    SESSION_TOKEN_SECRET, SESSION_LIFETIME
+                )
+                cls.instance.sessionRevocations = RevocationList(SESSION_LIFETIME)
+                metrics.register(
+                    "session_revocations", cls.instance.sessionRevocations.stats
+                )
+
+            cls.instance.sessionSweeper = SessionSweeper(
+                cls.instance, SESSION_SWEEP_BATCH_SIZE
+            )
+            metrics.register("session_sweeper", cls.instance.sessionSweeper.stats)
+
+            if STATISTICS_WRITE_BEHIND:
+                cls.instance.statisticsAggregator = StatisticsAggregator(
+                    cls.instance.shards, STATISTICS_FLUSH_USERS
+                )
+                metrics.register(
+                    "statistics_aggregator", cls.instance.statisticsAggregator.stats
                 )
-                print("Connected. Initializing...", flush=True)
-                conn = cls.instance.connectionPool.getconn()
-                with conn.cursor() as cursor:
-                    # Load and execute sql in create.sql
-                    with open(
-                        os.path.join(os.path.dirname(__file__), "sql", "create.sql"),
-                        "r",
-                    ) as file:
-                        sql_script = file.read()
-                        cursor.execute(sql_script)
-
-                    # Load and execute sql in load.sql
-                    with open(
-                        os.path.join(os.path.dirname(__file__), "sql", "load.sql"), "r"
-                    ) as file:
-                        sql_script = file.read()
-                        cursor.execute(sql_script)
-
-                    # Commit the transaction
-                    conn.commit()
-                    print("Initialized. Database ready.", flush=True)
-            except psycopg2.Error as e:
-                print("Failed to initialize database:\n", e, flush=True)
-            finally:
-                if conn:
-                    cls.instance.connectionPool.putconn(conn)
 
         return cls.instance
+
+    async def open(self) -> None:
+        """
+        Opens the connection pools, applies pending schema migrations and starts the background jobs.
+        Must be called from the running event loop, e.g. on application startup.
+        """
+
+        conn = None
+        try:
+            print("Connecting to PostgreSQL database...", flush=True)
+            await self.connectionPool.open()
+            print("Connected. Initializing...", flush=True)
+            conn = await self.connectionPool.getconn()
+            for migration in await migrate(conn):
+                print(
+                    f"Applied migration {migration.version}: {migration.name}",
+                    flush=True,
+                )
+            if DATABASE_SEED:
+                await seed(conn)
+            print("Initialized. Database ready.", flush=True)
+        except (psycopg.Error, DatabaseUnavailableError) as e:
+            print("Failed to initialize database:\n", e, flush=True)
+        finally:
+            if conn:
+                await self.connectionPool.putconn(conn)
+
+        if self.shards.enabled:
+            await self.shards.open()
+        if self.replicas.pools:
+            await self.replicas.open()
+            self.backgroundJobs.append(
+                run_periodically(
+                    "replica-lag-check",
+                    DATABASE_REPLICA_CHECK_INTERVAL,
+                    self.replicas.check_lag,
+                )
+            )
+        if self.sessionRevocations:
+            self.backgroundJobs.append(
+                run_periodically(
+                    "session-revocation-refresh",
+                    SESSION_REVOCATION_REFRESH,
+                    self.refresh_revocations,
+                )
+            )
+        self.backgroundJobs.append(
+            run_periodically(
+                "session-sweeper",
+                SESSION_SWEEP_INTERVAL,
+                self.sessionSweeper.sweep,
+            )
+        )
+        if self.statisticsAggregator:
+            self.backgroundJobs.append(
+                run_periodically(
+                    "statistics-flush",
+                    STATISTICS_FLUSH_INTERVAL,
+                    # shielded, so stopping the job on shutdown does not interrupt a commit
+                    lambda: asyncio.shield(self.statisticsAggregator.flush()),
+                )
+            )
+
+    async def close(self) -> None:
+        """
+        Stops the background jobs, flushes the pending statistics increments and closes the
+        connection pools, e.g. on application shutdown.
+        """
+
+        for job in self.backgroundJobs:
+            job.cancel()
+        await asyncio.gather(*self.backgroundJobs, return_exceptions=True)
+        self.backgroundJobs.clear()
+        if self.statisticsAggregator:
+            await self.statisticsAggregator.close()
+        await self.connectionPool.closeall()
+        await self.replicas.closeall()
+        await self.shards.closeall()
@@ -0,0 +1,86 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Request deadlines, enforced by the connection pool on every database call
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class Deadline:
+    """
+    The time by which a block run with `use_deadline` must be done with the database.
+
+    Attributes:
+        at (float): The deadline as a `time.monotonic` timestamp.
+        active (bool): Whether the block is still running, the deadline stops applying once it exits.
+    """
+
+    __slots__ = ("at", "active")
+
+    def __init__(self, at: float):
+        self.at = at
+        self.active = True
+
+    def remaining(self) -> float:
+        """
+        Returns the number of seconds left until the deadline.
+
+        Returns:
+            float: The seconds left, 0 or less once the deadline passed.
+        """
+
+        return self.at - time.monotonic()
+
+    def expired(self) -> bool:
+        """
+        Returns whether the deadline passed while its block was still running.
+
+        Returns:
+            bool: True if database calls should fail with `DeadlineExceededError`.
+        """
+
+        return self.active and time.monotonic() >= self.at
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    Returns the deadline declared for the current context with `use_deadline`, if any.
+
+    Returns:
+        Optional[Deadline]: The deadline, or None outside of `use_deadline`.
+    """
+
+    return _current.get()
+
+
+@contextmanager
+def use_deadline(seconds: float) -> Iterator[None]:
+    """
+    Gives every database call made in the current context, and in tasks started from it, until the
+    given number of seconds from now to complete. A nested block cannot extend the outer deadline.
+
+    Calls made past the deadline fail with `DeadlineExceededError`, see `ConnectionPool` for how the
+    deadline is enforced on the database. Connections still checked out when the block exits, e.g. by
+    a streamed response, are not bound by it anymore.
+
+    Args:
+        seconds (float): The number of seconds the block may spend, 0 or less for no deadline.
+    """
+
+    outer = _current.get()
+    at = time.monotonic() + seconds
+    if seconds <= 0 or (outer is not None and outer.at <= at):
+        yield
+        return
+
+    deadline = Deadline(at)
+    token = _current.set(deadline)
+    try:
+        yield
+    finally:
+        deadline.active = False
+        _current.reset(token)
@@ -0,0 +1,31 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Exceptions raised by the database service
+
+
+class DatabaseUnavailableError(Exception):
+    """
+    Raised when the database cannot serve a request right now, e.g. because no connection became
+    available in time. Unlike other database errors, mixins let this propagate so that routes can
+    answer with 503 Service Unavailable instead of misreporting the failure.
+    """
+
+
+class PoolTimeoutError(DatabaseUnavailableError):
+    """
+    Raised when no pooled connection became available within the checkout timeout.
+    """
+
+
+class CircuitOpenError(DatabaseUnavailableError):
+    """
+    Raised without contacting the database while the pool's circuit breaker is open, i.e. after
+    too many consecutive failures, until a probe finds the database healthy again.
+    """
+
+
+class DeadlineExceededError(DatabaseUnavailableError):
+    """
+    Raised when the request's deadline (see `services.database.deadlines`) passed before a connection
+    was checked out or while a statement was running, in which case the statement is cancelled on the
+    database. It says nothing about the database's health, and is not counted by the circuit breaker.
+    """
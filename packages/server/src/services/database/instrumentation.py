@@ -0,0 +1,209 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Per-request counters for the queries executed by the database service
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+import psycopg
+from psycopg import AsyncCursor, AsyncServerCursor, errors
+
+from services.database.errors import DatabaseUnavailableError, DeadlineExceededError
+
+# statement errors which mean the database is down or overloaded, rather than the statement being wrong
+OUTAGE_ERRORS = (errors.QueryCanceled, errors.OperatorIntervention)
+# statement errors raised by the timeouts and the cancellation which enforce a request deadline
+DEADLINE_ERRORS = (errors.QueryCanceled, errors.LockNotAvailable)
+
+
+class QueryStats:
+    """
+    Counts the queries, rows, pool checkouts and database time of one unit of work, e.g. a request.
+
+    Attributes:
+        queries (int): The number of statements executed.
+        rows (int): The number of rows returned or affected by those statements.
+        checkouts (int): The number of connections checked out of the pool.
+        db_time (float): The number of seconds spent waiting on statements.
+    """
+
+    __slots__ = ("queries", "rows", "checkouts", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.checkouts = 0
+        self.db_time = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the counters.
+
+        Returns:
+            Dict[str, Any]: The number of queries, rows and checkouts, and the database time in milliseconds.
+        """
+
+        return {
+            "queries": self.queries,
+            "rows": self.rows,
+            "checkouts": self.checkouts,
+            "db_time_ms": round(self.db_time * 1000, 3),
+        }
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """
+    Returns the counters of the unit of work running in the current context, if any.
+
+    Returns:
+        Optional[QueryStats]: The current counters, or None outside of `track_queries`.
+    """
+
+    return _current.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Counts every query executed in the current context, and in tasks started from it, until the block exits.
+
+    Yields:
+        QueryStats: The counters, which keep updating until the block exits.
+    """
+
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _record_success(cursor) -> None:
+    breaker = getattr(cursor.connection, "circuit_breaker", None)
+    if breaker is not None:
+        breaker.record_success()
+
+
+def _check_deadline(cursor) -> None:
+    # the pool tags connections checked out under a request deadline, see `ConnectionPool.getconn`
+    deadline = getattr(cursor.connection, "deadline", None)
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceededError("The request deadline passed before the statement")
+
+
+def _record_failure(cursor, error: psycopg.OperationalError) -> None:
+    """
+    Reports a failed statement to the connection's circuit breaker if the database went away or
+    timed out, other errors (e.g. serialization failures) say nothing about its health. A lost
+    connection is raised as `DatabaseUnavailableError`, so the mixins let it propagate.
+
+    A statement cancelled or timed out because the request deadline passed is raised as
+    `DeadlineExceededError` instead, without counting as a failure.
+    """
+
+    conn = cursor.connection
+    deadline = getattr(conn, "deadline", None)
+    if (
+        deadline is not None
+        and isinstance(error, DEADLINE_ERRORS)
+        and deadline.expired()
+        and not conn.broken
+    ):
+        raise DeadlineExceededError(
+            f"The request deadline passed during the statement: {error}"
+        ) from error
+
+    if not conn.broken and not isinstance(error, OUTAGE_ERRORS):
+        return
+
+    breaker = getattr(conn, "circuit_breaker", None)
+    if breaker is not None:
+        breaker.record_failure()
+    if conn.broken:
+        raise DatabaseUnavailableError(f"Lost the connection: {error}") from error
+
+
+class InstrumentedCursor(AsyncCursor):
+    """
+    A cursor which records every statement it executes in the current `QueryStats`, and reports its
+    outcome to the connection's circuit breaker.
+    The pool installs it as the cursor factory of every connection it opens.
+    """
+
+    async def execute(self, query, params=None, **kwargs):
+        _check_deadline(self)
+        stats = _current.get()
+        start = time.perf_counter()
+        try:
+            result = await super().execute(query, params, **kwargs)
+        except psycopg.OperationalError as e:
+            _record_failure(self, e)
+            raise
+        finally:
+            if stats is not None:
+                stats.db_time += time.perf_counter() - start
+                stats.queries += 1
+                stats.rows += max(self.rowcount, 0)
+        _record_success(self)
+        return result
+
+    async def executemany(self, query, params_seq, **kwargs):
+        _check_deadline(self)
+        stats = _current.get()
+        start = time.perf_counter()
+        try:
+            result = await super().executemany(query, params_seq, **kwargs)
+        except psycopg.OperationalError as e:
+            _record_failure(self, e)
+            raise
+        finally:
+            if stats is not None:
+                stats.db_time += time.perf_counter() - start
+                stats.queries += 1
+                stats.rows += max(self.rowcount, 0)
+        _record_success(self)
+        return result
+
+
+class InstrumentedServerCursor(AsyncServerCursor):
+    """
+    A named, server-side cursor which records the statement it declares in the current `QueryStats`,
+    and reports the outcome of the statement and of every fetch to the connection's circuit breaker.
+    Rows are counted as they are fetched, since their number is not known up front.
+    """
+
+    async def execute(self, query, params=None, **kwargs):
+        _check_deadline(self)
+        stats = _current.get()
+        start = time.perf_counter()
+        try:
+            result = await super().execute(query, params, **kwargs)
+        except psycopg.OperationalError as e:
+            _record_failure(self, e)
+            raise
+        finally:
+            if stats is not None:
+                stats.db_time += time.perf_counter() - start
+                stats.queries += 1
+        _record_success(self)
+        return result
+
+    async def fetchmany(self, size=0):
+        _check_deadline(self)
+        stats = _current.get()
+        start = time.perf_counter()
+        try:
+            rows = await super().fetchmany(size)
+        except psycopg.OperationalError as e:
+            _record_failure(self, e)
+            raise
+        if stats is not None:
+            stats.db_time += time.perf_counter() - start
+            stats.rows += len(rows)
+        _record_success(self)
+        return rows
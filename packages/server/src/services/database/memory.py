@@ -0,0 +1,748 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Database backend keeping every table in process memory, for tests and benchmarks
+
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from itertools import count
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+
+from config import (
+    DATABASE_REPLICA_MAX_LAG,
+    DATABASE_SEED,
+    DATABASE_STREAM_CHUNK_SIZE,
+    SESSION_LIFETIME,
+    SESSION_MAX_PER_USER,
+    SESSION_SWEEP_BATCH_SIZE,
+    SESSION_SWEEP_INTERVAL,
+    SESSION_TOKEN_MODE,
+    SESSION_TOKEN_SECRET,
+)
+from helpers import metrics
+from helpers.background import run_periodically
+from helpers.tokens import SessionTokens
+from helpers.types import (
+    QuestionImportDict,
+    QuestionImportErrorDict,
+    QuestionTagDict,
+    QuestionTagUpdateDict,
+    QuestionWithTagsDict,
+    SessionDict,
+    TagDict,
+)
+from services.database.migrations import SEED_FILE
+from services.database.mixins.sessions import _parse_session_id
+from services.database.replicas import ReplicaSet
+from services.database.rows import Record, record_maker
+from services.database.sweeper import SessionSweeper
+
+# the records returned by the Postgres backend for the same calls
+USER = record_maker(("uuid", "username", "password_hash"))
+SESSION = record_maker(("user_uuid", "token", "device", "created_at"))
+STATISTICS = record_maker(("user_uuid", "xp", "wins", "losses"))
+TAG = record_maker(("id", "name", "description"))
+QUESTION_TAG = record_maker(("question_id", "tag_id"))
+QUESTION_WITH_TAGS = record_maker(("id", "question", "difficulty", "options", "tags"))
+
+# the statements and values of the demo data, which only holds literal `INSERT ... VALUES` lists
+SEED_INSERT = re.compile(
+    r"INSERT INTO (\w+) \(([^)]*)\)\s+VALUES\s+(.*?)\s+ON CONFLICT", re.S
+)
+SEED_VALUE = re.compile(r"'((?:[^']|'')*)'|(-?\d+)")
+
+
+class NullPool:
+    """
+    Stands in for the connection pool where routes use it directly. There is nothing to connect to,
+    so the pool never fails and transactions only group calls, they are never rolled back.
+    """
+
+    breaker = None
+    prepare = False
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        yield
+
+    def probe_if_due(self) -> None:
+        pass
+
+    async def closeall(self) -> None:
+        pass
+
+
+class MemoryDatabase:
+    """
+    A database backend keeping every table in process memory, selected with `DATABASE_BACKEND=memory`.
+
+    It implements the methods of every mixin of `Database` with the same arguments and results, on
+    dictionaries indexed like the tables (by key, and by every unique or looked up column), so no call
+    scans a table. Nothing is persisted and nothing is shared between processes, so it is meant for
+    tests and for measuring the cost of the API layer without the cost of the database.
+
+    Constraints are checked like the schema does, e.g. usernames and tag names are unique and deleting
+    a user deletes their sessions and statistics, but raw SQL (`execute_query`) is not supported.
+    """
+
+    connectionPool: NullPool = None
+    replicas: ReplicaSet = None
+    sessionTokens: Optional[SessionTokens] = None
+    sessionSweeper: SessionSweeper = None
+    backgroundJobs: List[asyncio.Task] = None
+
+    def __new__(cls):
+        """
+        Creates the in-memory database if it doesn't already exist, otherwise returns the existing one,
+        so every module sees the same tables.
+
+        Returns:
+            MemoryDatabase: The MemoryDatabase instance.
+        """
+
+        if not hasattr(cls, "instance"):
+            cls.instance = super(MemoryDatabase, cls).__new__(cls)
+            cls.instance.backgroundJobs = []
+            cls.instance.connectionPool = NullPool()
+            cls.instance.replicas = ReplicaSet([], DATABASE_REPLICA_MAX_LAG)
+            cls.instance.clear()
+            metrics.register("database_memory", cls.instance.stats)
+
+            if SESSION_TOKEN_MODE == "signed":
+                cls.instance.sessionTokens = SessionTokens(
+                    SESSION_TOKEN_SECRET, SESSION_LIFETIME
+                )
+
+            cls.instance.sessionSweeper = SessionSweeper(
+                cls.instance, SESSION_SWEEP_BATCH_SIZE
+            )
+            metrics.register("session_sweeper", cls.instance.sessionSweeper.stats)
+
+        return cls.instance
+
+    def clear(self) -> None:
+        """
+        Empties every table and restarts the generated ids.
+        """
+
+        self._users: Dict[UUID, Record] = {}
+        self._user_by_name: Dict[str, UUID] = {}
+        self._statistics: Dict[UUID, Record] = {}
+        # sessions are kept in creation order, so the expired ones are always the first ones
+        self._sessions: Dict[UUID, Record] = {}
+        self._sessions_by_user: Dict[UUID, Dict[UUID, None]] = {}
+        self._session_by_device: Dict[Tuple[UUID, str], UUID] = {}
+        self._questions: Dict[int, Tuple[str, int, List[str]]] = {}
+        self._question_by_text: Dict[str, int] = {}
+        self._tags: Dict[int, Record] = {}
+        self._tag_by_name: Dict[str, int] = {}
+        self._tags_of_question: Dict[int, Set[int]] = {}
+        self._questions_of_tag: Dict[int, Set[int]] = {}
+        self._question_ids = count(1)
+        self._tag_ids = count(1)
+
+    def seed(self) -> None:
+        """
+        Loads the demo data in sql/load.sql, skipping rows that already exist. Development only.
+        """
+
+        with open(SEED_FILE, "r") as file:
+            script = file.read()
+
+        now = datetime.now()
+        for table, columns, values in SEED_INSERT.findall(script):
+            columns = [column.strip() for column in columns.split(",")]
+            for line in values.splitlines():
+                row = dict(
+                    zip(
+                        columns,
+                        (
+                            text.replace("''", "'") if number == "" else int(number)
+                            for text, number in SEED_VALUE.findall(line)
+                        ),
+                    )
+                )
+                if table == "Users" and UUID(row["uuid"]) not in self._users:
+                    user = USER(
+                        [UUID(row["uuid"]), row["username"], row["password_hash"]]
+                    )
+                    self._users[user.uuid] = user
+                    self._user_by_name[user.username] = user.uuid
+                elif table == "Statistics":
+                    uuid = UUID(row["user_uuid"])
+                    self._statistics.setdefault(
+                        uuid, STATISTICS([uuid, row["xp"], row["wins"], row["losses"]])
+                    )
+                elif table == "Sessions" and UUID(row["token"]) not in self._sessions:
+                    session = SESSION(
+                        [UUID(row["user_uuid"]), UUID(row["token"]), None, now]
+                    )
+                    self._sessions[session.token] = session
+                    self._sessions_by_user.setdefault(session.user_uuid, {})[
+                        session.token
+                    ] = None
+                elif table == "Tags" and row["name"] not in self._tag_by_name:
+                    tag = TAG([next(self._tag_ids), row["name"], row["description"]])
+                    self._tags[tag.id] = tag
+                    self._tag_by_name[tag.name] = tag.id
+                elif (
+                    table == "Questions"
+                    and row["question"] not in self._question_by_text
+                ):
+                    self._insert_question(
+                        row["question"],
+                        row["difficulty"],
+                        [row[f"option{n}"] for n in range(1, 5)],
+                    )
+                elif table == "Question_Tags":
+                    self._assign_tag(row["question_id"], row["tag_id"])
+
+    async def open(self) -> None:
+        """
+        Loads the demo data if `DATABASE_SEED` is set and starts the background jobs. There is nothing
+        to connect to or migrate.
+        """
+
+        if DATABASE_SEED:
+            self.seed()
+        self.backgroundJobs.append(
+            run_periodically(
+                "session-sweeper",
+                SESSION_SWEEP_INTERVAL,
+                self.sessionSweeper.sweep,
+            )
+        )
+
+    async def close(self) -> None:
+        """
+        Stops the background jobs. The tables are kept until the process exits.
+        """
+
+        for job in self.backgroundJobs:
+            job.cancel()
+        await asyncio.gather(*self.backgroundJobs, return_exceptions=True)
+        self.backgroundJobs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the number of rows in every table.
+
+        Returns:
+            Dict[str, Any]: The row counts, by table.
+        """
+
+        return {
+            "users": len(self._users),
+            "sessions": len(self._sessions),
+            "statistics": len(self._statistics),
+            "questions": len(self._questions),
+            "tags": len(self._tags),
+            "question_tags": sum(len(tags) for tags in self._tags_of_question.values()),
+        }
+
+    # meta
+
+    async def execute_query(self, query: str, params: list = []) -> list:
+        raise NotImplementedError("The memory backend cannot execute SQL")
+
+    async def show_tables(self) -> List[str]:
+        return ["questions", "users", "sessions", "statistics", "tags", "question_tags"]
+
+    # users
+
+    async def get_user(
+        self,
+        uuid: Optional[UUID] = None,
+        username: Optional[str] = None,
+    ) -> Optional[Record]:
+        if not (uuid or username):
+            raise ValueError("Either uuid or username must be provided")
+
+        if not uuid:
+            uuid = self._user_by_name.get(username)
+        return self._users.get(uuid)
+
+    async def delete_user(
+        self,
+        uuid: Optional[UUID] = None,
+        username: Optional[str] = None,
+    ) -> bool:
+        if not (uuid or username):
+            raise ValueError("Either uuid or username must be provided")
+
+        if not uuid:
+            uuid = self._user_by_name.get(username)
+        user = self._users.pop(uuid, None)
+        if user is None:
+            return False
+
+        del self._user_by_name[user.username]
+        self._statistics.pop(uuid, None)
+        for token in list(self._sessions_by_user.get(uuid, ())):
+            self._drop_session(token)
+        return True
+
+    async def update_user(
+        self,
+        uuid: UUID,
+        username: Optional[str] = None,
+        password_hash: Optional[str] = None,
+    ) -> Optional[Record]:
+        user = self._users.get(uuid)
+        if user is None or (username is None and password_hash is None):
+            return None
+        if username is not None and self._user_by_name.get(username, uuid) != uuid:
+            return None
+
+        updated = USER(
+            [
+                uuid,
+                user.username if username is None else username,
+                user.password_hash if password_hash is None else password_hash,
+            ]
+        )
+        del self._user_by_name[user.username]
+        self._user_by_name[updated.username] = uuid
+        self._users[uuid] = updated
+        return updated
+
+    async def create_user(self, username: str, password_hash: str) -> Optional[Record]:
+        if username in self._user_by_name:
+            return None
+
+        user = USER([uuid4(), username, password_hash])
+        self._users[user.uuid] = user
+        self._user_by_name[username] = user.uuid
+        return user
+
+    async def replace_password_hash(
+        self,
+        uuid: UUID,
+        old_password_hash: str,
+        new_password_hash: str,
+    ) -> bool:
+        user = self._users.get(uuid)
+        if user is None or user.password_hash != old_password_hash:
+            return False
+
+        self._users[uuid] = USER([uuid, user.username, new_password_hash])
+        return True
+
+    # sessions
+
+    def _is_live(self, session: Optional[Record]) -> bool:
+        return session is not None and session.created_at > datetime.now() - timedelta(
+            seconds=SESSION_LIFETIME
+        )
+
+    def _drop_session(self, token: UUID) -> None:
+        session = self._sessions.pop(token)
+        del self._sessions_by_user[session.user_uuid][token]
+        if not self._sessions_by_user[session.user_uuid]:
+            del self._sessions_by_user[session.user_uuid]
+        if session.device is not None:
+            del self._session_by_device[(session.user_uuid, session.device)]
+
+    def pool_for_session(self, token: UUID | str) -> NullPool:
+        return self.connectionPool
+
+    async def get_session(
+        self,
+        user_uuid: Optional[UUID] = None,
+        token: Optional[UUID | str] = None,
+    ) -> Optional[SessionDict]:
+        if not (user_uuid or token):
+            raise ValueError("Either user_uuid or token must be provided")
+
+        if user_uuid:
+            tokens = self._sessions_by_user.get(user_uuid)
+            session = self._sessions[next(reversed(tokens))] if tokens else None
+        elif self.sessionTokens and SessionTokens.is_signed(token):
+            # deleted sessions are seen at once, there is no other process to fall behind
+            claims = self.sessionTokens.verify(token)
+            if claims is None or not self._is_live(
+                self._sessions.get(claims["session_id"])
+            ):
+                return None
+            return SessionDict(
+                user_uuid=claims["user_uuid"],
+                token=token,
+                device=None,
+                created_at=claims["created_at"],
+            )
+        else:
+            session = self._sessions.get(_parse_session_id(token))
+
+        if not self._is_live(session):
+            return None
+        return SessionDict(**session)
+
+    async def delete_session(
+        self,
+        user_uuid: Optional[UUID] = None,
+        token: Optional[UUID | str] = None,
+    ) -> bool:
+        if not (user_uuid or token):
+            raise ValueError("Either `user_uuid` or `token` must be provided")
+
+        if user_uuid:
+            tokens = list(self._sessions_by_user.get(user_uuid, ()))
+        elif self.sessionTokens and SessionTokens.is_signed(token):
+            claims = self.sessionTokens.verify(token)
+            tokens = [claims["session_id"]] if claims else []
+        else:
+            tokens = [_parse_session_id(token)]
+
+        tokens = [token for token in tokens if token in self._sessions]
+        for token in tokens:
+            self._drop_session(token)
+        return bool(tokens)
+
+    async def create_session(
+        self,
+        user_uuid: UUID,
+        device: Optional[str] = None,
+    ) -> Optional[SessionDict]:
+        if user_uuid not in self._users:
+            return None
+
+        if device is not None and (user_uuid, device) in self._session_by_device:
+            self._drop_session(self._session_by_device[(user_uuid, device)])
+
+        session = SESSION([user_uuid, uuid4(), device, datetime.now()])
+        self._sessions[session.token] = session
+        tokens = self._sessions_by_user.setdefault(user_uuid, {})
+        tokens[session.token] = None
+        if device is not None:
+            self._session_by_device[(user_uuid, device)] = session.token
+
+        # evict the oldest sessions beyond the per-user cap
+        for token in list(tokens)[: max(len(tokens) - SESSION_MAX_PER_USER, 0)]:
+            self._drop_session(token)
+
+        result = SessionDict(**session)
+        if self.sessionTokens:
+            result["token"] = self.sessionTokens.issue(
+                session_id=session.token,
+                user_uuid=user_uuid,
+                created_at=session.created_at,
+            )
+        return result
+
+    def invalidate_sessions(
+        self,
+        user_uuid: Optional[UUID] = None,
+        token: Optional[UUID] = None,
+    ) -> int:
+        # nothing is cached, every lookup reads the tables
+        return 0
+
+    async def get_live_session_ids(self, session_ids: Iterable[UUID]) -> Set[UUID]:
+        return {
+            session_id for session_id in session_ids if session_id in self._sessions
+        }
+
+    async def delete_expired_sessions(self, limit: int) -> int:
+        expired = []
+        for token, session in self._sessions.items():
+            if len(expired) >= limit or self._is_live(session):
+                break
+            expired.append(token)
+
+        for token in expired:
+            self._drop_session(token)
+        return len(expired)
+
+    # statistics
+
+    async def get_statistics(
+        self, uuid: UUID, primary: bool = False
+    ) -> Optional[Record]:
+        statistics = self._statistics.get(uuid)
+        if statistics is None:
+            return await self.create_statistics(uuid)
+        return statistics
+
+    async def create_statistics(self, uuid: UUID) -> Optional[Record]:
+        if uuid not in self._users or uuid in self._statistics:
+            return None
+
+        self._statistics[uuid] = STATISTICS([uuid, 0, 0, 0])
+        return self._statistics[uuid]
+
+    async def update_statistics(
+        self,
+        uuid: UUID,
+        xp_increment: int = 0,
+        wins_increment: int = 0,
+        losses_increment: int = 0,
+    ) -> Optional[Record]:
+        if uuid not in self._users:
+            return None
+
+        current = self._statistics.get(uuid) or STATISTICS([uuid, 0, 0, 0])
+        self._statistics[uuid] = STATISTICS(
+            [
+                uuid,
+                current.xp + xp_increment,
+                current.wins + wins_increment,
+                current.losses + losses_increment,
+            ]
+        )
+        return self._statistics[uuid]
+
+    # questions
+
+    def _question_record(self, id: int) -> Record:
+        question, difficulty, options = self._questions[id]
+        return QUESTION_WITH_TAGS(
+            [
+                id,
+                question,
+                difficulty,
+                options,
+                sorted(self._tags_of_question.get(id, ())),
+            ]
+        )
+
+    def _insert_question(self, question: str, difficulty: int, options) -> int:
+        id = next(self._question_ids)
+        self._questions[id] = (
+            question,
+            difficulty,
+            [option for option in options if option],
+        )
+        self._question_by_text[question] = id
+        return id
+
+    def _assign_tag(self, question_id: int, tag_id: int) -> bool:
+        tags = self._tags_of_question.setdefault(question_id, set())
+        if tag_id in tags:
+            return False
+        tags.add(tag_id)
+        self._questions_of_tag.setdefault(tag_id, set()).add(question_id)
+        return True
+
+    def _remove_tag(self, question_id: int, tag_id: int) -> bool:
+        if tag_id not in self._tags_of_question.get(question_id, ()):
+            return False
+        self._tags_of_question[question_id].discard(tag_id)
+        self._questions_of_tag[tag_id].discard(question_id)
+        return True
+
+    async def get_question(self, id: int, primary: bool = False) -> Record | None:
+        return self._question_record(id) if id in self._questions else None
+
+    async def get_questions(self, primary: bool = False) -> list[Record]:
+        return [self._question_record(id) for id in sorted(self._questions)]
+
+    async def stream_questions(
+        self, chunk_size: int = DATABASE_STREAM_CHUNK_SIZE, primary: bool = False
+    ) -> AsyncIterator[Record]:
+        for n, id in enumerate(sorted(self._questions), 1):
+            # rows that are still there when their turn comes, like a cursor reading in chunks
+            if id in self._questions:
+                yield self._question_record(id)
+            if n % chunk_size == 0:
+                await asyncio.sleep(0)
+
+    async def create_question(
+        self, question: QuestionWithTagsDict
+    ) -> QuestionWithTagsDict | None:
+        tags = question["tags"] if "tags" in question else []
+        if question["question"] in self._question_by_text:
+            print("Duplicate question entry:", question["question"], flush=True)
+            return None
+        if not all(tag in self._tags for tag in tags):
+            print("Failed to create question: unknown tag", flush=True)
+            return None
+
+        id = self._insert_question(
+            question["question"], question["difficulty"], question["options"][:4]
+        )
+        for tag in tags:
+            self._assign_tag(id, tag)
+
+        return QuestionWithTagsDict(
+            id=id,
+            question=question["question"],
+            difficulty=question["difficulty"],
+            options=self._questions[id][2],
+            tags=tags,
+        )
+
+    async def import_questions(self, rows: list) -> QuestionImportDict | None:
+        errors: List[QuestionImportErrorDict] = []
+        imported: Dict[str, int] = {}
+        tags = 0
+        for line, question, difficulty, *options, row_tags in rows:
+            if question in self._question_by_text and question not in imported:
+                errors.append(
+                    QuestionImportErrorDict(line=line, error="Question already exists")
+                )
+                continue
+            unknown = [tag for tag in row_tags if tag not in self._tags]
+            if unknown:
+                errors.append(
+                    QuestionImportErrorDict(
+                        line=line, error=f"Unknown tag id {min(unknown)}"
+                    )
+                )
+                continue
+
+            # a question repeated in the import is imported once, with the tags of every repeat
+            if question not in imported:
+                imported[question] = self._insert_question(
+                    question, difficulty, options
+                )
+            tags += sum(self._assign_tag(imported[question], tag) for tag in row_tags)
+
+        errors.sort(key=lambda error: error["line"])
+        return QuestionImportDict(
+            received=len(rows), imported=len(imported), tags=tags, errors=errors
+        )
+
+    async def delete_question(self, question_id: int) -> bool:
+        if question_id not in self._questions:
+            print(f"No question found with id: {question_id}", flush=True)
+            return False
+
+        question, _, _ = self._questions.pop(question_id)
+        del self._question_by_text[question]
+        for tag_id in self._tags_of_question.pop(question_id, ()):
+            self._questions_of_tag[tag_id].discard(question_id)
+        print(f"Successfully deleted question with id: {question_id}", flush=True)
+        return True
+
+    # tags
+
+    async def get_tags(self, primary: bool = False) -> list[Record]:
+        return list(self._tags.values())
+
+    async def get_tag(self, tag_id: int, primary: bool = False) -> Record | None:
+        return self._tags.get(tag_id)
+
+    async def stream_tags(
+        self, chunk_size: int = DATABASE_STREAM_CHUNK_SIZE, primary: bool = False
+    ) -> AsyncIterator[Record]:
+        for n, tag_id in enumerate(list(self._tags), 1):
+            if tag_id in self._tags:
+                yield self._tags[tag_id]
+            if n % chunk_size == 0:
+                await asyncio.sleep(0)
+
+    async def create_tag(self, tag: TagDict) -> Record | None:
+        if tag.name in self._tag_by_name:
+            print("Duplicate tag entry:", tag.name, flush=True)
+            return None
+
+        created = TAG([next(self._tag_ids), tag.name, tag.description])
+        self._tags[created.id] = created
+        self._tag_by_name[created.name] = created.id
+        return created
+
+    async def delete_tag(self, tag_id: int) -> bool:
+        tag = self._tags.pop(tag_id, None)
+        if tag is None:
+            print(f"No tag found with id: {tag_id}", flush=True)
+            return False
+
+        del self._tag_by_name[tag.name]
+        for question_id in self._questions_of_tag.pop(tag_id, ()):
+            self._tags_of_question[question_id].discard(tag_id)
+        print(f"Successfully deleted tag with id: {tag_id}", flush=True)
+        return True
+
+    # question tags
+
+    async def get_question_tags(self, primary: bool = False) -> list[Record]:
+        return [
+            QUESTION_TAG([question_id, tag_id])
+            for question_id, tags in self._tags_of_question.items()
+            for tag_id in tags
+        ]
+
+    async def get_question_tag(
+        self, question_id: int, tag_id: int, primary: bool = False
+    ) -> Record | None:
+        if tag_id not in self._tags_of_question.get(question_id, ()):
+            return None
+        return QUESTION_TAG([question_id, tag_id])
+
+    async def stream_question_tags(
+        self, chunk_size: int = DATABASE_STREAM_CHUNK_SIZE, primary: bool = False
+    ) -> AsyncIterator[Record]:
+        n = 0
+        for question_id in sorted(self._tags_of_question):
+            for tag_id in sorted(self._tags_of_question.get(question_id, ())):
+                yield QUESTION_TAG([question_id, tag_id])
+                n += 1
+                if n % chunk_size == 0:
+                    await asyncio.sleep(0)
+
+    async def create_question_tag(self, question_tag: QuestionTagDict) -> Record | None:
+        question_id, tag_id = question_tag.question_id, question_tag.tag_id
+        if question_id not in self._questions or tag_id not in self._tags:
+            print(f"No question or tag found for {(question_id, tag_id)}", flush=True)
+            return None
+        if not self._assign_tag(question_id, tag_id):
+            print(f"Duplicate question tag entry: {(question_id, tag_id)}", flush=True)
+            return None
+        return QUESTION_TAG([question_id, tag_id])
+
+    async def update_question_tags(
+        self,
+        assign: List[QuestionTagDict],
+        remove: List[QuestionTagDict],
+    ) -> List[QuestionTagUpdateDict] | None:
+        pairs = [(pair["question_id"], pair["tag_id"], True) for pair in assign]
+        pairs += [(pair["question_id"], pair["tag_id"], False) for pair in remove]
+
+        # a pair is never both assigned and removed, so applying them one at a time gives the same
+        # outcome as the single statement of the Postgres backend
+        changed = set()
+        for question_id, tag_id, is_assign in dict.fromkeys(pairs):
+            if is_assign:
+                if question_id in self._questions and tag_id in self._tags:
+                    if self._assign_tag(question_id, tag_id):
+                        changed.add((question_id, tag_id, True))
+            elif self._remove_tag(question_id, tag_id):
+                changed.add((question_id, tag_id, False))
+
+        results = []
+        for question_id, tag_id, is_assign in pairs:
+            # only the first occurrence of a pair given more than once changed it
+            if (question_id, tag_id, is_assign) in changed:
+                changed.remove((question_id, tag_id, is_assign))
+                status = "assigned" if is_assign else "removed"
+            elif not is_assign:
+                status = "not_assigned"
+            elif question_id not in self._questions:
+                status = "question_not_found"
+            elif tag_id not in self._tags:
+                status = "tag_not_found"
+            else:
+                status = "already_assigned"
+            results.append(
+                QuestionTagUpdateDict(
+                    question_id=question_id,
+                    tag_id=tag_id,
+                    action="assign" if is_assign else "remove",
+                    status=status,
+                )
+            )
+        return results
+
+    async def delete_question_tag(self, question_id: int, tag_id: int) -> bool:
+        if not self._remove_tag(question_id, tag_id):
+            print(
+                f"No question tag pairing found with (question id, tag id): {(question_id, tag_id)}",
+                flush=True,
+            )
+            return False
+        print(
+            f"Successfully deleted question tag with (question_id, tag_id): {(question_id, tag_id)}",
+            flush=True,
+        )
+        return True
@@ -0,0 +1,184 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Applies the versioned schema migrations in sql/migrations exactly once per database
+
+import asyncio
+import os
+import re
+from typing import List
+
+import psycopg
+from psycopg import AsyncConnection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "sql", "migrations")
+SEED_FILE = os.path.join(os.path.dirname(__file__), "sql", "load.sql")
+
+# any constant works, it only has to be the same for every worker
+MIGRATION_LOCK_ID = 7_146_915_251
+
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+class Migration:
+    """
+    A schema migration, loaded from a `<version>_<name>.sql` file in sql/migrations.
+
+    Attributes:
+        version (int): The version the schema is at once the migration is applied.
+        name (str): The name of the migration.
+        path (str): The path of the migration's sql file.
+    """
+
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def read(self) -> str:
+        """
+        Reads the migration's sql.
+
+        Returns:
+            str: The sql statements of the migration.
+        """
+
+        return _read_file(self.path)
+
+
+def _read_file(path: str) -> str:
+    with open(path, "r") as file:
+        return file.read()
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    Loads every migration in a directory, ordered by version. Versions must count up from 1 without
+    gaps, so a migration missing from a deploy is caught before anything is applied.
+
+    Args:
+        directory (str): The directory holding the migration files.
+
+    Returns:
+        List[Migration]: The migrations, oldest first.
+
+    Raises:
+        ValueError: If two migrations share a version, or a version is missing.
+    """
+
+    migrations = {}
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {filename}")
+        migrations[version] = Migration(
+            version, match.group(2), os.path.join(directory, filename)
+        )
+    for expected, version in enumerate(sorted(migrations), start=1):
+        if version != expected:
+            raise ValueError(f"Missing migration version {expected}")
+    return [migrations[version] for version in sorted(migrations)]
+
+
+async def current_version(conn: AsyncConnection) -> int:
+    """
+    Returns the version of the database schema.
+
+    Args:
+        conn (AsyncConnection): The connection to check the schema with.
+
+    Returns:
+        int: The version of the latest applied migration, 0 if none has been applied.
+    """
+
+    try:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT max(version) FROM Schema_Migrations")
+            version = (await cursor.fetchone())[0]
+        await conn.rollback()
+        return version or 0
+    except psycopg.errors.UndefinedTable:
+        await conn.rollback()
+        return 0
+
+
+async def migrate(
+    conn: AsyncConnection, migrations: List[Migration] | None = None
+) -> List[Migration]:
+    """
+    Applies every pending migration, in order, in a single transaction.
+
+    If the schema is up to date this is a single version check. Otherwise an advisory lock is taken
+    first, so when several workers start at once only one of them applies the migrations and the
+    others wait for it and then find nothing left to do. If any migration fails, none are applied.
+
+    Args:
+        conn (AsyncConnection): The connection to migrate the database with.
+        migrations (List[Migration] | None): The migrations to apply, defaults to those in sql/migrations.
+
+    Returns:
+        List[Migration]: The migrations this call applied.
+
+    Raises:
+        psycopg.Error: If a migration failed.
+    """
+
+    # the files are read in a thread, so the event loop keeps serving requests meanwhile
+    if migrations is None:
+        migrations = await asyncio.to_thread(load_migrations)
+    if not migrations or await current_version(conn) >= migrations[-1].version:
+        return []
+
+    applied = []
+    try:
+        async with conn.cursor() as cursor:
+            # released when the transaction ends
+            await cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s)", [MIGRATION_LOCK_ID]
+            )
+            await cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS Schema_Migrations(
+                  version INTEGER NOT NULL,
+                  name VARCHAR(100) NOT NULL,
+                  applied_at TIMESTAMP DEFAULT now() NOT NULL,
+                  PRIMARY KEY (version)
+                )
+                """
+            )
+            # another worker may have applied some while this one waited for the lock
+            await cursor.execute("SELECT version FROM Schema_Migrations")
+            done = {row[0] for row in await cursor.fetchall()}
+
+            for migration in migrations:
+                if migration.version in done:
+                    continue
+                await cursor.execute(await asyncio.to_thread(migration.read))
+                await cursor.execute(
+                    "INSERT INTO Schema_Migrations (version, name) VALUES (%s, %s)",
+                    [migration.version, migration.name],
+                )
+                applied.append(migration)
+        await conn.commit()
+    except BaseException:
+        await conn.rollback()
+        raise
+    return applied
+
+
+async def seed(conn: AsyncConnection) -> None:
+    """
+    Loads the demo data in sql/load.sql, skipping rows that already exist. Development only.
+
+    Args:
+        conn (AsyncConnection): The connection to load the data with.
+
+    Raises:
+        psycopg.Error: If the data could not be loaded.
+    """
+
+    sql_script = await asyncio.to_thread(_read_file, SEED_FILE)
+    async with conn.cursor() as cursor:
+        await cursor.execute(sql_script)
+    await conn.commit()
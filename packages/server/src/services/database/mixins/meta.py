@@ -1,10 +1,14 @@
 # @author: adibarra (Alec Ibarra)
 # @description: Database class mixin for handling meta database operations
 
-from typing import TYPE_CHECKING, Any, Dict, List
+from typing import TYPE_CHECKING, Any, List, Mapping
+
+from services.database.errors import DatabaseUnavailableError
+from services.database.partitions import ADMIN
+from services.database.rows import record_maker
 
 if TYPE_CHECKING:
-    from psycopg2.pool import SimpleConnectionPool
+    from services.database.pool import ConnectionPool
 
 
 class MetaMixin:
@@ -12,20 +16,22 @@ class MetaMixin:
     A collection of methods for handling meta database operations.
     """
 
-    connectionPool: "SimpleConnectionPool"
+    connectionPool: "ConnectionPool"
 
-    def execute_query(self, query: str, params: list = []) -> List[Dict[str, Any]]:
+    async def execute_query(
+        self, query: str, params: list = []
+    ) -> List[Mapping[str, Any]]:
         """
         !!! DO NOT USE THIS IN PRODUCTION CODE !!!
 
-        Executes a query on the database and returns the results as a list of dictionaries.
+        Executes a query on the database and returns the results as a list of records.
 
         Args:
             query (str): The SQL query to execute.
             params (list): The parameters to pass to the query.
 
         Returns:
-            List[Dict[str, Any]]: A list of dictionaries representing the query results.
+            List[Mapping[str, Any]]: A list of records representing the query results, with every value as a string.
         """
 
         print("!!! DO NOT USE THIS IN PRODUCTION CODE !!!", flush=True)
@@ -34,25 +40,29 @@ class MetaMixin:
         result = []
 
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(query, params)
+            conn = await self.connectionPool.getconn(partition=ADMIN)
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
                 if cursor.description:
-                    column_names = [desc[0] for desc in cursor.description]
+                    make_record = record_maker(
+                        tuple(column.name for column in cursor.description)
+                    )
                     result = [
-                        dict(zip(column_names, [str(value) for value in row]))
-                        for row in cursor.fetchall()
+                        make_record([str(value) for value in row])
+                        for row in await cursor.fetchall()
                     ]
-                conn.commit()
+                await conn.commit()
                 return result
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(f"Failed to execute query ({query[:20]}...)", e, flush=True)
             return result
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await self.connectionPool.putconn(conn)
 
-    def show_tables(self) -> List[str]:
+    async def show_tables(self) -> List[str]:
         """
         !!! DO NOT USE THIS IN PRODUCTION CODE !!!
 
@@ -62,7 +72,7 @@ class MetaMixin:
             List[str]: A list of table names as strings.
         """
 
-        result = self.execute_query(
+        result = await self.execute_query(
             """
             SELECT table_name
             FROM information_schema.tables
@@ -1,14 +1,19 @@
 # @author: Adi-K527 (Adi Kandakurtikar)
 # @description: Database class for handling question and tag associations database operations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, AsyncIterator, List
 
-import psycopg2
+import psycopg
 
-from helpers.types import QuestionTagDict
+from config import DATABASE_STREAM_CHUNK_SIZE
+from helpers.types import QuestionTagDict, QuestionTagUpdateDict
+from services.database.errors import DatabaseUnavailableError
+from services.database.partitions import ADMIN
+from services.database.rows import Record, record_row
 
 if TYPE_CHECKING:
-    from psycopg2.pool import SimpleConnectionPool
+    from services.database.pool import ConnectionPool
+    from services.database.replicas import ReplicaSet
 
 
 class QuestionTagMixin:
@@ -16,56 +21,66 @@ class QuestionTagMixin:
     A collection of methods for handling question and tag associations database operations.
     """
 
-    connectionPool: "SimpleConnectionPool"
+    connectionPool: "ConnectionPool"
+    replicas: "ReplicaSet"
 
-    def get_question_tags(self) -> list[dict]:
+    async def get_question_tags(self, primary: bool = False) -> list[Record]:
         """
         Retrieves all tags and associated questions.
 
+        Args:
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
+
         Returns:
-            list[dict]: A list of dictionaries containing information about each tag association if successful, an empty list otherwise.
+            list[Record]: A list of records containing information about each tag association if successful, an empty list otherwise.
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            pool = self.replicas.pool_for_read(self.connectionPool, primary)
+            conn = await pool.getconn(partition=ADMIN)
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
                     """
                     SELECT *
                     FROM Question_Tags
                     """
                 )
-                question_tags_data = cursor.fetchall()
+                question_tags_data = await cursor.fetchall()
 
                 if not question_tags_data:
                     print("No question tags found in the database.", flush=True)
                     return []
 
-                column_names = [desc[0] for desc in cursor.description]
-                return [dict(zip(column_names, row)) for row in question_tags_data]
+                return question_tags_data
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(f"Error fetching question tags: {e}", flush=True)
             return []
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
 
-    def get_question_tag(self, question_id: int, tag_id: int) -> dict | None:
+    async def get_question_tag(
+        self, question_id: int, tag_id: int, primary: bool = False
+    ) -> Record | None:
         """
         Retrieves a single question tag association.
 
         Args:
             tag_id (int): The id of the tag.
             question_id (int): The id of the question.
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
 
         Returns:
-            dict | None: A dictionary containing information about the question tag if successful, None otherwise.
+            Record | None: A record containing information about the question tag if successful, None otherwise.
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            pool = self.replicas.pool_for_read(self.connectionPool, primary)
+            conn = await pool.getconn()
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
                     """
                     SELECT *
                     FROM Question_Tags
@@ -74,7 +89,7 @@ class QuestionTagMixin:
                     """,
                     [question_id, tag_id],
                 )
-                question_tag_data = cursor.fetchone()
+                question_tag_data = await cursor.fetchone()
 
                 if not question_tag_data:
                     print(
@@ -83,8 +98,9 @@ class QuestionTagMixin:
                     )
                     return None
 
-                column_names = [desc[0] for desc in cursor.description]
-                return dict(zip(column_names, question_tag_data))
+                return question_tag_data
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(
                 f"Failed to retrieve question tag {(question_id, tag_id)}: {e}",
@@ -93,51 +109,72 @@ class QuestionTagMixin:
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
 
-    def create_question_tag(self, question_tag: QuestionTagDict) -> dict | None:
+    async def stream_question_tags(
+        self, chunk_size: int = DATABASE_STREAM_CHUNK_SIZE, primary: bool = False
+    ) -> AsyncIterator[Record]:
         """
-        Assigns a set of tags to a specific question.
+        Streams all tags and associated questions, ordered by question and tag.
+
+        Rows are read through a server-side cursor, `chunk_size` at a time, so memory use does not grow
+        with the size of the table. The connection is held until the iterator is exhausted or closed.
 
         Args:
-            question_tag (QuestionTagDict): The object containing the specific question and the tag to be assigned.
+            chunk_size (int): The number of rows fetched per round trip.
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
 
-        Returns:
-            dict: A dictionary containing information about the new question tag if successful, None otherwise.
+        Yields:
+            Record: A record containing information about each tag association.
+
+        Raises:
+            DatabaseUnavailableError: If no connection became available in time.
+            psycopg.Error: If the rows could not be read, possibly after some were yielded.
         """
         conn = None
         try:
-            question_id, tag_id = question_tag.question_id, question_tag.tag_id
-
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            pool = self.replicas.pool_for_read(self.connectionPool, primary)
+            conn = await pool.getconn(partition=ADMIN)
+            async with conn.cursor(
+                name="stream_question_tags", row_factory=record_row
+            ) as cursor:
+                await cursor.execute(
                     """
-                    SELECT DISTINCT id
-                    FROM Questions
-                    """,
-                )
-                unique_questions = cursor.fetchall()
-                unique_questions = set(list([i[0] for i in unique_questions]))
-
-                cursor.execute(
+                    SELECT question_id, tag_id
+                    FROM Question_Tags
+                    ORDER BY question_id, tag_id
                     """
-                    SELECT DISTINCT id
-                    FROM Tags
-                    """,
                 )
-                unique_tags = cursor.fetchall()
-                unique_tags = set(list([i[0] for i in unique_tags]))
+                while rows := await cursor.fetchmany(chunk_size):
+                    for row in rows:
+                        yield row
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            print("Error streaming question tags:", e, flush=True)
+            raise
+        finally:
+            if conn:
+                await pool.putconn(conn)
 
-                if question_id not in unique_questions:
-                    print(f"No question found with id: {question_id}", flush=True)
-                    return None
+    async def create_question_tag(self, question_tag: QuestionTagDict) -> Record | None:
+        """
+        Assigns a set of tags to a specific question.
 
-                if tag_id not in unique_tags:
-                    print(f"No tag found with id: {tag_id}", flush=True)
-                    return None
+        Args:
+            question_tag (QuestionTagDict): The object containing the specific question and the tag to be assigned.
 
-                cursor.execute(
+        Returns:
+            Record | None: A record containing information about the new question tag if successful, None otherwise.
+        """
+        conn = None
+        try:
+            question_id, tag_id = question_tag.question_id, question_tag.tag_id
+
+            conn = await self.connectionPool.getconn()
+            async with conn.cursor(row_factory=record_row) as cursor:
+                # the foreign keys reject unknown questions and tags
+                await cursor.execute(
                     """
                     INSERT INTO Question_Tags (question_id, tag_id)
                     VALUES (%s, %s)
@@ -145,30 +182,140 @@ class QuestionTagMixin:
                     """,
                     [question_id, tag_id],
                 )
-                new_question_tag = cursor.fetchone()
-                conn.commit()
+                new_question_tag = await cursor.fetchone()
+                await conn.commit()
 
                 if not new_question_tag:
                     print("No question tags found in the database.", flush=True)
                     return []
 
-                column_names = [desc[0] for desc in cursor.description]
-                return dict(zip(column_names, new_question_tag))
-        except psycopg2.IntegrityError as e:
+                return new_question_tag
+        except psycopg.errors.ForeignKeyViolation as e:
+            print(
+                f"No question or tag found for {(question_id, tag_id)}: {e}", flush=True
+            )
+            return None
+        except psycopg.IntegrityError as e:
             if "duplicate key value violates unique constraint" in str(e):
                 print(f"Duplicate question tag entry: {e}", flush=True)
                 return None
             else:
                 print(f"Integrity error when assigning tags: {e}", flush=True)
                 raise e
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(f"Failed to assign tags: {e}", flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await self.connectionPool.putconn(conn)
+
+    async def update_question_tags(
+        self,
+        assign: List[QuestionTagDict],
+        remove: List[QuestionTagDict],
+    ) -> List[QuestionTagUpdateDict] | None:
+        """
+        Assigns and removes many tags at once, in a single statement.
+
+        Pairs are reported in the order given, assignments first. Assigning a pair whose question or tag
+        does not exist is skipped and reported rather than failing the whole batch, the foreign keys
+        still guard against either being deleted concurrently. A pair must not be both assigned and removed.
+        A pair given more than once is only assigned or removed by its first occurrence, the later ones
+        are reported as "already_assigned" or "not_assigned".
+
+        Args:
+            assign (List[QuestionTagDict]): The question and tag pairs to assign.
+            remove (List[QuestionTagDict]): The question and tag pairs to remove.
+
+        Returns:
+            List[QuestionTagUpdateDict] | None: The outcome of every pair if successful, None otherwise.
+                The status of an assigned pair is one of "assigned", "already_assigned", "question_not_found"
+                or "tag_not_found", that of a removed pair one of "removed" or "not_assigned".
+        """
+        conn = None
+        try:
+            pairs = [(pair["question_id"], pair["tag_id"], True) for pair in assign]
+            pairs += [(pair["question_id"], pair["tag_id"], False) for pair in remove]
+            if not pairs:
+                return []
+
+            conn = await self.connectionPool.getconn(partition=ADMIN)
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    WITH input AS (
+                      SELECT *
+                      FROM unnest(%s::INTEGER[], %s::INTEGER[], %s::BOOLEAN[])
+                        WITH ORDINALITY AS p(question_id, tag_id, assign, n)
+                    ), pairs AS (
+                      SELECT question_id, tag_id, assign, min(n) AS n
+                      FROM input
+                      GROUP BY question_id, tag_id, assign
+                    ), inserted AS (
+                      INSERT INTO Question_Tags (question_id, tag_id)
+                      SELECT p.question_id, p.tag_id
+                      FROM pairs p
+                      JOIN Questions q ON q.id = p.question_id
+                      JOIN Tags t ON t.id = p.tag_id
+                      WHERE p.assign
+                      ON CONFLICT (question_id, tag_id) DO NOTHING
+                      RETURNING question_id, tag_id
+                    ), deleted AS (
+                      DELETE FROM Question_Tags qt
+                      USING pairs p
+                      WHERE NOT p.assign
+                      AND qt.question_id = p.question_id
+                      AND qt.tag_id = p.tag_id
+                      RETURNING qt.question_id, qt.tag_id
+                    )
+                    SELECT i.question_id, i.tag_id, i.assign,
+                      CASE
+                        WHEN ins.question_id IS NOT NULL THEN 'assigned'
+                        WHEN d.question_id IS NOT NULL THEN 'removed'
+                        WHEN NOT i.assign THEN 'not_assigned'
+                        WHEN q.id IS NULL THEN 'question_not_found'
+                        WHEN t.id IS NULL THEN 'tag_not_found'
+                        ELSE 'already_assigned'
+                      END
+                    FROM input i
+                    JOIN pairs p
+                      ON p.question_id = i.question_id AND p.tag_id = i.tag_id AND p.assign = i.assign
+                    LEFT JOIN inserted ins
+                      ON i.assign AND i.n = p.n
+                      AND ins.question_id = i.question_id AND ins.tag_id = i.tag_id
+                    LEFT JOIN deleted d
+                      ON NOT i.assign AND i.n = p.n
+                      AND d.question_id = i.question_id AND d.tag_id = i.tag_id
+                    LEFT JOIN Questions q ON q.id = i.question_id
+                    LEFT JOIN Tags t ON t.id = i.tag_id
+                    ORDER BY i.n
+                    """,
+                    [list(column) for column in zip(*pairs)],
+                )
+                results = await cursor.fetchall()
+                await conn.commit()
+
+                return [
+                    QuestionTagUpdateDict(
+                        question_id=question_id,
+                        tag_id=tag_id,
+                        action="assign" if is_assign else "remove",
+                        status=status,
+                    )
+                    for question_id, tag_id, is_assign, status in results
+                ]
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            print(f"Failed to update question tags: {e}", flush=True)
+            return None
+        finally:
+            if conn:
+                await self.connectionPool.putconn(conn)
 
-    def delete_question_tag(self, question_id: int, tag_id: int) -> bool:
+    async def delete_question_tag(self, question_id: int, tag_id: int) -> bool:
         """
         Removes a previously assigned tag from a specific question.
 
@@ -181,9 +328,9 @@ class QuestionTagMixin:
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            conn = await self.connectionPool.getconn()
+            async with conn.cursor() as cursor:
+                await cursor.execute(
                     """
                     DELETE FROM Question_Tags
                     WHERE question_id = %s
@@ -191,7 +338,7 @@ class QuestionTagMixin:
                     """,
                     [question_id, tag_id],
                 )
-                conn.commit()
+                await conn.commit()
                 if cursor.rowcount > 0:
                     print(
                         f"Successfully deleted question tag with (question_id, tag_id): {(question_id, tag_id)}",
@@ -204,6 +351,8 @@ class QuestionTagMixin:
                         flush=True,
                     )
                     return False
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(
                 f"Failed to delete question tag {(question_id, tag_id)}: {e}",
@@ -212,4 +361,4 @@ class QuestionTagMixin:
             return False
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await self.connectionPool.putconn(conn)
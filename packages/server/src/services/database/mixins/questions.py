@@ -1,14 +1,43 @@
 # @author: adibarra (Alec Ibarra), Adi-K527 (Adi Kandakurtikar)
 # @description: Database class for handling question database operations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, AsyncIterator, List
 
-import psycopg2
+import psycopg
 
-from helpers.types import QuestionWithTagsDict
+from config import DATABASE_STREAM_CHUNK_SIZE
+from helpers.types import (
+    QuestionImportDict,
+    QuestionImportErrorDict,
+    QuestionWithTagsDict,
+)
+from services.database.errors import DatabaseUnavailableError
+from services.database.partitions import ADMIN, GAMEPLAY
+from services.database.rows import Record, record_row
 
 if TYPE_CHECKING:
-    from psycopg2.pool import SimpleConnectionPool
+    from helpers.question_bank import QuestionRow
+    from services.database.pool import ConnectionPool
+    from services.database.replicas import ReplicaSet
+
+# a question with its options and tags, in the shape of `QuestionWithTagsDict`, so each row is a record
+QUESTION_WITH_TAGS = """
+    SELECT q.id, q.question, q.difficulty,
+      array_remove(array_remove(ARRAY[q.option1, q.option2, q.option3, q.option4], NULL), '') AS options,
+      ARRAY(
+        SELECT qt.tag_id
+        FROM Question_Tags qt
+        WHERE qt.question_id = q.id
+        ORDER BY qt.tag_id
+      ) AS tags
+    FROM Questions q
+"""
+
+# hot queries, executed as prepared statements on each connection
+SELECT_QUESTION = f"""
+    {QUESTION_WITH_TAGS}
+    WHERE q.id = %s
+"""
 
 
 class QuestionsMixin:
@@ -16,123 +45,107 @@ class QuestionsMixin:
     A collection of methods for handling question database operations.
     """
 
-    connectionPool: "SimpleConnectionPool"
+    connectionPool: "ConnectionPool"
+    replicas: "ReplicaSet"
 
-    def get_question(self, id: int) -> QuestionWithTagsDict | None:
+    async def get_question(self, id: int, primary: bool = False) -> Record | None:
         """
         Retrieves a single question with its associated tags.
 
         Args:
             id (int): The id of the question.
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
 
         Returns:
-            QuestionWithTagsDict | None: A dictionary containing information about the question if successful, None otherwise.
+            Record | None: A record containing information about the question if successful, None otherwise.
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    """
-                    SELECT q.id, q.question, q.difficulty, q.option1, q.option2, q.option3, q.option4, qt.tag_id
-                    FROM Questions q
-                    LEFT JOIN Question_Tags qt ON q.id = qt.question_id
-                    WHERE q.id = %s
-                    """,
+            pool = self.replicas.pool_for_read(self.connectionPool, primary)
+            conn = await pool.getconn(partition=GAMEPLAY)
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
+                    SELECT_QUESTION,
                     [id],
+                    prepare=pool.prepare,
                 )
-                question_data = cursor.fetchall()
-
-                if not question_data:
-                    return None
-
-                question = {
-                    "id": question_data[0][0],
-                    "question": question_data[0][1],
-                    "difficulty": question_data[0][2],
-                    "options": [
-                        question_data[0][3],
-                        question_data[0][4],
-                        question_data[0][5],
-                        question_data[0][6],
-                    ],
-                    "tags": [],
-                }
-
-                for row in question_data:
-                    if row[7]:
-                        question["tags"].append(row[7])
-
-                return QuestionWithTagsDict(
-                    id=question["id"],
-                    question=question["question"],
-                    difficulty=question["difficulty"],
-                    options=[opt for opt in question["options"] if opt],
-                    tags=question["tags"],
-                )
+                return await cursor.fetchone()
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to retrieve question:", e, flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
 
-    def get_questions(self) -> list[QuestionWithTagsDict]:
+    async def get_questions(self, primary: bool = False) -> list[Record]:
         """
         Retrieves all questions with their associated tags.
 
+        Args:
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
+
         Returns:
-            list[dict]: A list of dictionaries containing information about each question if successful, an empty list otherwise.
+            list[Record]: A list of records containing information about each question if successful, an empty list otherwise.
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    """
-                    SELECT q.id, q.question, q.difficulty, q.option1, q.option2, q.option3, q.option4, qt.tag_id
-                    FROM Questions q
-                    LEFT JOIN Question_Tags qt ON q.id = qt.question_id
-                    """
-                )
-                questions_data = cursor.fetchall()
-
-                if not questions_data:
-                    return []
-
-                questions = {}
-                for row in questions_data:
-                    question_id = row[0]
-                    if question_id not in questions:
-                        questions[question_id] = {
-                            "id": row[0],
-                            "question": row[1],
-                            "difficulty": row[2],
-                            "options": [row[3], row[4], row[5], row[6]],
-                            "tags": [],
-                        }
-
-                    if row[7]:
-                        questions[question_id]["tags"].append(row[7])
-
-                return [
-                    QuestionWithTagsDict(
-                        id=question["id"],
-                        question=question["question"],
-                        difficulty=question["difficulty"],
-                        options=[opt for opt in question["options"] if opt],
-                        tags=question["tags"],
-                    )
-                    for question in questions.values()
-                ]
+            pool = self.replicas.pool_for_read(self.connectionPool, primary)
+            conn = await pool.getconn(partition=ADMIN)
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(f"{QUESTION_WITH_TAGS} ORDER BY q.id")
+                return await cursor.fetchall()
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Error fetching questions:", e, flush=True)
             return []
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
+
+    async def stream_questions(
+        self, chunk_size: int = DATABASE_STREAM_CHUNK_SIZE, primary: bool = False
+    ) -> AsyncIterator[Record]:
+        """
+        Streams all questions with their associated tags, ordered by id.
+
+        Rows are read through a server-side cursor, `chunk_size` at a time, so memory use does not grow
+        with the size of the table. The connection is held until the iterator is exhausted or closed.
+
+        Args:
+            chunk_size (int): The number of rows fetched per round trip.
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
+
+        Yields:
+            Record: A record containing information about each question.
 
-    def create_question(
+        Raises:
+            DatabaseUnavailableError: If no connection became available in time.
+            psycopg.Error: If the rows could not be read, possibly after some were yielded.
+        """
+        conn = None
+        try:
+            pool = self.replicas.pool_for_read(self.connectionPool, primary)
+            conn = await pool.getconn(partition=ADMIN)
+            async with conn.cursor(
+                name="stream_questions", row_factory=record_row
+            ) as cursor:
+                await cursor.execute(f"{QUESTION_WITH_TAGS} ORDER BY q.id")
+                while rows := await cursor.fetchmany(chunk_size):
+                    for row in rows:
+                        yield row
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            print("Error streaming questions:", e, flush=True)
+            raise
+        finally:
+            if conn:
+                await pool.putconn(conn)
+
+    async def create_question(
         self, question: QuestionWithTagsDict
     ) -> QuestionWithTagsDict | None:
         """
@@ -146,9 +159,9 @@ class QuestionsMixin:
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            conn = await self.connectionPool.getconn()
+            async with conn.cursor() as cursor:
+                await cursor.execute(
                     """
                     INSERT INTO Questions (question, difficulty, option1, option2, option3, option4)
                     VALUES (%s, %s, %s, %s, %s, %s)
@@ -172,20 +185,20 @@ class QuestionsMixin:
                     ],
                 )
 
-                question_data = cursor.fetchone()
+                question_data = await cursor.fetchone()
                 if not question_data:
                     return None
 
                 question_id = question_data[0]
                 if "tags" in question and question["tags"]:
-                    cursor.executemany(
+                    await cursor.executemany(
                         """
                         INSERT INTO Question_Tags (question_id, tag_id)
                         VALUES (%s, %s)
                         """,
                         [(question_id, tag) for tag in question["tags"]],
                     )
-                conn.commit()
+                await conn.commit()
 
                 return QuestionWithTagsDict(
                     id=question_id,
@@ -194,22 +207,147 @@ class QuestionsMixin:
                     options=[opt for opt in question_data[3:7] if opt],
                     tags=question["tags"] if "tags" in question else [],
                 )
-        except psycopg2.IntegrityError as e:
+        except psycopg.IntegrityError as e:
             if "duplicate key value violates unique constraint" in str(e):
                 print(f"Duplicate question entry: {e}", flush=True)
                 return None
             else:
                 print(f"Integrity error when creating question: {e}", flush=True)
                 raise e
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to create question:", e, flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await self.connectionPool.putconn(conn)
+
+    async def import_questions(
+        self, rows: List["QuestionRow"]
+    ) -> QuestionImportDict | None:
+        """
+        Imports validated questions and their tags in a single transaction.
+
+        The rows are streamed into temporary staging tables with `COPY`, then merged into `Questions`
+        and `Question_Tags` with a few set-based statements instead of one insert per row. Rows whose
+        question already exists or which reference an unknown tag are skipped and reported.
+
+        Args:
+            rows (List[QuestionRow]): The rows returned by `helpers.question_bank.prepare_question_bank`.
+
+        Returns:
+            QuestionImportDict | None: The number of rows received and imported, the number of tags assigned, and an error for every skipped row if successful, None otherwise.
+        """
+        conn = None
+        try:
+            conn = await self.connectionPool.getconn(partition=ADMIN)
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    CREATE TEMPORARY TABLE Question_Import(
+                      line INTEGER NOT NULL,
+                      question VARCHAR(500) NOT NULL,
+                      difficulty SMALLINT NOT NULL,
+                      option1 VARCHAR(50) NOT NULL,
+                      option2 VARCHAR(50) NOT NULL,
+                      option3 VARCHAR(50),
+                      option4 VARCHAR(50)
+                    ) ON COMMIT DROP;
+                    CREATE TEMPORARY TABLE Question_Tag_Import(
+                      line INTEGER NOT NULL,
+                      tag_id INTEGER NOT NULL
+                    ) ON COMMIT DROP
+                    """
+                )
+
+                async with cursor.copy(
+                    "COPY Question_Import (line, question, difficulty, option1, option2, option3, option4) FROM STDIN"
+                ) as copy:
+                    for row in rows:
+                        await copy.write_row(row[:7])
+                async with cursor.copy(
+                    "COPY Question_Tag_Import (line, tag_id) FROM STDIN"
+                ) as copy:
+                    for row in rows:
+                        for tag in row[7]:
+                            await copy.write_row((row[0], tag))
+                await cursor.execute("ANALYZE Question_Import, Question_Tag_Import")
+
+                errors: List[QuestionImportErrorDict] = []
+                await cursor.execute(
+                    """
+                    DELETE FROM Question_Import qi
+                    USING Questions q
+                    WHERE q.question = qi.question
+                    RETURNING qi.line
+                    """
+                )
+                errors += [
+                    QuestionImportErrorDict(line=line, error="Question already exists")
+                    for (line,) in await cursor.fetchall()
+                ]
+                await cursor.execute(
+                    """
+                    DELETE FROM Question_Import qi
+                    USING (
+                      SELECT qti.line, min(qti.tag_id) AS tag_id
+                      FROM Question_Tag_Import qti
+                      LEFT JOIN Tags t ON t.id = qti.tag_id
+                      WHERE t.id IS NULL
+                      GROUP BY qti.line
+                    ) unknown
+                    WHERE unknown.line = qi.line
+                    RETURNING qi.line, unknown.tag_id
+                    """
+                )
+                errors += [
+                    QuestionImportErrorDict(line=line, error=f"Unknown tag id {tag_id}")
+                    for line, tag_id in await cursor.fetchall()
+                ]
+
+                await cursor.execute(
+                    """
+                    WITH inserted AS (
+                      INSERT INTO Questions (question, difficulty, option1, option2, option3, option4)
+                      SELECT question, difficulty, option1, option2, option3, option4
+                      FROM Question_Import
+                      ORDER BY line
+                      ON CONFLICT (question) DO NOTHING
+                      RETURNING id, question
+                    ), tagged AS (
+                      INSERT INTO Question_Tags (question_id, tag_id)
+                      SELECT i.id, qti.tag_id
+                      FROM inserted i
+                      JOIN Question_Import qi ON qi.question = i.question
+                      JOIN Question_Tag_Import qti ON qti.line = qi.line
+                      ON CONFLICT (question_id, tag_id) DO NOTHING
+                      RETURNING 1
+                    )
+                    SELECT (SELECT count(*) FROM inserted), (SELECT count(*) FROM tagged)
+                    """
+                )
+                imported, tags = await cursor.fetchone()
+                await conn.commit()
+
+                errors.sort(key=lambda error: error["line"])
+                return QuestionImportDict(
+                    received=len(rows),
+                    imported=imported,
+                    tags=tags,
+                    errors=errors,
+                )
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            print("Failed to import questions:", e, flush=True)
+            return None
+        finally:
+            if conn:
+                await self.connectionPool.putconn(conn)
 
     # TODO: broken, needs to handle tags
-    def delete_question(self, question_id: int) -> bool:
+    async def delete_question(self, question_id: int) -> bool:
         """
         Deletes a question from the database.
 
@@ -221,16 +359,16 @@ class QuestionsMixin:
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            conn = await self.connectionPool.getconn()
+            async with conn.cursor() as cursor:
+                await cursor.execute(
                     """
                     DELETE FROM Questions
                     WHERE id = %s
                     """,
                     [question_id],
                 )
-                conn.commit()
+                await conn.commit()
                 if cursor.rowcount > 0:
                     print(
                         f"Successfully deleted question with id: {question_id}",
@@ -240,9 +378,11 @@ class QuestionsMixin:
                 else:
                     print(f"No question found with id: {question_id}", flush=True)
                     return False
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(f"Failed to delete question {question_id}: {e}", flush=True)
             return False
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await self.connectionPool.putconn(conn)
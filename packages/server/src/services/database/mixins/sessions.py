@@ -1,12 +1,56 @@
 # @author: adibarra (Alec Ibarra)
 # @description: Database class for handling session database operations
 
-from typing import TYPE_CHECKING, Optional
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
 
+from config import SESSION_LIFETIME, SESSION_MAX_PER_USER
+from helpers.tokens import SessionTokens
 from helpers.types import SessionDict
+from services.database.errors import DatabaseUnavailableError
+from services.database.partitions import ADMIN, GAMEPLAY
+from services.database.rows import record_row
 
 if TYPE_CHECKING:
-    from psycopg2.pool import SimpleConnectionPool
+    from helpers.cache import TTLCache
+    from helpers.tokens import RevocationList
+    from services.database.pool import ConnectionPool
+    from services.database.shards import ShardSet
+
+# hot queries, executed as prepared statements on each connection
+SELECT_LATEST_SESSION_BY_USER = """
+    SELECT *
+    FROM sessions
+    WHERE user_uuid = %s
+    AND created_at > now() - make_interval(secs => %s)
+    ORDER BY created_at DESC
+    LIMIT 1
+"""
+
+SELECT_SESSION_BY_TOKEN = """
+    SELECT *
+    FROM sessions
+    WHERE token = %s
+    AND created_at > now() - make_interval(secs => %s)
+"""
+
+RECORD_REVOCATION = """
+    INSERT INTO Session_Revocations (user_uuid, revoked_at)
+    VALUES (%s, now())
+    ON CONFLICT (user_uuid) DO UPDATE SET revoked_at = EXCLUDED.revoked_at
+    RETURNING revoked_at
+"""
+
+
+def _parse_session_id(token: UUID | str) -> Optional[UUID]:
+    # opaque tokens arrive as strings, anything that is not a uuid cannot match a session
+    if isinstance(token, UUID):
+        return token
+    try:
+        return UUID(token)
+    except ValueError:
+        return None
 
 
 class SessionsMixin:
@@ -14,31 +58,63 @@ class SessionsMixin:
     A collection of methods for handling session database operations.
     """
 
-    connectionPool: "SimpleConnectionPool"
+    connectionPool: "ConnectionPool"
+    shards: "ShardSet"
+    sessionCache: "TTLCache"
+    sessionTokens: Optional[SessionTokens]
+    sessionRevocations: Optional["RevocationList"]
+
+    def pool_for_session(self, token: UUID | str) -> "ConnectionPool":
+        """
+        Returns the pool of the shard holding a session and its owner's rows, without querying the database.
+
+        Session ids are drawn on their owner's shard, and signed tokens carry their owner's UUID. A token
+        which is malformed or fails verification maps to the primary, the session lookup rejects it anyway.
+
+        Args:
+            token (UUID | str): The session token.
+
+        Returns:
+            ConnectionPool: The pool of the session owner's shard.
+        """
+
+        if self.sessionTokens and SessionTokens.is_signed(token):
+            claims = self.sessionTokens.verify(token)
+            return self.shards.pool_for(claims["user_uuid"] if claims else None)
+        return self.shards.pool_for(_parse_session_id(token))
 
-    def get_session(
+    async def get_session(
         self,
-        user_uuid: Optional[str] = None,
-        token: Optional[str] = None,
+        user_uuid: Optional[UUID] = None,
+        token: Optional[UUID | str] = None,
     ) -> Optional[SessionDict]:
         """
         Retrieves the session details based on either the provided session token or the user UUID.
 
         This method queries the database for a session associated with the given `token` or `user_uuid`.
         If a session is found, it returns a `SessionDict` containing the session information. If no session
-        is found or an error occurs during the query, it returns `None`.
+        is found or an error occurs during the query, it returns `None`. A user may have several sessions,
+        looking up by `user_uuid` returns the most recent one.
+
+        Sessions older than `SESSION_LIFETIME` seconds are treated as expired and are not returned.
+
+        Lookups by `token` are served from the session cache when possible. Entries expire after
+        `SESSION_CACHE_TTL` seconds, which bounds how long a session revoked by another process stays valid here.
+        When signed tokens are enabled, a signed `token` is verified without querying the database at all.
+        An opaque `token` which is not a valid UUID is rejected without querying the database either.
 
         Args:
-            user_uuid (Optional[str]): The UUID of the session owner (user). Either this or `token` must be provided.
-            token (Optional[str]): The session token. Either this or `user_uuid` must be provided.
+            user_uuid (Optional[UUID]): The UUID of the session owner (user). Either this or `token` must be provided.
+            token (Optional[UUID | str]): The session token. Either this or `user_uuid` must be provided.
 
         Returns:
             Optional[SessionDict]:
                 - A `SessionDict` containing the session data if the session exists. The dictionary contains:
-                    - "user_uuid" (str): The UUID of the session owner (user).
-                    - "token" (str): The session token.
+                    - "user_uuid" (UUID): The UUID of the session owner (user).
+                    - "token" (UUID | str): The session token, a signed token if `token` was signed.
+                    - "device" (Optional[str]): The device the session was created for, if any.
                     - "created_at" (datetime): The timestamp when the session was created or updated.
-                - `None` if the session does not exist or if an error occurs.
+                - `None` if the session does not exist, has expired, or if an error occurs.
 
         Raises:
             ValueError: If neither `user_uuid` nor `token` is provided.
@@ -48,64 +124,84 @@ class SessionsMixin:
         if not (user_uuid or token):
             raise ValueError("Either user_uuid or token must be provided")
 
+        if token and not user_uuid:
+            if self.sessionTokens and SessionTokens.is_signed(token):
+                claims = self.sessionTokens.verify(token)
+                if claims is None or self.sessionRevocations.is_revoked(claims):
+                    return None
+
+                self.sessionRevocations.observe(claims)
+                return SessionDict(
+                    user_uuid=claims["user_uuid"],
+                    token=token,
+                    device=None,
+                    created_at=claims["created_at"],
+                )
+
+            token = _parse_session_id(token)
+            if token is None:
+                return None
+
+            cached = self.sessionCache.get(token)
+            if cached is not None:
+                return SessionDict(**cached)
+
         conn = None
+        pool = self.shards.pool_for(user_uuid or token)
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
+            conn = await pool.getconn(partition=GAMEPLAY)
+            async with conn.cursor(row_factory=record_row) as cursor:
                 if user_uuid:
-                    cursor.execute(
-                        """
-                        SELECT *
-                        FROM sessions
-                        WHERE user_uuid = %s
-                        """,
-                        [user_uuid],
+                    await cursor.execute(
+                        SELECT_LATEST_SESSION_BY_USER,
+                        [user_uuid, SESSION_LIFETIME],
+                        prepare=pool.prepare,
                     )
                 elif token:
-                    cursor.execute(
-                        """
-                        SELECT *
-                        FROM sessions
-                        WHERE token = %s
-                        """,
-                        [token],
+                    await cursor.execute(
+                        SELECT_SESSION_BY_TOKEN,
+                        [token, SESSION_LIFETIME],
+                        prepare=pool.prepare,
                     )
-                conn.commit()
+                await conn.commit()
 
-                result = cursor.fetchone()
+                result = await cursor.fetchone()
                 if not result:
                     return None
 
-                session_data = dict(
-                    zip([desc[0] for desc in cursor.description], result)
-                )
-                return SessionDict(
-                    user_uuid=session_data["user_uuid"],
-                    token=session_data["token"],
-                    created_at=session_data["created_at"],
+                session = SessionDict(
+                    user_uuid=result.user_uuid,
+                    token=result.token,
+                    device=result.device,
+                    created_at=result.created_at,
                 )
+                self.sessionCache.set(session["token"], session)
+                return SessionDict(**session)
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to retrieve session:", e, flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
 
-    def delete_session(
+    async def delete_session(
         self,
-        user_uuid: Optional[str] = None,
-        token: Optional[str] = None,
+        user_uuid: Optional[UUID] = None,
+        token: Optional[UUID | str] = None,
     ) -> bool:
         """
         Deletes an existing session from the database using either the provided session token or the user UUID.
 
         This method attempts to delete a session from the database based on either the `token` or the `user_uuid`.
-        If either parameter is provided, the session will be deleted. The method commits the transaction and returns
+        If either parameter is provided, the session will be deleted. Deleting by `user_uuid` revokes every session
+        of the user (on all devices) in a single statement. The method commits the transaction and returns
         `True` if the deletion is successful. If no session is found or an error occurs during the process, it returns `False`.
 
         Args:
-            user_uuid (Optional[str]): The UUID of the session owner (user) whose session is to be deleted.
-            token (Optional[str]): The session token of the session to be deleted.
+            user_uuid (Optional[UUID]): The UUID of the session owner (user) whose sessions are to be deleted.
+            token (Optional[UUID | str]): The session token of the session to be deleted.
 
         Returns:
             bool:
@@ -120,56 +216,87 @@ class SessionsMixin:
         if not (user_uuid or token):
             raise ValueError("Either `user_uuid` or `token` must be provided")
 
+        if token and self.sessionTokens and SessionTokens.is_signed(token):
+            claims = self.sessionTokens.verify(token)
+            if claims is None:
+                return False
+
+            self.sessionRevocations.revoke(
+                session_id=claims["session_id"], expires_at=claims["expires_at"]
+            )
+            token = claims["session_id"]
+        elif token:
+            token = _parse_session_id(token)
+            if token is None:
+                return False
+
         conn = None
+        pool = self.shards.pool_for(user_uuid or token)
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
+            conn = await pool.getconn()
+            async with conn.cursor() as cursor:
+                revoked_at = None
                 if user_uuid:
-                    cursor.execute(
+                    await cursor.execute(
                         """
                         DELETE FROM sessions
                         WHERE user_uuid = %s
                         """,
                         [user_uuid],
                     )
+                    deleted = cursor.rowcount
+                    revoked_at = await self._record_revocation(cursor, user_uuid)
                 elif token:
-                    cursor.execute(
+                    await cursor.execute(
                         """
                         DELETE FROM sessions
                         WHERE token = %s
                         """,
                         [token],
                     )
-                conn.commit()
+                    deleted = cursor.rowcount
+                await conn.commit()
 
-                return cursor.rowcount > 0
+                self.invalidate_sessions(
+                    user_uuid=user_uuid, token=token, revoked_at=revoked_at
+                )
+                return deleted > 0
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(f"Failed to delete session: {e}", flush=True)
             return False
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
 
-    def create_session(
+    async def create_session(
         self,
-        user_uuid: str,
+        user_uuid: UUID,
+        device: Optional[str] = None,
     ) -> Optional[SessionDict]:
         """
         Creates a new session in the database for the specified user.
 
-        This method inserts a new session into the `sessions` table or updates the existing session
-        if a session already exists for the provided `user_uuid`. The session information, including
-        the token and created_at timestamp, is returned as a `SessionDict`.
+        A user may hold up to `SESSION_MAX_PER_USER` sessions at once, creating another one evicts the
+        oldest sessions beyond the cap. If a `device` is given, any previous session of the user on that
+        device is replaced. The session information, including the token and created_at timestamp, is
+        returned as a `SessionDict`.
+
+        When signed tokens are enabled, the returned token is a signed token backed by the new session row.
+        Tokens are drawn on the same shard as their user, see `ShardSet.new_token`.
 
         Args:
-            user_uuid (str): The UUID of the user for whom the session is being created.
+            user_uuid (UUID): The UUID of the user for whom the session is being created.
+            device (Optional[str]): An identifier of the device the session is created for.
 
         Returns:
             Optional[SessionDict]:
                 - A `SessionDict` containing the session data if the creation or update was successful.
                   The dictionary contains:
-                    - "user_uuid" (str): The UUID of the session owner (user).
-                    - "token" (str): The generated or updated session token.
+                    - "user_uuid" (UUID): The UUID of the session owner (user).
+                    - "token" (UUID | str): The generated or updated session token, signed if signed tokens are enabled.
+                    - "device" (Optional[str]): The device the session was created for, if any.
                     - "created_at" (datetime): The timestamp when the session was created or updated.
                 - `None` if the operation failed.
 
@@ -178,36 +305,304 @@ class SessionsMixin:
         """
 
         conn = None
+        pool = self.shards.pool_for(user_uuid)
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            conn = await pool.getconn()
+            async with conn.cursor(row_factory=record_row) as cursor:
+                replaced_tokens = []
+                if device is not None:
+                    await cursor.execute(
+                        """
+                        SELECT token
+                        FROM sessions
+                        WHERE user_uuid = %s
+                        AND device = %s
+                        FOR UPDATE
+                        """,
+                        [user_uuid, device],
+                    )
+                    replaced_tokens += [row.token for row in await cursor.fetchall()]
+
+                await cursor.execute(
                     """
-                    INSERT INTO sessions (user_uuid, token, created_at)
-                    VALUES (%s, gen_random_uuid(), now())
-                    ON CONFLICT (user_uuid)
-                    DO UPDATE SET token = gen_random_uuid(), created_at = now()
+                    INSERT INTO sessions (user_uuid, token, device, created_at)
+                    VALUES (%s, %s, %s, now())
+                    ON CONFLICT (user_uuid, device) WHERE device IS NOT NULL
+                    DO UPDATE SET token = EXCLUDED.token, created_at = now()
                     RETURNING *
                     """,
-                    [user_uuid],
+                    [user_uuid, self.shards.new_token(user_uuid), device],
+                )
+                result = await cursor.fetchone()
+
+                # evict the oldest sessions beyond the per-user cap
+                await cursor.execute(
+                    """
+                    DELETE FROM sessions
+                    WHERE token IN (
+                        SELECT token
+                        FROM sessions
+                        WHERE user_uuid = %s
+                        ORDER BY created_at DESC, token
+                        OFFSET %s
+                    )
+                    RETURNING token
+                    """,
+                    [user_uuid, SESSION_MAX_PER_USER],
                 )
-                conn.commit()
+                replaced_tokens += [row.token for row in await cursor.fetchall()]
+                await conn.commit()
+
+                for replaced_token in replaced_tokens:
+                    self.invalidate_sessions(token=replaced_token)
 
-                result = cursor.fetchone()
                 if not result:
                     return None
 
-                session_data = dict(
-                    zip([desc[0] for desc in cursor.description], result)
-                )
-                return SessionDict(
-                    user_uuid=session_data["user_uuid"],
-                    token=session_data["token"],
-                    created_at=session_data["created_at"],
+                session = SessionDict(
+                    user_uuid=result.user_uuid,
+                    token=result.token,
+                    device=result.device,
+                    created_at=result.created_at,
                 )
+                if self.sessionTokens:
+                    session["token"] = self.sessionTokens.issue(
+                        session_id=result.token,
+                        user_uuid=result.user_uuid,
+                        created_at=result.created_at,
+                    )
+                    # tracked from the start, so refreshes catch its revocation even if it is never used here
+                    self.sessionRevocations.observe(
+                        self.sessionTokens.verify(session["token"])
+                    )
+                return session
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to create session:", e, flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
+
+    async def _record_revocation(self, cursor, user_uuid: UUID) -> Optional[datetime]:
+        """
+        Records that every session of a user was revoked, in the transaction deleting them, so every
+        process rejects the user's signed tokens created until now. Does nothing without signed tokens.
+
+        Args:
+            cursor: A cursor of the connection to the user's shard.
+            user_uuid (UUID): The UUID of the user.
+
+        Returns:
+            Optional[datetime]: The database time of the revocation, or None without signed tokens.
+        """
+
+        if not self.sessionRevocations:
+            return None
+        await cursor.execute(RECORD_REVOCATION, [user_uuid])
+        return (await cursor.fetchone())[0]
+
+    def invalidate_sessions(
+        self,
+        user_uuid: Optional[UUID] = None,
+        token: Optional[UUID] = None,
+        revoked_at: Optional[datetime] = None,
+    ) -> int:
+        """
+        Removes sessions from the session cache so the next lookup goes to the database.
+        When signed tokens are enabled, the matching signed tokens are revoked as well.
+
+        This must be called whenever sessions are replaced or deleted outside of `get_session`.
+
+        Args:
+            user_uuid (Optional[UUID]): Removes every cached session owned by this user.
+            token (Optional[UUID]): Removes the cached session with this token (the session id, not a signed token).
+            revoked_at (Optional[datetime]): With `user_uuid`, the time returned by `_record_revocation`,
+                which also revokes the user's signed tokens this process never saw.
+
+        Returns:
+            int: The number of cache entries removed.
+        """
+
+        removed = 0
+        if token:
+            removed += int(self.sessionCache.delete(token))
+            if self.sessionRevocations:
+                self.sessionRevocations.revoke(session_id=token)
+        if user_uuid:
+            removed += self.sessionCache.delete_where(
+                lambda session: session["user_uuid"] == user_uuid
+            )
+            if self.sessionRevocations:
+                self.sessionRevocations.revoke(
+                    user_uuid=user_uuid, revoked_at=revoked_at
+                )
+        return removed
+
+    async def refresh_revocations(self) -> int:
+        """
+        Revokes every signed token seen by this process whose session no longer exists in the database,
+        and loads the users whose sessions were all revoked by other processes.
+
+        This runs periodically in the background when signed tokens are enabled, so sessions deleted
+        by other processes stop being accepted here within `SESSION_REVOCATION_REFRESH` seconds.
+
+        Returns:
+            int: The number of newly revoked sessions and users.
+
+        Raises:
+            Exception: For errors that may occur while querying the sessions (e.g., database connectivity issues).
+        """
+
+        candidates = self.sessionRevocations.refresh_candidates()
+        live = await self.get_live_session_ids(candidates) if candidates else set()
+        cutoffs = await self.get_session_revocations(
+            self.sessionRevocations.cutoffs_since()
+        )
+        return self.sessionRevocations.apply_refresh(
+            candidates, live
+        ) + self.sessionRevocations.apply_cutoffs(cutoffs)
+
+    async def get_session_revocations(
+        self, since: Optional[datetime] = None
+    ) -> List[Tuple[UUID, datetime]]:
+        """
+        Retrieves the users whose sessions were all revoked, from every shard.
+
+        Args:
+            since (Optional[datetime]): Only returns revocations after this time, defaults to every
+                revocation younger than `SESSION_LIFETIME` seconds.
+
+        Returns:
+            List[Tuple[UUID, datetime]]: The user uuids and the times their sessions were revoked.
+
+        Raises:
+            Exception: For errors that may occur during the query (e.g., database connectivity issues).
+        """
+
+        async def fetch(pool: "ConnectionPool") -> list:
+            conn = None
+            try:
+                conn = await pool.getconn()
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        SELECT user_uuid, revoked_at
+                        FROM Session_Revocations
+                        WHERE revoked_at > COALESCE(
+                            %s::timestamp, now() - make_interval(secs => %s)
+                        )
+                        """,
+                        [since, SESSION_LIFETIME],
+                    )
+                    await conn.commit()
+
+                    return await cursor.fetchall()
+            finally:
+                if conn:
+                    await pool.putconn(conn)
+
+        return [row for rows in await self.shards.each(fetch) for row in rows]
+
+    async def get_live_session_ids(self, session_ids: Iterable[UUID]) -> Set[UUID]:
+        """
+        Filters the given session ids down to those which still exist in the database.
+
+        Args:
+            session_ids (Iterable[UUID]): The session ids (the `token` column) to check.
+
+        Returns:
+            Set[UUID]: The subset of `session_ids` which still exist.
+
+        Raises:
+            Exception: For errors that may occur during the query (e.g., database connectivity issues).
+        """
+
+        by_pool = {}
+        for session_id in session_ids:
+            by_pool.setdefault(self.shards.pool_for(session_id), []).append(session_id)
+
+        live = set()
+        for pool, ids in by_pool.items():
+            conn = None
+            try:
+                conn = await pool.getconn()
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        SELECT token
+                        FROM sessions
+                        WHERE token = ANY(%s)
+                        """,
+                        [ids],
+                    )
+                    await conn.commit()
+
+                    live.update(row[0] for row in await cursor.fetchall())
+            finally:
+                if conn:
+                    await pool.putconn(conn)
+        return live
+
+    async def delete_expired_sessions(self, limit: int) -> int:
+        """
+        Deletes up to `limit` sessions older than `SESSION_LIFETIME` seconds, and the session revocations
+        older than that, from every shard at once.
+
+        Each call deletes a single small batch in its own short transaction, skipping rows locked by
+        concurrent requests, so sweeping a large backlog never holds long locks on the `sessions` table.
+
+        Args:
+            limit (int): The maximum number of sessions to delete per shard.
+
+        Returns:
+            int: The number of sessions deleted.
+
+        Raises:
+            Exception: For errors that may occur during the deletion (e.g., database connectivity issues).
+        """
+
+        async def delete(pool: "ConnectionPool") -> int:
+            conn = None
+            try:
+                conn = await pool.getconn(partition=ADMIN)
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        """
+                        DELETE FROM sessions
+                        WHERE token IN (
+                            SELECT token
+                            FROM sessions
+                            WHERE created_at <= now() - make_interval(secs => %s)
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING token
+                        """,
+                        [SESSION_LIFETIME, limit],
+                    )
+                    rows = await cursor.fetchall()
+                    # every session a revocation could apply to has expired by now
+                    await cursor.execute(
+                        """
+                        DELETE FROM Session_Revocations
+                        WHERE revoked_at <= now() - make_interval(secs => %s)
+                        """,
+                        [SESSION_LIFETIME],
+                    )
+                    await conn.commit()
+
+                    for row in rows:
+                        self.invalidate_sessions(token=row[0])
+
+                    return len(rows)
+            except Exception:
+                if conn:
+                    await conn.rollback()
+                raise
+            finally:
+                if conn:
+                    await pool.putconn(conn)
+
+        return sum(await self.shards.each(delete))
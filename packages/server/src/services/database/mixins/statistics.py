@@ -2,11 +2,34 @@
 # @description: Database class for handling statistics database operations
 
 from typing import TYPE_CHECKING, Optional
+from uuid import UUID
 
-from helpers.types import StatisticsDict
+from services.database.errors import DatabaseUnavailableError
+from services.database.partitions import GAMEPLAY
+from services.database.rows import Record, record_row
 
 if TYPE_CHECKING:
-    from psycopg2.pool import SimpleConnectionPool
+    from services.database.aggregator import StatisticsAggregator
+    from services.database.pool import ConnectionPool
+    from services.database.replicas import ReplicaSet
+    from services.database.shards import ShardSet
+
+# hot queries, executed as prepared statements on each connection
+SELECT_STATISTICS = """
+    SELECT user_uuid, xp, wins, losses
+    FROM Statistics
+    WHERE user_uuid = %s
+"""
+
+UPDATE_STATISTICS = """
+    INSERT INTO Statistics (user_uuid, xp, wins, losses)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (user_uuid) DO UPDATE
+    SET xp = Statistics.xp + EXCLUDED.xp,
+        wins = Statistics.wins + EXCLUDED.wins,
+        losses = Statistics.losses + EXCLUDED.losses
+    RETURNING user_uuid, xp, wins, losses
+"""
 
 
 class StatisticsMixin:
@@ -14,69 +37,87 @@ class StatisticsMixin:
     A collection of methods for handling statistics database operations.
     """
 
-    connectionPool: "SimpleConnectionPool"
+    connectionPool: "ConnectionPool"
+    replicas: "ReplicaSet"
+    shards: "ShardSet"
+    statisticsAggregator: Optional["StatisticsAggregator"]
 
-    def get_statistics(self, uuid: str) -> Optional[StatisticsDict]:
+    async def get_statistics(
+        self, uuid: UUID, primary: bool = False
+    ) -> Optional[Record]:
         """
         Retrieves statistics for a given user. If no statistics entry exists for the user,
         initializes it using the `create_statistics` method.
 
+        In write-behind mode, the increments not written to the database yet are included.
+
         Args:
-            uuid (str): The UUID of the user whose statistics are being retrieved.
+            uuid (UUID): The UUID of the user whose statistics are being retrieved.
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
 
         Returns:
-            Optional[StatisticsDict]:
-                - A dictionary containing the user's statistics if successful:
-                    - "user_uuid" (str): The UUID of the user.
+            Optional[Record]:
+                - A record containing the user's statistics if successful:
+                    - "user_uuid" (UUID): The UUID of the user.
                     - "xp" (int): The user's experience points.
                     - "wins" (int): The user's number of wins.
                     - "losses" (int): The user's number of losses.
                 - `None` if an error occurs during the operation.
         """
 
+        if self.statisticsAggregator is not None:
+            return await self.statisticsAggregator.read(
+                lambda: self._read_statistics(uuid, primary)
+            )
+        return await self._read_statistics(uuid, primary)
+
+    async def _read_statistics(self, uuid: UUID, primary: bool) -> Optional[Record]:
         conn = None
+        home = self.shards.pool_for(uuid)
+        # the replicas only replicate the primary, rows on other shards are read from the shard itself
+        pool = (
+            self.replicas.pool_for_read(home, primary)
+            if home is self.connectionPool
+            else home
+        )
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    """
-                    SELECT user_uuid, xp, wins, losses
-                    FROM Statistics
-                    WHERE user_uuid = %s
-                    """,
+            conn = await pool.getconn(partition=GAMEPLAY)
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
+                    SELECT_STATISTICS,
                     [uuid],
+                    prepare=pool.prepare,
                 )
-                result = cursor.fetchone()
-
-                if not result:
-                    # Create a new statistics entry if none exists
-                    return self.create_statistics(uuid)
-
-                statistics_data = dict(zip([desc[0] for desc in cursor.description], result))
-                return StatisticsDict(
-                    user_uuid=statistics_data["user_uuid"],
-                    xp=statistics_data["xp"],
-                    wins=statistics_data["wins"],
-                    losses=statistics_data["losses"],
-                )
+                result = await cursor.fetchone()
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to retrieve statistics:", e, flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
-
-    def create_statistics(self, uuid: str) -> Optional[StatisticsDict]:
+                await pool.putconn(conn)
+
+        # the connection is returned first, so the fallbacks never hold two connections at once
+        if result:
+            return result
+        if pool is not home:
+            # the entry may have been created after the replica last caught up
+            return await self._read_statistics(uuid, primary=True)
+        # Create a new statistics entry if none exists
+        return await self.create_statistics(uuid)
+
+    async def create_statistics(self, uuid: UUID) -> Optional[Record]:
         """
         Initializes statistics for a given user with default values (`xp=0, wins=0, losses=0`).
 
         Args:
-            uuid (str): The UUID of the user for whom statistics are being initialized.
+            uuid (UUID): The UUID of the user for whom statistics are being initialized.
 
         Returns:
-            Optional[StatisticsDict]:
-                - A dictionary containing the newly created statistics if successful:
-                    - "user_uuid" (str): The UUID of the user.
+            Optional[Record]:
+                - A record containing the newly created statistics if successful:
+                    - "user_uuid" (UUID): The UUID of the user.
                     - "xp" (int): The user's experience points (default 0).
                     - "wins" (int): The user's number of wins (default 0).
                     - "losses" (int): The user's number of losses (default 0).
@@ -84,10 +125,11 @@ class StatisticsMixin:
         """
 
         conn = None
+        pool = self.shards.pool_for(uuid)
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            conn = await pool.getconn(partition=GAMEPLAY)
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
                     """
                     INSERT INTO Statistics (user_uuid)
                     VALUES (%s)
@@ -95,74 +137,78 @@ class StatisticsMixin:
                     """,
                     [uuid],
                 )
-                result = cursor.fetchone()
-                conn.commit()
+                result = await cursor.fetchone()
+                await conn.commit()
 
                 if result:
-                    statistics_data = dict(zip([desc[0] for desc in cursor.description], result))
-                    return StatisticsDict(
-                        user_uuid=statistics_data["user_uuid"],
-                        xp=statistics_data["xp"],
-                        wins=statistics_data["wins"],
-                        losses=statistics_data["losses"],
-                    )
+                    return result
                 return None
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to create statistics:", e, flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
 
-    def update_statistics(
+    async def update_statistics(
         self,
-        uuid: str,
+        uuid: UUID,
         xp_increment: int = 0,
         wins_increment: int = 0,
         losses_increment: int = 0,
-    ) -> bool:
+    ) -> Optional[Record]:
         """
         Updates the statistics for a given user by adding the specified increments to their current values.
 
-        This function ensures the user's statistics entry exists before performing the update.
+        If no statistics entry exists for the user yet, it is created with the increments as its values.
+        The updated statistics are returned by the same statement, so no follow-up read is needed.
+
+        In write-behind mode (`STATISTICS_WRITE_BEHIND`), the increments are only added to the pending
+        increments of the user, which are written in batches, and the statistics are read from the
+        user's shard instead.
 
         Args:
-            uuid (str): The UUID of the user whose statistics are being updated.
+            uuid (UUID): The UUID of the user whose statistics are being updated.
             xp_increment (int): The amount to add to the user's XP (default is 0).
             wins_increment (int): The number of wins to add to the user's total (default is 0).
             losses_increment (int): The number of losses to add to the user's total (default is 0).
 
         Returns:
-            bool:
-                - `True` if the statistics were successfully updated.
-                - `False` if an error occurs during the operation.
+            Optional[Record]:
+                - A record containing the user's updated statistics if successful.
+                - `None` if an error occurs during the operation.
         """
 
+        if self.statisticsAggregator is not None:
+            self.statisticsAggregator.add(
+                uuid, xp_increment, wins_increment, losses_increment
+            )
+            return await self.get_statistics(uuid, primary=True)
+
         conn = None
+        pool = self.shards.pool_for(uuid)
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                current_stats = self.get_statistics(uuid)
-                if not current_stats:
-                    print(f"Failed to find or initialize statistics for user {uuid}")
-                    return False
-
-                cursor.execute(
-                    """
-                    UPDATE Statistics
-                    SET xp = xp + %s,
-                        wins = wins + %s,
-                        losses = losses + %s
-                    WHERE user_uuid = %s
-                    """,
-                    [xp_increment, wins_increment, losses_increment, uuid],
+            conn = await pool.getconn(partition=GAMEPLAY)
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
+                    UPDATE_STATISTICS,
+                    [uuid, xp_increment, wins_increment, losses_increment],
+                    prepare=pool.prepare,
                 )
-                conn.commit()
+                result = await cursor.fetchone()
+                await conn.commit()
+
+                if not result:
+                    return None
 
-                return cursor.rowcount > 0
+                return result
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to update statistics:", e, flush=True)
-            return False
+            return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
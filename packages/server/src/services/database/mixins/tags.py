@@ -1,14 +1,18 @@
 # @author: Adi-K527 (Adi Kandakurtikar)
 # @description: Database class for handling tag database operations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, AsyncIterator
 
-import psycopg2
+import psycopg
 
+from config import DATABASE_STREAM_CHUNK_SIZE
 from helpers.types import TagDict
+from services.database.errors import DatabaseUnavailableError
+from services.database.rows import Record, record_row
 
 if TYPE_CHECKING:
-    from psycopg2.pool import SimpleConnectionPool
+    from services.database.pool import ConnectionPool
+    from services.database.replicas import ReplicaSet
 
 
 class TagsMixin:
@@ -16,55 +20,63 @@ class TagsMixin:
     A collection of methods for handling tag database operations.
     """
 
-    connectionPool: "SimpleConnectionPool"
+    connectionPool: "ConnectionPool"
+    replicas: "ReplicaSet"
 
-    def get_tags(self) -> list[dict]:
+    async def get_tags(self, primary: bool = False) -> list[Record]:
         """
         Retrieves all tags.
 
+        Args:
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
+
         Returns:
-            list[dict]: A list of dictionaries containing information about each tag if successful, an empty list otherwise.
+            list[Record]: A list of records containing information about each tag if successful, an empty list otherwise.
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            pool = self.replicas.pool_for_read(self.connectionPool, primary)
+            conn = await pool.getconn()
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
                     """
                     SELECT *
                     FROM Tags
                     """
                 )
-                tags_data = cursor.fetchall()
+                tags_data = await cursor.fetchall()
 
                 if not tags_data:
                     print("No tags found in the database.", flush=True)
                     return []
 
-                column_names = [desc[0] for desc in cursor.description]
-                return [dict(zip(column_names, row)) for row in tags_data]
+                return tags_data
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(f"Error fetching tags: {e}", flush=True)
             return []
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
 
-    def get_tag(self, tag_id: int) -> dict | None:
+    async def get_tag(self, tag_id: int, primary: bool = False) -> Record | None:
         """
         Retrieves a single tag.
 
         Args:
             tag_id (int): The id of the tag.
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
 
         Returns:
-            dict | None: A dictionary containing information about the tag if successful, None otherwise.
+            Record | None: A record containing information about the tag if successful, None otherwise.
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            pool = self.replicas.pool_for_read(self.connectionPool, primary)
+            conn = await pool.getconn()
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
                     """
                     SELECT *
                     FROM Tags
@@ -72,22 +84,69 @@ class TagsMixin:
                     """,
                     [tag_id],
                 )
-                tag_data = cursor.fetchone()
+                tag_data = await cursor.fetchone()
 
                 if not tag_data:
                     print(f"No tag found with id: {tag_id}", flush=True)
                     return None
 
-                column_names = [desc[0] for desc in cursor.description]
-                return dict(zip(column_names, tag_data))
+                return tag_data
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(f"Failed to retrieve tag {tag_id}: {e}", flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
+
+    async def stream_tags(
+        self, chunk_size: int = DATABASE_STREAM_CHUNK_SIZE, primary: bool = False
+    ) -> AsyncIterator[Record]:
+        """
+        Streams all tags, ordered by id.
+
+        Rows are read through a server-side cursor, `chunk_size` at a time, so memory use does not grow
+        with the size of the table. The connection is held until the iterator is exhausted or closed.
+
+        Args:
+            chunk_size (int): The number of rows fetched per round trip.
+            primary (bool): Reads from the primary instead of a replica, e.g. right after a write.
+
+        Yields:
+            Record: A record containing information about each tag.
+
+        Raises:
+            DatabaseUnavailableError: If no connection became available in time.
+            psycopg.Error: If the rows could not be read, possibly after some were yielded.
+        """
+        conn = None
+        try:
+            pool = self.replicas.pool_for_read(self.connectionPool, primary)
+            conn = await pool.getconn()
+            async with conn.cursor(
+                name="stream_tags", row_factory=record_row
+            ) as cursor:
+                await cursor.execute(
+                    """
+                    SELECT id, name, description
+                    FROM Tags
+                    ORDER BY id
+                    """
+                )
+                while rows := await cursor.fetchmany(chunk_size):
+                    for row in rows:
+                        yield row
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            print("Error streaming tags:", e, flush=True)
+            raise
+        finally:
+            if conn:
+                await pool.putconn(conn)
 
-    def create_tag(self, tag: TagDict) -> dict | None:
+    async def create_tag(self, tag: TagDict) -> Record | None:
         """
         Creates a new tag in the database.
 
@@ -95,14 +154,14 @@ class TagsMixin:
             tag (TagDict): The object containing the attributes of the tag.
 
         Returns:
-            dict | None: A dictionary containing information about the newly created tag if successful, None otherwise.
+            Record | None: A record containing information about the newly created tag if successful, None otherwise.
         """
 
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            conn = await self.connectionPool.getconn()
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
                     """
                     INSERT INTO Tags (name, description)
                     VALUES (%s, %s)
@@ -110,30 +169,31 @@ class TagsMixin:
                     """,
                     [tag.name, tag.description],
                 )
-                tag_data = cursor.fetchone()
-                conn.commit()
+                tag_data = await cursor.fetchone()
+                await conn.commit()
 
                 if not tag_data:
                     print("Failed to retrieve tag data after insertion.", flush=True)
                     return None
 
-                column_names = [desc[0] for desc in cursor.description]
-                return dict(zip(column_names, tag_data))
-        except psycopg2.IntegrityError as e:
+                return tag_data
+        except psycopg.IntegrityError as e:
             if "duplicate key value violates unique constraint" in str(e):
                 print(f"Duplicate question entry: {e}", flush=True)
                 return None
             else:
                 print(f"Integrity error when creating tag: {e}", flush=True)
                 raise e
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(f"Failed to create tag: {e}", flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await self.connectionPool.putconn(conn)
 
-    def delete_tag(self, tag_id: int) -> bool:
+    async def delete_tag(self, tag_id: int) -> bool:
         """
         Deletes a tag from the database.
 
@@ -145,16 +205,16 @@ class TagsMixin:
         """
         conn = None
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            conn = await self.connectionPool.getconn()
+            async with conn.cursor() as cursor:
+                await cursor.execute(
                     """
                     DELETE FROM Tags
                     WHERE id = %s
                     """,
                     [tag_id],
                 )
-                conn.commit()
+                await conn.commit()
                 if cursor.rowcount > 0:
                     print(
                         f"Successfully deleted tag with id: {tag_id}",
@@ -164,9 +224,11 @@ class TagsMixin:
                 else:
                     print(f"No tag found with id: {tag_id}", flush=True)
                     return False
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print(f"Failed to delete tag {tag_id}: {e}", flush=True)
             return False
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await self.connectionPool.putconn(conn)
@@ -2,11 +2,15 @@
 # @description: Database class for handling user database operations
 
 from typing import TYPE_CHECKING, Optional
+from uuid import UUID, uuid4
 
-from helpers.types import UserDict
+from services.database.errors import DatabaseUnavailableError
+from services.database.partitions import ADMIN
+from services.database.rows import Record, record_row
 
 if TYPE_CHECKING:
-    from psycopg2.pool import SimpleConnectionPool
+    from services.database.pool import ConnectionPool
+    from services.database.shards import ShardSet
 
 
 class UsersMixin:
@@ -14,28 +18,30 @@ class UsersMixin:
     A collection of methods for handling user database operations.
     """
 
-    connectionPool: "SimpleConnectionPool"
+    connectionPool: "ConnectionPool"
+    shards: "ShardSet"
 
-    def get_user(
+    async def get_user(
         self,
-        uuid: Optional[str] = None,
+        uuid: Optional[UUID] = None,
         username: Optional[str] = None,
-    ) -> Optional[UserDict]:
+    ) -> Optional[Record]:
         """
         Retrieves user details based on either the provided UUID or username.
 
         This method queries the database for a user associated with the given `uuid` or `username`.
-        If a user is found, it returns a `UserDict` containing the user's information. If no user
-        is found or an error occurs during the query, it returns `None`.
+        If a user is found, it returns a record containing the user's information. If no user
+        is found or an error occurs during the query, it returns `None`. When user data is sharded,
+        a `username` is first resolved to the user's uuid through the user directory on the primary.
 
         Args:
-            uuid (Optional[str]): The UUID of the user. Either this or `username` must be provided.
+            uuid (Optional[UUID]): The UUID of the user. Either this or `username` must be provided.
             username (Optional[str]): The username of the user. Either this or `uuid` must be provided.
 
         Returns:
-            Optional[UserDict]:
-                - A `UserDict` containing the user's data if the user exists. The dictionary contains:
-                    - "uuid" (str): The UUID of the user.
+            Optional[Record]:
+                - A record containing the user's data if the user exists. The record contains:
+                    - "uuid" (UUID): The UUID of the user.
                     - "username" (str): The username of the user.
                     - "password_hash" (str): The hashed password of the user.
                 - `None` if the user does not exist or if an error occurs.
@@ -47,12 +53,18 @@ class UsersMixin:
         if not (uuid or username):
             raise ValueError("Either uuid or username must be provided")
 
+        if not uuid and self.shards.enabled:
+            uuid = await self._find_user_uuid(username)
+            if uuid is None:
+                return None
+
         conn = None
+        pool = self.shards.pool_for(uuid)
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
+            conn = await pool.getconn()
+            async with conn.cursor(row_factory=record_row) as cursor:
                 if uuid:
-                    cursor.execute(
+                    await cursor.execute(
                         """
                         SELECT *
                         FROM users
@@ -61,7 +73,7 @@ class UsersMixin:
                         [uuid],
                     )
                 elif username:
-                    cursor.execute(
+                    await cursor.execute(
                         """
                         SELECT *
                         FROM users
@@ -69,28 +81,25 @@ class UsersMixin:
                         """,
                         [username],
                     )
-                conn.commit()
+                await conn.commit()
 
-                result = cursor.fetchone()
+                result = await cursor.fetchone()
                 if not result:
                     return None
 
-                user_data = dict(zip([desc[0] for desc in cursor.description], result))
-                return UserDict(
-                    uuid=user_data["uuid"],
-                    username=user_data["username"],
-                    password_hash=user_data["password_hash"],
-                )
+                return result
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to retrieve user:", e, flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
 
-    def delete_user(
+    async def delete_user(
         self,
-        uuid: Optional[str] = None,
+        uuid: Optional[UUID] = None,
         username: Optional[str] = None,
     ) -> bool:
         """
@@ -101,7 +110,7 @@ class UsersMixin:
         identifier exists or if an error occurs, it returns `False`.
 
         Args:
-            uuid (Optional[str]): The UUID of the user to be deleted. Either this or `username` must be provided.
+            uuid (Optional[UUID]): The UUID of the user to be deleted. Either this or `username` must be provided.
             username (Optional[str]): The username of the user to be deleted. Either this or `uuid` must be provided.
 
         Returns:
@@ -115,67 +124,94 @@ class UsersMixin:
         if not (uuid or username):
             raise ValueError("Either uuid or username must be provided")
 
+        if not uuid and self.shards.enabled:
+            uuid = await self._find_user_uuid(username)
+            if uuid is None:
+                return False
+
         conn = None
+        pool = self.shards.pool_for(uuid)
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
+            conn = await pool.getconn(partition=ADMIN)
+            async with conn.cursor() as cursor:
                 if uuid:
-                    cursor.execute(
+                    await cursor.execute(
                         """
                         DELETE FROM users
                         WHERE uuid = %s
+                        RETURNING uuid
                         """,
                         [uuid],
                     )
                 elif username:
-                    cursor.execute(
+                    await cursor.execute(
                         """
                         DELETE FROM users
                         WHERE username = %s
+                        RETURNING uuid
                         """,
                         [username],
                     )
-                conn.commit()
-
-                return cursor.rowcount > 0
+                rows = await cursor.fetchall()
+                revocations = [
+                    await self._record_revocation(cursor, row[0]) for row in rows
+                ]
+                await conn.commit()
+
+                # sessions are removed by the cascade, drop their cached copies too
+                for row, revoked_at in zip(rows, revocations):
+                    self.invalidate_sessions(user_uuid=row[0], revoked_at=revoked_at)
+                    if self.shards.enabled:
+                        await self._delete_user_directory(row[0])
+
+                return len(rows) > 0
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to delete user:", e, flush=True)
             return False
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
 
-    def update_user(
+    async def update_user(
         self,
-        uuid: str,
+        uuid: UUID,
         username: Optional[str] = None,
         password_hash: Optional[str] = None,
-    ) -> bool:
+    ) -> Optional[Record]:
         """
         Updates a user in the database.
 
         This method updates a user's details in the database based on the provided `uuid`.
         It allows updating the user's `username` and/or `password_hash`. If at least one
-        field is updated successfully, it returns `True`. If an error occurs or no fields are updated,
-        it returns `False`.
+        field is updated successfully, it returns the updated user. If an error occurs or no fields
+        are updated, it returns `None`. When user data is sharded, a new `username` is claimed in the
+        user directory first, so it stays unique across shards.
 
         Args:
-            uuid (str): The UUID of the user to be updated.
+            uuid (UUID): The UUID of the user to be updated.
             username (Optional[str]): The new username of the user. Default is `None`.
             password_hash (Optional[str]): The new password hash of the user. Default is `None`.
 
         Returns:
-            bool:
-                - `True` if the user was successfully updated.
-                - `False` if no changes were made or if an error occurs during the update process.
+            Optional[Record]:
+                - The updated user if the user was successfully updated.
+                - `None` if no changes were made or if an error occurs during the update process.
 
         Raises:
             Exception: For errors that may occur during the update (e.g., database connectivity issues).
         """
+        claimed = username is not None and self.shards.enabled
+        if claimed and not await self._set_user_directory(uuid, username):
+            return None
+
         conn = None
+        result = None
+        pool = self.shards.pool_for(uuid)
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
+            conn = await pool.getconn()
+            async with conn.cursor(row_factory=record_row) as cursor:
                 set_clause = []
                 params = []
 
@@ -187,73 +223,221 @@ class UsersMixin:
                     params.append(password_hash)
 
                 if not set_clause:
-                    return False
+                    return None
 
                 query = f"UPDATE users SET {", ".join(set_clause)} WHERE uuid = %s"
+                query += " RETURNING uuid, username, password_hash"
                 params.append(uuid)
 
-                cursor.execute(query, params)
-                conn.commit()
+                await cursor.execute(query, params)
+                row = await cursor.fetchone()
+                await conn.commit()
+                result = row
 
-                return cursor.rowcount > 0
+                if not result:
+                    return None
+
+                return result
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to update user:", e, flush=True)
-            return False
+            return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
+            if claimed and result is None:
+                # the rename did not happen, point the directory back at the current username
+                await self._sync_user_directory(uuid)
 
-    def create_user(
+    async def create_user(
         self,
         username: str,
         password_hash: str,
-    ) -> Optional[UserDict]:
+    ) -> Optional[Record]:
         """
         Creates a new user in the database.
 
         This method inserts a new user into the database with the provided `username` and `password_hash`.
-        If the user is created successfully, it returns a `UserDict` containing the user's `uuid` and `username`.
-        If an error occurs during the creation process, it returns `None`.
+        If the user is created successfully, it returns a record containing the user's `uuid` and `username`.
+        If an error occurs during the creation process, it returns `None`. When user data is sharded, the
+        username is claimed in the user directory first, so it stays unique across shards.
 
         Args:
             username (str): The username of the new user.
             password_hash (str): The hashed password of the new user.
 
         Returns:
-            Optional[UserDict]:
-                - A `UserDict` containing the user's data if the user is created successfully. The dictionary contains:
-                    - "uuid" (str): The UUID of the user.
+            Optional[Record]:
+                - A record containing the user's data if the user is created successfully. The record contains:
+                    - "uuid" (UUID): The UUID of the user.
                     - "username" (str): The username of the user.
                     - "password_hash" (str): The hashed password of the user.
                 - `None` if the user already exists or if an error occurs.
         """
+        uuid = uuid4()
+        if self.shards.enabled and not await self._set_user_directory(uuid, username):
+            return None
+
         conn = None
+        result = None
+        pool = self.shards.pool_for(uuid)
         try:
-            conn = self.connectionPool.getconn()
-            with conn.cursor() as cursor:
-                cursor.execute(
+            conn = await pool.getconn()
+            async with conn.cursor(row_factory=record_row) as cursor:
+                await cursor.execute(
                     """
                     INSERT INTO users (uuid, username, password_hash)
-                    VALUES (gen_random_uuid(), %s, %s)
+                    VALUES (%s, %s, %s)
                     RETURNING *
                     """,
-                    [username, password_hash],
+                    [uuid, username, password_hash],
                 )
-                conn.commit()
+                await conn.commit()
 
-                result = cursor.fetchone()
+                result = await cursor.fetchone()
                 if not result:
                     return None
 
-                user_data = dict(zip([desc[0] for desc in cursor.description], result))
-                return UserDict(
-                    uuid=user_data["uuid"],
-                    username=user_data["username"],
-                    password_hash=user_data["password_hash"],
-                )
+                return result
+        except DatabaseUnavailableError:
+            raise
         except Exception as e:
             print("Failed to create user:", e, flush=True)
             return None
         finally:
             if conn:
-                self.connectionPool.putconn(conn)
+                await pool.putconn(conn)
+            if self.shards.enabled and result is None:
+                await self._delete_user_directory(uuid)
+
+    async def replace_password_hash(
+        self,
+        uuid: UUID,
+        old_password_hash: str,
+        new_password_hash: str,
+    ) -> bool:
+        """
+        Replaces a user's password hash, but only if it still matches the expected old hash.
+
+        This is used to upgrade stale password hashes after a successful login. The check ensures that
+        a password changed in the meantime is never overwritten by a rehash of the previous password.
+
+        Args:
+            uuid (UUID): The UUID of the user to be updated.
+            old_password_hash (str): The password hash the user is expected to currently have.
+            new_password_hash (str): The new password hash of the user.
+
+        Returns:
+            bool:
+                - `True` if the password hash was replaced.
+                - `False` if the password hash changed in the meantime or if an error occurs.
+        """
+
+        conn = None
+        pool = self.shards.pool_for(uuid)
+        try:
+            conn = await pool.getconn()
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    UPDATE users
+                    SET password_hash = %s
+                    WHERE uuid = %s
+                    AND password_hash = %s
+                    """,
+                    [new_password_hash, uuid, old_password_hash],
+                )
+                await conn.commit()
+
+                return cursor.rowcount > 0
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            print("Failed to replace password hash:", e, flush=True)
+            return False
+        finally:
+            if conn:
+                await pool.putconn(conn)
+
+    async def _find_user_uuid(self, username: str) -> Optional[UUID]:
+        # the user directory lives on the primary, next to the catalog
+        conn = None
+        try:
+            conn = await self.connectionPool.getconn()
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    SELECT user_uuid
+                    FROM User_Directory
+                    WHERE username = %s
+                    """,
+                    [username],
+                )
+                await conn.commit()
+
+                row = await cursor.fetchone()
+                return row[0] if row else None
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            print("Failed to look up username:", e, flush=True)
+            return None
+        finally:
+            if conn:
+                await self.connectionPool.putconn(conn)
+
+    async def _set_user_directory(self, uuid: UUID, username: str) -> bool:
+        # fails if another user already holds the username
+        conn = None
+        try:
+            conn = await self.connectionPool.getconn()
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    INSERT INTO User_Directory (username, user_uuid)
+                    VALUES (%s, %s)
+                    ON CONFLICT (user_uuid) DO UPDATE
+                    SET username = EXCLUDED.username
+                    """,
+                    [username, uuid],
+                )
+                await conn.commit()
+
+                return True
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            print("Failed to claim username:", e, flush=True)
+            return False
+        finally:
+            if conn:
+                await self.connectionPool.putconn(conn)
+
+    async def _delete_user_directory(self, uuid: UUID) -> None:
+        conn = None
+        try:
+            conn = await self.connectionPool.getconn()
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """
+                    DELETE FROM User_Directory
+                    WHERE user_uuid = %s
+                    """,
+                    [uuid],
+                )
+                await conn.commit()
+        except DatabaseUnavailableError:
+            raise
+        except Exception as e:
+            print("Failed to release username:", e, flush=True)
+        finally:
+            if conn:
+                await self.connectionPool.putconn(conn)
+
+    async def _sync_user_directory(self, uuid: UUID) -> None:
+        user = await self.get_user(uuid=uuid)
+        if user:
+            await self._set_user_directory(uuid, user["username"])
+        else:
+            await self._delete_user_directory(uuid)
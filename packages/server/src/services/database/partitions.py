@@ -0,0 +1,130 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Named partitions of the connection pool, so one workload cannot starve another
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+# latency sensitive calls made while playing, e.g. the session lookup and statistics updates
+GAMEPLAY = "gameplay"
+# slow catalog and account management, e.g. bulk tagging, imports, exports and user deletion
+ADMIN = "admin"
+# calls which declare no partition
+DEFAULT = "default"
+
+_current: ContextVar[Optional[str]] = ContextVar("pool_partition", default=None)
+
+
+def current_partition() -> Optional[str]:
+    """
+    Returns the partition declared for the current context with `use_partition`, if any.
+
+    Returns:
+        Optional[str]: The partition name, or None outside of `use_partition`.
+    """
+
+    return _current.get()
+
+
+@contextmanager
+def use_partition(name: str) -> Iterator[None]:
+    """
+    Checks out connections from the given partition for every database call made in the current
+    context, and in tasks started from it, until the block exits. Calls which declare their own
+    partition keep using it.
+
+    Args:
+        name (str): The partition name.
+    """
+
+    token = _current.set(name)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class Partition:
+    """
+    A named share of a connection pool, limiting how many connections its callers hold at once.
+
+    Callers first take one of the partition's `limit` slots, waiting if all are taken, and only then
+    check a connection out of the shared pool. A partition without a limit only counts its checkouts.
+    With a limit of 5 on the `admin` partition and 20 connections in the pool, the other partitions
+    can always get at least 15 connections, however slow the admin calls are.
+
+    Attributes:
+        name (str): The partition name.
+        limit (Optional[int]): The maximum number of connections checked out at once, or None for no limit.
+    """
+
+    def __init__(self, name: str, limit: Optional[int] = None):
+        if limit is not None and limit < 1:
+            raise ValueError("Partition limits must be at least 1")
+
+        self.name = name
+        self.limit = limit
+        self._slots = asyncio.Semaphore(limit) if limit is not None else None
+        self.in_use = 0
+        self._peak = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+
+    async def acquire(self, timeout: float) -> bool:
+        """
+        Takes a slot in the partition, waiting up to `timeout` seconds for one to be released.
+
+        Args:
+            timeout (float): The number of seconds to wait.
+
+        Returns:
+            bool: True if a slot was taken, False if none became free in time.
+        """
+
+        if self._slots is not None and self._slots.locked():
+            self._waiters += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                return False
+            finally:
+                self._waiters -= 1
+        elif self._slots is not None:
+            await self._slots.acquire()
+
+        self.in_use += 1
+        self._checkouts += 1
+        self._peak = max(self._peak, self.in_use)
+        return True
+
+    def release(self) -> None:
+        """
+        Releases a slot taken with `acquire`.
+        """
+
+        self.in_use -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the partition gauges and counters.
+
+        Returns:
+            Dict[str, Any]: The limit, the number of connections in use and of waiting callers, and checkout counters.
+        """
+
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "peak": self._peak,
+            "waiters": self._waiters,
+            "saturation": (
+                round(self.in_use / self.limit, 3) if self.limit is not None else None
+            ),
+            "checkouts": self._checkouts,
+            "timeouts": self._timeouts,
+        }
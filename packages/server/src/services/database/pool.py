@@ -0,0 +1,588 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Asyncio PostgreSQL connection pool with bounded checkout waits
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Coroutine, Dict, List, Optional
+
+import psycopg
+from psycopg import AsyncConnection
+from psycopg.pq import TransactionStatus
+
+from helpers.breaker import CircuitBreaker
+from helpers.metrics import LatencyStats
+from services.database.deadlines import Deadline, current_deadline
+from services.database.errors import (
+    CircuitOpenError,
+    DatabaseUnavailableError,
+    DeadlineExceededError,
+    PoolTimeoutError,
+)
+from services.database.instrumentation import (
+    InstrumentedCursor,
+    InstrumentedServerCursor,
+    current_query_stats,
+)
+from services.database.partitions import DEFAULT, Partition, current_partition
+
+
+class SharedConnection:
+    """
+    A connection shared by every database call made inside `ConnectionPool.transaction`.
+
+    It behaves like the wrapped connection, except that `commit` is deferred to the end of the
+    transaction so the mixins can keep committing as usual. `rollback` still rolls back immediately,
+    discarding everything done so far in the transaction.
+    """
+
+    def __init__(self, conn: AsyncConnection):
+        self.connection = conn
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.connection, name)
+
+    async def commit(self) -> None:
+        pass
+
+
+class _Transaction:
+    def __init__(self):
+        self.conn: Optional[SharedConnection] = None
+
+
+class ConnectionPool:
+    """
+    An asyncio pool of PostgreSQL connections.
+
+    Callers wait up to `timeout` seconds for a connection when all `maxconn` connections are in use,
+    instead of failing immediately. Waiting callers are suspended coroutines, not threads, so thousands
+    of requests can wait on a handful of connections. Connections idle for longer than `ping_after`
+    seconds are checked with a cheap query before being handed out, and connections older than
+    `max_lifetime` seconds are replaced, so stale connections (e.g. after a database restart) never
+    reach the mixins.
+
+    Connections are opened lazily, `open` only pre-opens `minconn` of them.
+
+    Inside `transaction`, every `getconn` in the same task returns one shared connection, so all
+    database calls made while handling a request run in a single transaction on a single checkout.
+
+    Each connection keeps its own cache of up to `prepared_max` server-side prepared statements, which
+    lives as long as the connection and so is reused across checkouts. Hot queries executed with
+    `prepare=pool.prepare` are prepared on their first use on a connection, other queries only once
+    they have run a few times. A recycled connection starts with an empty cache and prepares its
+    statements again lazily. When `prepare` is False, no statement is ever prepared.
+
+    With a `breaker`, checkout timeouts, failed connection attempts and statements failing because the
+    database went away or timed out are counted as failures, and successful statements reset the count.
+    Once the breaker opens, `getconn` fails immediately with `CircuitOpenError` instead of waiting on a
+    database which is down. After the breaker's reset timeout, the next `getconn` or `probe_if_due`
+    starts a `SELECT 1` on a fresh connection in the background, which closes the breaker again if it
+    succeeds. Idle connections opened before the outage are dropped at that point.
+
+    Connections are checked out on behalf of a named partition (see `services.database.partitions`),
+    given to `getconn`, declared for the current request with `use_partition`, or `default`. Each
+    partition in `partitions` may hold at most that many connections at once, callers of a full
+    partition wait for one of its connections to be returned even if the pool has idle ones. Other
+    partitions are only limited by `maxconn`.
+
+    Under a request deadline declared with `use_deadline` (see `services.database.deadlines`), the
+    checkout waits at most until the deadline, and the checked out connection gets a `statement_timeout`
+    and `lock_timeout` for the time left, local to its transaction. A statement still running when the
+    deadline passes is cancelled on the database, and statements started past it are not sent at all.
+    Either way `DeadlineExceededError` is raised, which is not counted by the breaker.
+
+    Attributes:
+        minconn (int): The number of connections opened up front and kept open.
+        maxconn (int): The maximum number of connections open at once.
+        timeout (float): The number of seconds `getconn` waits for a free connection.
+        max_lifetime (float): The number of seconds after which a connection is replaced.
+        ping_after (float): The number of idle seconds after which a connection is pinged before reuse.
+        prepare (bool): Whether hot queries are executed as prepared statements, pass it as `prepare=`.
+        prepared_max (int): The maximum number of prepared statements kept per connection.
+        breaker (Optional[CircuitBreaker]): The circuit breaker guarding the pool, if any.
+        partitions (Dict[str, Partition]): The partitions connections were checked out for, by name.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        minconn: int,
+        maxconn: int,
+        timeout: float = 5,
+        max_lifetime: float = 1800,
+        ping_after: float = 30,
+        prepare: bool = True,
+        prepared_max: int = 100,
+        breaker: Optional[CircuitBreaker] = None,
+        partitions: Optional[Dict[str, int]] = None,
+        connect: Callable[
+            ..., Coroutine[Any, Any, AsyncConnection]
+        ] = AsyncConnection.connect,
+    ):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(
+                "Pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1"
+            )
+
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.prepare = prepare
+        self.prepared_max = prepared_max
+        self.breaker = breaker
+        self.partitions: Dict[str, Partition] = {
+            name: Partition(name, min(limit, maxconn))
+            for name, limit in (partitions or {}).items()
+        }
+        self._connect = connect
+        self._cond = asyncio.Condition()
+        # idle connections as (connection, opened at, returned at), most recently returned last
+        self._idle: List[tuple[AsyncConnection, float, float]] = []
+        # id(connection) -> opened at, for every connection checked out
+        self._in_use: Dict[int, float] = {}
+        # id(connection) -> the partition it was checked out for
+        self._partition_of: Dict[int, Partition] = {}
+        self._opening = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._checkout_latency = LatencyStats()
+        self._closed = False
+        self._transaction: ContextVar[Optional[_Transaction]] = ContextVar(
+            f"transaction-{id(self)}", default=None
+        )
+        self._transactions = 0
+        self._shared_checkouts = 0
+        self._probe: Optional[asyncio.Task] = None
+        # id(connection) -> the timer cancelling its statement at the request deadline
+        self._watchdogs: Dict[int, asyncio.TimerHandle] = {}
+        # id(connection) -> the cancel request sent when the deadline passed, awaited before reuse
+        self._cancels: Dict[int, asyncio.Task] = {}
+        self._deadline_timeouts = 0
+        self._deadline_cancels = 0
+
+    def _partition(self, name: str) -> Partition:
+        partition = self.partitions.get(name)
+        if partition is None:
+            partition = self.partitions[name] = Partition(name)
+        return partition
+
+    def _size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    async def _is_usable(
+        self, conn: AsyncConnection, opened_at: float, idle_since: float
+    ) -> bool:
+        now = time.monotonic()
+        if conn.closed or now - opened_at > self.max_lifetime:
+            return False
+        if now - idle_since < self.ping_after:
+            return True
+
+        try:
+            # a plain cursor, so a stale connection is not reported to the breaker as an outage
+            async with psycopg.AsyncCursor(conn) as cursor:
+                await cursor.execute("SELECT 1")
+            await conn.rollback()
+            return True
+        except psycopg.Error:
+            return False
+
+    async def _discard(self, conn: AsyncConnection) -> None:
+        try:
+            await conn.close()
+        except psycopg.Error:
+            pass
+
+    async def _open_connection(self) -> AsyncConnection:
+        try:
+            conn = await self._connect(self.dsn)
+        except psycopg.OperationalError as e:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise DatabaseUnavailableError(f"Could not connect: {e}") from e
+        # the instrumented cursors report the outcome of every statement to the breaker
+        conn.circuit_breaker = self.breaker
+        conn.cursor_factory = InstrumentedCursor
+        conn.server_cursor_factory = InstrumentedServerCursor
+        if not self.prepare:
+            # e.g. behind a transaction-pooling proxy, where statements do not outlive a transaction
+            conn.prepare_threshold = None
+        conn.prepared_max = self.prepared_max
+        conn.deadline = None
+        return conn
+
+    async def _run_probe(self) -> None:
+        conn = None
+        try:
+            conn = await asyncio.wait_for(self._connect(self.dsn), self.timeout)
+            await conn.execute("SELECT 1")
+        except Exception as e:
+            print("Database probe failed:", e, flush=True)
+            self.breaker.record_failure()
+            return
+        finally:
+            if conn is not None:
+                await self._discard(conn)
+
+        print("Database probe succeeded, closing the circuit breaker", flush=True)
+        self.breaker.record_success()
+        stale, self._idle = self._idle, []
+        for stale_conn, _, _ in stale:
+            await self._discard(stale_conn)
+
+    def probe_if_due(self) -> None:
+        """
+        Starts a background probe of the database if the breaker has been open for long enough.
+        Must be called from the running event loop.
+        """
+
+        if self.breaker is not None and self.breaker.begin_probe():
+            self._probe = asyncio.get_running_loop().create_task(self._run_probe())
+
+    async def open(self) -> None:
+        """
+        Opens connections until the pool holds at least `minconn` of them, reopening the pool if it
+        was closed.
+        """
+
+        self._closed = False
+        while self._size() < self.minconn:
+            self._opening += 1
+            try:
+                conn = await self._open_connection()
+            finally:
+                self._opening -= 1
+            now = time.monotonic()
+            self._idle.append((conn, now, now))
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """
+        Shares one connection between every `getconn` made in the current task until the block exits.
+
+        The connection is checked out on the first `getconn`, so a block that never touches the database
+        costs nothing. On a clean exit the transaction is committed, on an exception it is rolled back.
+        Nested blocks join the outer transaction.
+
+        Raises:
+            PoolTimeoutError: If no connection became available in time.
+            psycopg.Error: If the transaction could not be committed.
+        """
+
+        if self._transaction.get() is not None:
+            yield
+            return
+
+        transaction = _Transaction()
+        token = self._transaction.set(transaction)
+        self._transactions += 1
+        try:
+            yield
+            if transaction.conn:
+                await transaction.conn.connection.commit()
+        finally:
+            self._transaction.reset(token)
+            if transaction.conn:
+                # putconn rolls back whatever was left uncommitted
+                await self.putconn(transaction.conn.connection)
+
+    def in_transaction(self) -> bool:
+        """
+        Returns whether the current task is inside `transaction` and already holds its connection.
+
+        Returns:
+            bool: True if `getconn` would return the transaction's shared connection without a checkout.
+        """
+
+        transaction = self._transaction.get()
+        return transaction is not None and transaction.conn is not None
+
+    async def getconn(
+        self, timeout: Optional[float] = None, partition: Optional[str] = None
+    ) -> AsyncConnection | SharedConnection:
+        """
+        Checks a connection out of the pool, waiting for one to be returned if all are in use.
+        Inside `transaction`, returns the transaction's shared connection instead.
+
+        Args:
+            timeout (Optional[float]): The number of seconds to wait, defaults to the pool's `timeout`.
+            partition (Optional[str]): The partition to check the connection out for, defaults to the
+                one declared with `use_partition`, or `default`.
+
+        Returns:
+            AsyncConnection: A healthy connection, which must be returned with `putconn`.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            PoolTimeoutError: If no connection, or no slot in the partition, became available in time.
+            DeadlineExceededError: If the request deadline passed before a connection became available.
+            DatabaseUnavailableError: If a new connection could not be opened.
+        """
+
+        transaction = self._transaction.get()
+        if transaction is not None:
+            if transaction.conn is None:
+                transaction.conn = SharedConnection(
+                    await self._checkout(timeout, partition)
+                )
+            self._shared_checkouts += 1
+            return transaction.conn
+
+        return await self._checkout(timeout, partition)
+
+    async def _take(
+        self, start: float, deadline: float, by_request: bool = False
+    ) -> AsyncConnection:
+        async with self._cond:
+            if self._closed:
+                raise DatabaseUnavailableError("Connection pool is closed")
+
+            while not self._idle and self._size() >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    if by_request:
+                        self._deadline_timeouts += 1
+                        raise DeadlineExceededError(
+                            f"The request deadline passed after waiting {time.monotonic() - start:.2f}s"
+                            " for a database connection"
+                        )
+                    if self.breaker is not None:
+                        self.breaker.record_failure()
+                    raise PoolTimeoutError(
+                        f"No database connection available after {time.monotonic() - start:.2f}s"
+                    )
+                self._waiters += 1
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    self._waiters -= 1
+
+            if self._idle:
+                conn, opened_at, idle_since = self._idle.pop()
+                self._in_use[id(conn)] = opened_at
+            else:
+                conn = None
+                self._opening += 1
+
+        if conn is not None and not await self._is_usable(conn, opened_at, idle_since):
+            # replace the stale connection with a fresh one in the same slot
+            await self._discard(conn)
+            del self._in_use[id(conn)]
+            self._opening += 1
+            self._recycled += 1
+            conn = None
+
+        if conn is None:
+            try:
+                conn = await self._open_connection()
+            except BaseException:
+                # free the reserved slot so a waiter can try to connect instead
+                self._opening -= 1
+                async with self._cond:
+                    self._cond.notify()
+                raise
+            self._opening -= 1
+            self._in_use[id(conn)] = time.monotonic()
+
+        return conn
+
+    async def _checkout(
+        self, timeout: Optional[float], partition: Optional[str]
+    ) -> AsyncConnection:
+        if self.breaker is not None and not self.breaker.allow():
+            self.probe_if_due()
+            raise CircuitOpenError("Database circuit breaker is open")
+
+        start = time.monotonic()
+        deadline = start + (self.timeout if timeout is None else timeout)
+        request_deadline = current_deadline()
+        by_request = request_deadline is not None and request_deadline.at < deadline
+        if by_request:
+            if request_deadline.at <= start:
+                self._deadline_timeouts += 1
+                raise DeadlineExceededError(
+                    "The request deadline passed before checking out a database connection"
+                )
+            deadline = request_deadline.at
+
+        part = self._partition(partition or current_partition() or DEFAULT)
+        if not await part.acquire(deadline - start):
+            self._timeouts += 1
+            if by_request:
+                self._deadline_timeouts += 1
+                raise DeadlineExceededError(
+                    f"The request deadline passed after waiting {time.monotonic() - start:.2f}s"
+                    f" for the {part.name} partition"
+                )
+            raise PoolTimeoutError(
+                f"No database connection available to the {part.name} partition"
+                f" after {time.monotonic() - start:.2f}s"
+            )
+        try:
+            conn = await self._take(start, deadline, by_request)
+        except BaseException:
+            part.release()
+            raise
+        self._partition_of[id(conn)] = part
+
+        if request_deadline is not None:
+            try:
+                await self._apply_deadline(conn, request_deadline)
+            except BaseException:
+                await self.putconn(conn, close=True)
+                raise
+
+        self._checkouts += 1
+        self._checkout_latency.observe(time.monotonic() - start)
+        stats = current_query_stats()
+        if stats is not None:
+            stats.checkouts += 1
+        return conn
+
+    async def _apply_deadline(self, conn: AsyncConnection, deadline: Deadline) -> None:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            self._deadline_timeouts += 1
+            raise DeadlineExceededError(
+                "The request deadline passed while checking out a database connection"
+            )
+
+        # local to the transaction, so the timeouts are gone once the connection is committed or
+        # rolled back, and a plain cursor, so it does not count as a query of the request
+        timeout = str(math.ceil(remaining * 1000))
+        try:
+            async with psycopg.AsyncCursor(conn) as cursor:
+                await cursor.execute(
+                    "SELECT set_config('statement_timeout', %s, true),"
+                    " set_config('lock_timeout', %s, true)",
+                    [timeout, timeout],
+                )
+        except psycopg.OperationalError as e:
+            raise DatabaseUnavailableError(f"Could not set the timeouts: {e}") from e
+
+        # the timeouts apply to each statement and end with the transaction, the watchdog bounds the
+        # whole checkout
+        conn.deadline = deadline
+        loop = asyncio.get_running_loop()
+        self._watchdogs[id(conn)] = loop.call_later(
+            remaining, self._cancel_statement, conn
+        )
+
+    def _cancel_statement(self, conn: AsyncConnection) -> None:
+        self._watchdogs.pop(id(conn), None)
+        if (
+            not conn.deadline.active
+            or conn.info.transaction_status != TransactionStatus.ACTIVE
+        ):
+            # the request is done with the deadline, or no statement is running, the instrumented
+            # cursors refuse the next one
+            return
+
+        self._deadline_cancels += 1
+        self._cancels[id(conn)] = asyncio.get_running_loop().create_task(
+            self._send_cancel(conn)
+        )
+
+    async def _send_cancel(self, conn: AsyncConnection) -> None:
+        try:
+            await conn.cancel_safe(timeout=self.timeout)
+        except psycopg.Error as e:
+            print("Could not cancel a statement past its deadline:", e, flush=True)
+
+    async def putconn(
+        self, conn: AsyncConnection | SharedConnection, close: bool = False
+    ) -> None:
+        """
+        Returns a connection to the pool, rolling back any transaction left open.
+        A shared connection stays checked out until its transaction ends.
+
+        Args:
+            conn (AsyncConnection | SharedConnection): The connection obtained from `getconn`.
+            close (bool): Closes the connection instead of keeping it, e.g. after a fatal error.
+        """
+
+        if isinstance(conn, SharedConnection):
+            return
+
+        opened_at = self._in_use.pop(id(conn), None)
+        if opened_at is None:
+            raise ValueError("connection was not checked out from this pool")
+
+        watchdog = self._watchdogs.pop(id(conn), None)
+        if watchdog is not None:
+            watchdog.cancel()
+        cancel = self._cancels.pop(id(conn), None)
+        if cancel is not None:
+            # a late cancel request must not hit the next statement on this connection
+            await cancel
+        conn.deadline = None
+
+        if not close and not conn.closed:
+            try:
+                if conn.info.transaction_status != TransactionStatus.IDLE:
+                    await conn.rollback()
+            except psycopg.Error:
+                close = True
+
+        if close or conn.closed or self._closed:
+            await self._discard(conn)
+        else:
+            self._idle.append((conn, opened_at, time.monotonic()))
+
+        self._partition_of.pop(id(conn)).release()
+        async with self._cond:
+            self._cond.notify()
+
+    async def closeall(self) -> None:
+        """
+        Closes every idle connection and stops handing out new ones. Checked out connections are
+        closed when they are returned.
+        """
+
+        self._closed = True
+        idle, self._idle = self._idle, []
+        async with self._cond:
+            self._cond.notify_all()
+
+        for conn, _, _ in idle:
+            await self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the pool gauges and counters.
+
+        Returns:
+            Dict[str, Any]: The pool limits, the number of in-use, idle and waiting callers, and checkout statistics.
+        """
+
+        return {
+            "min": self.minconn,
+            "max": self.maxconn,
+            "in_use": len(self._in_use),
+            "idle": len(self._idle),
+            "opening": self._opening,
+            "waiters": self._waiters,
+            "checkouts": self._checkouts,
+            "timeouts": self._timeouts,
+            "recycled": self._recycled,
+            "deadline_timeouts": self._deadline_timeouts,
+            "deadline_cancels": self._deadline_cancels,
+            "transactions": self._transactions,
+            "shared_checkouts": self._shared_checkouts,
+            "checkout_latency": self._checkout_latency.snapshot(),
+            "breaker": self.breaker.stats() if self.breaker is not None else None,
+            "partitions": {
+                name: partition.stats() for name, partition in self.partitions.items()
+            },
+        }
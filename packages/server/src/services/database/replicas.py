@@ -0,0 +1,144 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Routes read-only queries to streaming replicas which are caught up enough
+
+import asyncio
+import itertools
+from typing import Any, Dict, List, Optional
+
+from services.database.pool import ConnectionPool
+
+# seconds the replica is behind the primary, 0 when it has replayed everything it received
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class ReplicaSet:
+    """
+    A set of read replica pools with lag-aware routing.
+
+    Each replica's replication lag is measured every few seconds by `check_lag`. Reads only go to
+    replicas whose last check succeeded with a lag of at most `max_lag` seconds, round-robin. When
+    no replica qualifies, or none are configured, reads fall back to the primary.
+
+    Attributes:
+        pools (List[ConnectionPool]): The replica connection pools.
+        max_lag (float): The maximum replication lag in seconds a replica may have to serve reads.
+    """
+
+    def __init__(self, pools: List[ConnectionPool], max_lag: float):
+        self.pools = pools
+        self.max_lag = max_lag
+        self._lag: List[Optional[float]] = [None] * len(pools)
+        self._healthy: List[bool] = [False] * len(pools)
+        self._next = itertools.cycle(range(len(pools))) if pools else None
+        self._replica_reads = 0
+        self._primary_reads = 0
+        self._fallbacks = 0
+
+    def pool_for_read(
+        self, primary: ConnectionPool, force_primary: bool = False
+    ) -> ConnectionPool:
+        """
+        Picks the pool a read-only query should run on.
+
+        Reads go to the primary when `force_primary` is set, e.g. to read a write made just before
+        (read-your-writes), and when the current transaction already holds a primary connection, so
+        reads inside a transaction see its writes.
+
+        Args:
+            primary (ConnectionPool): The primary connection pool.
+            force_primary (bool): Whether the read must see the latest writes.
+
+        Returns:
+            ConnectionPool: A caught up replica pool, or the primary pool.
+        """
+
+        if force_primary or not self.pools or primary.in_transaction():
+            self._primary_reads += 1
+            return primary
+
+        for _ in range(len(self.pools)):
+            index = next(self._next)
+            if self._healthy[index]:
+                self._replica_reads += 1
+                return self.pools[index]
+
+        self._fallbacks += 1
+        self._primary_reads += 1
+        return primary
+
+    async def _check_replica(self, index: int) -> None:
+        conn = None
+        pool = self.pools[index]
+        try:
+            conn = await pool.getconn()
+            async with conn.cursor() as cursor:
+                await cursor.execute(REPLICA_LAG_QUERY)
+                lag = float((await cursor.fetchone())[0])
+            self._lag[index] = lag
+            self._healthy[index] = lag <= self.max_lag
+        except Exception as e:
+            if self._healthy[index]:
+                print(f"Replica {index} is unavailable:", e, flush=True)
+            self._lag[index] = None
+            self._healthy[index] = False
+        finally:
+            if conn:
+                await pool.putconn(conn)
+
+    async def check_lag(self) -> None:
+        """
+        Measures the replication lag of every replica and updates which of them may serve reads.
+        """
+
+        await asyncio.gather(
+            *(self._check_replica(index) for index in range(len(self.pools)))
+        )
+
+    async def open(self) -> None:
+        """
+        Opens the replica pools and checks their lag once, so caught up replicas serve reads right away.
+        """
+
+        for index, pool in enumerate(self.pools):
+            try:
+                await pool.open()
+            except Exception as e:
+                print(f"Failed to connect to replica {index}:", e, flush=True)
+        await self.check_lag()
+
+    async def closeall(self) -> None:
+        """
+        Closes every replica pool.
+        """
+
+        for pool in self.pools:
+            await pool.closeall()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the routing counters and the state of every replica.
+
+        Returns:
+            Dict[str, Any]: The number of reads per destination, and each replica's lag, health and pool gauges.
+        """
+
+        return {
+            "max_lag": self.max_lag,
+            "replica_reads": self._replica_reads,
+            "primary_reads": self._primary_reads,
+            "fallbacks": self._fallbacks,
+            "replicas": [
+                {
+                    "lag": self._lag[index],
+                    "healthy": self._healthy[index],
+                    "pool": pool.stats(),
+                }
+                for index, pool in enumerate(self.pools)
+            ],
+        }
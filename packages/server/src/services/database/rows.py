@@ -0,0 +1,83 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Compact, read-only record types for query results, shared by queries of the same shape
+
+import keyword
+from collections.abc import Mapping
+from dataclasses import make_dataclass
+from functools import lru_cache
+from typing import Any, Callable, Iterator, Sequence
+
+from psycopg.rows import no_result
+
+# a function building a record from the values of a single row
+RecordMaker = Callable[[Sequence[Any]], Mapping]
+
+
+class Record(Mapping):
+    """
+    The base of every record type, a read-only mapping over slotted attributes.
+
+    A record holds the values of one row as attributes, without a per-row dictionary, but can be read
+    like the dictionaries the mixins used to return: `record["id"]`, `record.get("id")`, `dict(record)`
+    and `**record` all work. Records are accepted wherever a Pydantic model expects a dictionary, and
+    `pydantic_core.to_json` serializes them directly.
+    """
+
+    __slots__ = ()
+    __match_args__: tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__match_args__)
+
+    def __len__(self) -> int:
+        return len(self.__match_args__)
+
+
+@lru_cache(maxsize=256)
+def record_maker(fields: tuple[str, ...]) -> RecordMaker:
+    """
+    Returns a function building records with the given fields, creating the record type on first use.
+
+    Record types are cached by their fields, so every query of the same shape shares one type. Fields
+    which cannot be attribute names (e.g. `?column?`), repeat or shadow a mapping method (e.g. `keys`) fall
+    back to plain dictionaries.
+
+    Args:
+        fields (tuple[str, ...]): The field names, in column order.
+
+    Returns:
+        RecordMaker: A function taking the values of a row, in column order, and returning its record.
+    """
+
+    if len(set(fields)) != len(fields) or not all(
+        field.isidentifier()
+        and not keyword.iskeyword(field)
+        and not hasattr(Record, field)
+        for field in fields
+    ):
+        return lambda values: dict(zip(fields, values))
+
+    record = make_dataclass("Record", fields, bases=(Record,), slots=True)
+    return lambda values: record(*values)
+
+
+def record_row(cursor) -> RecordMaker:
+    """
+    A psycopg row factory returning records, for use as `conn.cursor(row_factory=record_row)`.
+
+    Args:
+        cursor: The cursor the rows are fetched from.
+
+    Returns:
+        RecordMaker: A function building the record of a row with the cursor's current columns.
+    """
+
+    if cursor.description is None:
+        return no_result
+    return record_maker(tuple(column.name for column in cursor.description))
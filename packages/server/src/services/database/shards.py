@@ -0,0 +1,174 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Routes per-user data to one of several databases by a hash of the user's uuid
+
+import asyncio
+import uuid
+from hashlib import blake2b
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from uuid import UUID
+
+from services.database.migrations import migrate
+from services.database.pool import ConnectionPool
+
+T = TypeVar("T")
+
+
+def shard_index(key: UUID, shards: int) -> int:
+    """
+    Maps a key to a shard with a jump consistent hash (Lamping and Veach, 2014) of the key.
+
+    When a shard is added, only the keys which move to the new shard change shard, about 1 in
+    `shards` of them, so rebalancing moves as little data as possible.
+
+    Args:
+        key (UUID): The key, e.g. a user uuid or a session token.
+        shards (int): The number of shards.
+
+    Returns:
+        int: The index of the key's shard, between 0 and `shards - 1`.
+    """
+
+    # hashed first, so keys which are not random (e.g. time based uuids) still spread evenly
+    key = int.from_bytes(blake2b(key.bytes, digest_size=8).digest(), "big")
+    bucket, jump = -1, 0
+    while jump < shards:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFF_FFFF_FFFF_FFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+class ShardSet:
+    """
+    A set of database pools holding the per-user tables (`Users`, `Sessions` and `Statistics`),
+    with each user's rows on the shard picked by `shard_index` of their uuid.
+
+    The catalog tables, and the `User_Directory` mapping usernames to user uuids across shards, stay
+    on the primary. Session tokens are drawn so that they hash to the same shard as their user, so a
+    session can be found from its token alone. Without shards, everything stays on the primary.
+
+    A shard with the primary's DSN reuses the primary pool, so it also joins the primary's transactions
+    and replicas. After the list of shards changes, run `commands.rebalance_shards` to move the users
+    whose shard changed.
+
+    Attributes:
+        primary (ConnectionPool): The primary connection pool.
+        pools (List[ConnectionPool]): The shard connection pools, in the configured order.
+    """
+
+    def __init__(self, primary: ConnectionPool, pools: List[ConnectionPool]):
+        self.primary = primary
+        self.pools = pools
+        self._routed = [0] * len(pools)
+        self._fanouts = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether per-user data is sharded.
+        """
+
+        return bool(self.pools)
+
+    def pool_for(self, key: Optional[UUID]) -> ConnectionPool:
+        """
+        Picks the pool holding the rows of a user, or of a session token.
+
+        Args:
+            key (Optional[UUID]): The user uuid or session token.
+
+        Returns:
+            ConnectionPool: The key's shard, or the primary pool without shards or key.
+        """
+
+        if not self.pools or key is None:
+            return self.primary
+        index = shard_index(key, len(self.pools))
+        self._routed[index] += 1
+        return self.pools[index]
+
+    def new_token(self, user_uuid: UUID) -> UUID:
+        """
+        Draws a random session token on the same shard as its user.
+
+        Args:
+            user_uuid (UUID): The owner of the session.
+
+        Returns:
+            UUID: The token.
+        """
+
+        token = uuid.uuid4()
+        if self.pools:
+            shard = shard_index(user_uuid, len(self.pools))
+            while shard_index(token, len(self.pools)) != shard:
+                token = uuid.uuid4()
+        return token
+
+    async def each(self, fn: Callable[[ConnectionPool], Awaitable[T]]) -> List[T]:
+        """
+        Runs a query on every shard at once, or on the primary without shards.
+
+        Args:
+            fn (Callable[[ConnectionPool], Awaitable[T]]): Runs the query on the given pool.
+
+        Returns:
+            List[T]: The result of every shard, in shard order.
+        """
+
+        if not self.pools:
+            return [await fn(self.primary)]
+        self._fanouts += 1
+        return await asyncio.gather(*(fn(pool) for pool in self.pools))
+
+    async def open(self) -> None:
+        """
+        Opens the shard pools and applies pending schema migrations to the shards other than the primary.
+        """
+
+        for index, pool in enumerate(self.pools):
+            if pool is self.primary:
+                continue
+            conn = None
+            try:
+                await pool.open()
+                conn = await pool.getconn()
+                for migration in await migrate(conn):
+                    print(
+                        f"Applied migration {migration.version} to shard {index}: {migration.name}",
+                        flush=True,
+                    )
+            except Exception as e:
+                print(f"Failed to initialize shard {index}:", e, flush=True)
+            finally:
+                if conn:
+                    await pool.putconn(conn)
+
+    async def closeall(self) -> None:
+        """
+        Closes every shard pool other than the primary.
+        """
+
+        for pool in self.pools:
+            if pool is not self.primary:
+                await pool.closeall()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the routing counters and the pool gauges of every shard.
+
+        Returns:
+            Dict[str, Any]: The number of calls routed to each shard, of calls sent to all shards, and each shard's pool.
+        """
+
+        return {
+            "fanouts": self._fanouts,
+            "shards": [
+                {
+                    "routed": self._routed[index],
+                    "primary": pool is self.primary,
+                    "pool": pool.stats() if pool is not self.primary else None,
+                }
+                for index, pool in enumerate(self.pools)
+            ],
+        }
@@ -29,7 +29,7 @@ VALUES
   ('68c85e40-bbd8-40a1-8b7c-bd1b58bc6d0b', '6eaa99af-814f-4fc8-8c79-e2516c955af0'),
   ('4791e247-4793-4d39-a25b-4f187764773b', '29c6a90b-8777-4ae4-b167-99ff43562e2b'),
   ('b792cde4-19ec-439e-8177-0589434e134b', 'c85e9d39-8651-4014-b544-d7856fa9627a')
-ON CONFLICT (user_uuid) DO NOTHING;
+ON CONFLICT (token) DO NOTHING;
 
 -- Seed some Tags into the Tags table
 INSERT INTO Tags (name, description)
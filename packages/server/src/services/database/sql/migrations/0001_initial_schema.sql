@@ -1,5 +1,7 @@
 -- cSpell: disable
 
+-- Baseline schema, written to be idempotent so databases created before migrations were tracked adopt it safely
+
 -- Table that holds all trivia questions and relevant metadata
 CREATE TABLE IF NOT EXISTS Questions(
   id INTEGER GENERATED ALWAYS AS IDENTITY,
@@ -20,17 +22,44 @@ CREATE TABLE IF NOT EXISTS Users(
   PRIMARY KEY (uuid)
 );
 
--- Table that keeps track of logged in users
+-- Table that keeps track of logged in users, a user may have several sessions (one per device)
 CREATE TABLE IF NOT EXISTS Sessions(
   user_uuid CHAR(36) NOT NULL,
   token CHAR(36) DEFAULT gen_random_uuid() NOT NULL,
+  device VARCHAR(64) DEFAULT NULL,
   created_at TIMESTAMP DEFAULT now() NOT NULL,
-  PRIMARY KEY (user_uuid),
+  PRIMARY KEY (token),
   FOREIGN KEY (user_uuid)
     REFERENCES users(uuid)
     ON DELETE CASCADE
 );
 
+-- Sessions used to be keyed on user_uuid, which only allowed a single session per user
+ALTER TABLE Sessions ADD COLUMN IF NOT EXISTS device VARCHAR(64) DEFAULT NULL;
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1
+    FROM information_schema.key_column_usage
+    WHERE table_name = 'sessions'
+    AND constraint_name = 'sessions_pkey'
+    AND column_name = 'user_uuid'
+  ) THEN
+    ALTER TABLE Sessions DROP CONSTRAINT sessions_pkey;
+    ALTER TABLE Sessions ADD PRIMARY KEY (token);
+  END IF;
+END $$;
+DROP INDEX IF EXISTS Sessions_token_idx;
+
+-- A user's sessions are listed newest first when enforcing the per-user session cap
+CREATE INDEX IF NOT EXISTS Sessions_user_uuid_created_at_idx ON Sessions (user_uuid, created_at);
+
+-- Logging in again from the same device replaces that device's session
+CREATE UNIQUE INDEX IF NOT EXISTS Sessions_user_uuid_device_idx ON Sessions (user_uuid, device) WHERE device IS NOT NULL;
+
+-- Expired sessions are swept by creation time
+CREATE INDEX IF NOT EXISTS Sessions_created_at_idx ON Sessions (created_at);
+
 -- Table that keeps track of user trivia statistics
 CREATE TABLE IF NOT EXISTS Statistics (
   user_uuid CHAR(36) NOT NULL,
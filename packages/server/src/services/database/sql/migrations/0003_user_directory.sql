@@ -0,0 +1,12 @@
+-- cSpell: disable
+
+-- Maps every username to the uuid of its user. It is only used when per-user data is sharded across
+-- several databases (SERVICE_POSTGRES_SHARD_URIS), where it lives on the primary and keeps usernames
+-- unique across shards. `pnpm run rebalance:shards` fills it from the shards.
+CREATE TABLE IF NOT EXISTS User_Directory (
+  username VARCHAR(16) NOT NULL,
+  user_uuid UUID NOT NULL,
+  PRIMARY KEY (username)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS User_Directory_user_uuid_idx ON User_Directory (user_uuid);
@@ -0,0 +1,13 @@
+-- cSpell: disable
+
+-- The last time every session of a user was revoked at once, e.g. on logout from every device or on
+-- account deletion. With signed session tokens, every worker rejects the user's tokens created at or
+-- before it, including tokens it never saw. Rows older than SESSION_LIFETIME are deleted by the
+-- session sweeper, the tokens they cover have expired by then.
+CREATE TABLE IF NOT EXISTS Session_Revocations (
+  user_uuid UUID NOT NULL,
+  revoked_at TIMESTAMP DEFAULT now() NOT NULL,
+  PRIMARY KEY (user_uuid)
+);
+
+CREATE INDEX IF NOT EXISTS Session_Revocations_revoked_at_idx ON Session_Revocations (revoked_at);
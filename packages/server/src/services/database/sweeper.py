@@ -0,0 +1,79 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Background sweeper which deletes expired sessions in small batches
+
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from services.database.mixins.sessions import SessionsMixin
+
+
+class SessionSweeper:
+    """
+    Deletes expired sessions in batches of `batch_size`, committing after every batch.
+
+    Attributes:
+        batch_size (int): The maximum number of sessions deleted per statement.
+        max_batches (int): The maximum number of batches deleted per sweep, so a single sweep stays short.
+    """
+
+    def __init__(
+        self,
+        db: "SessionsMixin",
+        batch_size: int,
+        max_batches: int = 100,
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self._lock = threading.Lock()
+        self._sweeps = 0
+        self._reaped_total = 0
+        self._last_reaped = 0
+        self._last_sweep: Optional[float] = None
+        self._last_duration_ms = 0.0
+
+    async def sweep(self) -> int:
+        """
+        Deletes expired sessions until a batch comes back short or `max_batches` is reached.
+
+        Returns:
+            int: The number of sessions reaped by this sweep.
+        """
+
+        start = time.perf_counter()
+        reaped = 0
+        for _ in range(self.max_batches):
+            deleted = await self.db.delete_expired_sessions(self.batch_size)
+            reaped += deleted
+            if deleted < self.batch_size:
+                break
+
+        with self._lock:
+            self._sweeps += 1
+            self._reaped_total += reaped
+            self._last_reaped = reaped
+            self._last_sweep = time.time()
+            self._last_duration_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        if reaped:
+            print(f"Session sweeper reaped {reaped} expired sessions", flush=True)
+        return reaped
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the sweeper counters.
+
+        Returns:
+            Dict[str, Any]: The number of sweeps, sessions reaped in total and by the last sweep, and its timing.
+        """
+
+        with self._lock:
+            return {
+                "sweeps": self._sweeps,
+                "reaped_total": self._reaped_total,
+                "last_reaped": self._last_reaped,
+                "last_sweep": self._last_sweep,
+                "last_duration_ms": self._last_duration_ms,
+            }
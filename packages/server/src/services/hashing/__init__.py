@@ -0,0 +1,4 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Exports the HashingService class for use in other modules
+
+from .hashing import HashingQueueFullError, HashingService  # noqa: F401
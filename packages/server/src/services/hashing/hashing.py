@@ -0,0 +1,156 @@
+# @author: adibarra (Alec Ibarra)
+# @description: HashingService class for running password hashing off the request threads
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict
+
+from config import HASH_QUEUE_DEPTH, HASH_WORKERS
+from helpers import metrics
+from services.hashing import workers
+
+
+class HashingQueueFullError(Exception):
+    """
+    Raised when the hashing service already has as many operations queued as it allows.
+    """
+
+
+class HashingService:
+    """
+    Runs argon2 password hashing and verification in a bounded pool of worker processes.
+
+    Hashing is CPU bound and holds the GIL, so running it on the request threads starves every other
+    endpoint during login spikes. This service moves it onto `HASH_WORKERS` processes and returns
+    awaitables instead. At most `HASH_QUEUE_DEPTH` operations may wait for a free worker, beyond
+    that new operations fail fast with `HashingQueueFullError`.
+    """
+
+    executor: ProcessPoolExecutor = None
+
+    def __new__(cls):
+        """
+        Creates a new instance of the HashingService class if it doesn't already exist.
+        If an instance already exists, returns the existing instance.
+
+        Returns:
+            HashingService: The HashingService instance.
+        """
+
+        if not hasattr(cls, "instance"):
+            cls.instance = super(HashingService, cls).__new__(cls)
+            cls.instance.workers = HASH_WORKERS
+            cls.instance.queue_depth = HASH_QUEUE_DEPTH
+            cls.instance._lock = threading.Lock()
+            cls.instance._in_flight = 0
+            cls.instance._submitted = 0
+            cls.instance._rejected = 0
+            cls.instance._queue_wait = metrics.LatencyStats()
+            cls.instance._hash_time = metrics.LatencyStats()
+            metrics.register("hashing", cls.instance.stats)
+
+        return cls.instance
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # workers are started lazily so importing the routes does not spawn processes
+        with self._lock:
+            if self.executor is None:
+                # the app runs the event loop and other threads by now, forking it could deadlock
+                # on a lock one of them holds, so workers are forked from a clean forkserver process
+                context = (
+                    multiprocessing.get_context("forkserver")
+                    if "forkserver" in multiprocessing.get_all_start_methods()
+                    else None
+                )
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context
+                )
+            return self.executor
+
+    async def _submit(self, fn: Callable[..., tuple], *args) -> Any:
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_depth:
+                self._rejected += 1
+                raise HashingQueueFullError("Password hashing queue is full")
+            self._in_flight += 1
+            self._submitted += 1
+
+        try:
+            future = self._get_executor().submit(fn, time.time(), *args)
+            result, queue_wait, hash_time = await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        self._queue_wait.observe(max(queue_wait, 0.0))
+        self._hash_time.observe(hash_time)
+        return result
+
+    async def hash_password(self, password: str) -> str:
+        """
+        Hashes the given password in a worker process.
+
+        Args:
+            password (str): The password to be hashed.
+
+        Returns:
+            str: The hashed password.
+
+        Raises:
+            HashingQueueFullError: If too many hashing operations are already queued.
+        """
+
+        return await self._submit(workers.hash_password, password)
+
+    async def verify_password(self, password: str, password_hash: str) -> bool:
+        """
+        Verifies if the given password matches the password hash in a worker process.
+
+        Args:
+            password (str): The password to be verified.
+            password_hash (str): The password hash to compare against.
+
+        Returns:
+            bool: True if the password matches the password hash, False otherwise.
+
+        Raises:
+            HashingQueueFullError: If too many hashing operations are already queued.
+        """
+
+        return await self._submit(workers.verify_password, password, password_hash)
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker processes, waiting for queued operations to finish.
+        """
+
+        with self._lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hashing service counters and timings.
+
+        Returns:
+            Dict[str, Any]: The worker and queue limits, operation counts, queue wait and hash time.
+        """
+
+        with self._lock:
+            counters = {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "in_flight": self._in_flight,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+            }
+
+        return {
+            **counters,
+            "queue_wait": self._queue_wait.snapshot(),
+            "hash_time": self._hash_time.snapshot(),
+        }
@@ -0,0 +1,25 @@
+# @author: adibarra (Alec Ibarra)
+# @description: Tasks run by the hashing worker processes, kept apart so the workers only import what hashing needs
+
+import time
+from typing import Any, Callable
+
+from helpers.auth import Auth
+
+
+def _timed(submitted_at: float, fn: Callable[..., Any], *args) -> tuple:
+    """
+    Runs `fn` inside a worker process, timing how long it waited in the queue and how long it ran.
+    """
+
+    started_at = time.time()
+    result = fn(*args)
+    return result, started_at - submitted_at, time.time() - started_at
+
+
+def hash_password(submitted_at: float, password: str) -> tuple:
+    return _timed(submitted_at, Auth.hash_password, password)
+
+
+def verify_password(submitted_at: float, password: str, password_hash: str) -> tuple:
+    return _timed(submitted_at, Auth.verify_password, password, password_hash)
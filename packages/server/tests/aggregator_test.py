@@ -0,0 +1,157 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the write-behind statistics aggregator, the flush tests need the database from .env.development
+
+import asyncio
+import unittest
+import uuid
+
+try:
+    from config import SERVICE_POSTGRES_URI
+    from services.database.aggregator import STATISTICS, StatisticsAggregator
+    from services.database.migrations import migrate
+    from services.database.pool import ConnectionPool
+    from services.database.shards import ShardSet
+except SystemExit:
+    StatisticsAggregator = None
+
+
+class FailingPool:
+    prepare = False
+
+    async def getconn(self, timeout=None, partition=None):
+        raise ConnectionError("database is down")
+
+
+@unittest.skipIf(
+    StatisticsAggregator is None, "needs a configuration (.env.development)"
+)
+class TestStatisticsAggregator(unittest.TestCase):
+    def test_reads_merge_pending_increments(self):
+        """Test that reads add the increments not written yet"""
+
+        user = uuid.uuid4()
+        aggregator = StatisticsAggregator(ShardSet(FailingPool(), []), max_users=100)
+
+        async def read():
+            return STATISTICS([user, 100, 5, 5])
+
+        async def run():
+            aggregator.add(user, 10, 1, 0)
+            aggregator.add(user, 2, 0, 1)
+            aggregator.add(uuid.uuid4(), 10, 1, 0)
+            return await aggregator.read(read)
+
+        statistics = asyncio.run(run())
+        self.assertEqual(
+            (statistics.xp, statistics.wins, statistics.losses), (112, 6, 6)
+        )
+
+    def test_failed_flush_keeps_increments(self):
+        """Test that the increments of a failed flush are kept for the next one"""
+
+        user = uuid.uuid4()
+        aggregator = StatisticsAggregator(ShardSet(FailingPool(), []), max_users=100)
+
+        async def run():
+            aggregator.add(user, 10, 1, 0)
+            self.assertEqual(await aggregator.flush(), 0)
+            aggregator.add(user, 2, 0, 1)
+
+        asyncio.run(run())
+        stats = aggregator.stats()
+        self.assertEqual((stats["pending_users"], stats["failures"]), (1, 1))
+        self.assertEqual(aggregator._pending[user], [12, 1, 1])
+
+    def test_read_again_after_a_racing_commit(self):
+        """Test that a row read while a flush committed is read again"""
+
+        user = uuid.uuid4()
+        aggregator = StatisticsAggregator(ShardSet(FailingPool(), []), max_users=100)
+        reads = []
+
+        async def read():
+            reads.append(1)
+            if len(reads) == 1:
+                # a flush of 10 xp commits while the row is being read
+                aggregator._epoch += 2
+                aggregator._pending.clear()
+            return STATISTICS([user, 10 * len(reads), 0, 0])
+
+        async def run():
+            aggregator.add(user, 10, 0, 0)
+            return await aggregator.read(read)
+
+        self.assertEqual(asyncio.run(run()).xp, 20)
+        self.assertEqual(len(reads), 2)
+
+
+@unittest.skipIf(
+    StatisticsAggregator is None, "needs a configured database (.env.development)"
+)
+class TestStatisticsFlush(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        async def run():
+            pool = ConnectionPool(SERVICE_POSTGRES_URI, minconn=0, maxconn=1)
+            try:
+                await pool.open()
+                conn = await pool.getconn()
+            except Exception:
+                raise unittest.SkipTest("database is not reachable")
+
+            try:
+                await migrate(conn)
+            finally:
+                await pool.putconn(conn)
+                await pool.closeall()
+
+        asyncio.run(run())
+
+    def test_flush(self):
+        """Test that a flush writes every user's increments and drops those of deleted users"""
+
+        async def run():
+            pool = ConnectionPool(SERVICE_POSTGRES_URI, minconn=0, maxconn=2)
+            await pool.open()
+
+            conn = await pool.getconn()
+            users = [uuid.uuid4() for _ in range(3)]
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(
+                        "INSERT INTO Users (uuid, username, password_hash) VALUES (%s, %s, 'hash')",
+                        [[user, f"agg{user.hex[:8]}"] for user in users[:2]],
+                    )
+                    await cursor.execute(
+                        "INSERT INTO Statistics (user_uuid, xp) VALUES (%s, 100)",
+                        [users[0]],
+                    )
+                await conn.commit()
+
+                aggregator = StatisticsAggregator(ShardSet(pool, []), max_users=100)
+                aggregator.add(users[0], 10, 1, 0)
+                aggregator.add(users[1], 2, 0, 1)
+                aggregator.add(users[0], 10, 1, 0)
+                # the third user does not exist, e.g. because it was deleted
+                aggregator.add(users[2], 10, 1, 0)
+                self.assertEqual(await aggregator.flush(), 3)
+                self.assertEqual(aggregator.stats()["pending_users"], 0)
+
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        "SELECT user_uuid, xp, wins, losses FROM Statistics WHERE user_uuid = ANY(%s)",
+                        [users],
+                    )
+                    rows = {row[0]: row[1:] for row in await cursor.fetchall()}
+                self.assertEqual(rows, {users[0]: (120, 2, 0), users[1]: (2, 0, 1)})
+            finally:
+                await conn.execute("DELETE FROM Users WHERE uuid = ANY(%s)", [users])
+                await conn.commit()
+                await pool.putconn(conn)
+                await pool.closeall()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for password hashes, the replace tests need the database from .env.development
+
+import asyncio
+import unittest
+from uuid import uuid4
+
+from argon2 import PasswordHasher
+
+try:
+    from config import ARGON2_TIME_COST, DATABASE_BACKEND
+    from helpers.auth import Auth
+    from services.database import Database
+    from services.database.errors import DatabaseUnavailableError
+except SystemExit:
+    Auth = None
+
+# a hash from the seed data, which predates argon2
+LEGACY_HASH = "6eea9b7ef19179a06954edd0f6c05ceb"
+
+
+@unittest.skipIf(Auth is None, "needs a configuration (.env.development)")
+class TestPasswordHashes(unittest.TestCase):
+    def test_verify_password(self):
+        """Test that only the right password matches an argon2 hash, and legacy hashes never match"""
+
+        password_hash = Auth.hash_password("password123")
+
+        self.assertTrue(Auth.verify_password("password123", password_hash))
+        self.assertFalse(Auth.verify_password("password124", password_hash))
+        self.assertFalse(Auth.verify_password("password123", LEGACY_HASH))
+        self.assertFalse(Auth.verify_password("password123", ""))
+
+    def test_needs_rehash(self):
+        """Test that legacy hashes and hashes with other argon2 parameters need a rehash"""
+
+        outdated = PasswordHasher(time_cost=ARGON2_TIME_COST + 1).hash("password123")
+
+        self.assertFalse(Auth.needs_rehash(Auth.hash_password("password123")))
+        self.assertTrue(Auth.needs_rehash(outdated))
+        self.assertTrue(Auth.needs_rehash(LEGACY_HASH))
+        self.assertTrue(Auth.is_legacy_hash(LEGACY_HASH))
+        self.assertFalse(Auth.is_legacy_hash(outdated))
+
+
+@unittest.skipIf(
+    Auth is None or DATABASE_BACKEND != "postgres",
+    "needs a configured database (.env.development)",
+)
+class TestReplacePasswordHash(unittest.TestCase):
+    def test_replace_password_hash(self):
+        """Test that a password hash is only replaced while it still matches the expected one"""
+
+        async def run():
+            db = Database()
+            await db.open()
+            user = None
+            try:
+                try:
+                    user = await db.create_user(f"auth{uuid4().hex[:8]}", "old")
+                except DatabaseUnavailableError:
+                    user = None
+                if user is None:
+                    raise unittest.SkipTest("database is not reachable")
+
+                self.assertFalse(
+                    await db.replace_password_hash(user.uuid, "stale", "new")
+                )
+                self.assertTrue(await db.replace_password_hash(user.uuid, "old", "new"))
+                self.assertEqual(
+                    (await db.get_user(uuid=user.uuid))["password_hash"], "new"
+                )
+            finally:
+                if user:
+                    await db.delete_user(uuid=user.uuid)
+                await db.close()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the circuit breaker
+
+import unittest
+
+from helpers.breaker import CircuitBreaker
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_trips_after_consecutive_failures(self):
+        """Test that the breaker opens after enough failures in a row, and a success resets the count"""
+
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=5)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()["trips"], 1)
+        self.assertEqual(breaker.stats()["rejected"], 1)
+
+    def test_probe_after_reset_timeout(self):
+        """Test that one probe is allowed once the reset timeout has passed"""
+
+        timer = FakeTimer()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, timer=timer)
+        breaker.record_failure()
+
+        timer.now = 4.9
+        self.assertFalse(breaker.begin_probe())
+        timer.now = 5
+        self.assertTrue(breaker.begin_probe())
+        self.assertEqual(breaker.state, "half_open")
+        self.assertFalse(breaker.begin_probe())
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        """Test that a failed probe opens the breaker for another reset timeout"""
+
+        timer = FakeTimer()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, timer=timer)
+        breaker.record_failure()
+        timer.now = 5
+        breaker.begin_probe()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, "open")
+        timer.now = 9.9
+        self.assertFalse(breaker.begin_probe())
+        timer.now = 10
+        self.assertTrue(breaker.begin_probe())
+        self.assertEqual(breaker.stats()["trips"], 1)
+        self.assertEqual(breaker.stats()["probes"], 2)
+
+    def test_outcomes_while_open(self):
+        """Test that late results of calls started before the breaker opened do not change its state"""
+
+        timer = FakeTimer()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, timer=timer)
+        breaker.record_failure()
+        timer.now = 3
+        breaker.record_failure()
+        breaker.record_success()
+
+        self.assertEqual(breaker.state, "open")
+        timer.now = 5
+        self.assertTrue(breaker.begin_probe())
+
+
+if __name__ == "__main__":
+    unittest.main()
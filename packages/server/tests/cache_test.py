@@ -0,0 +1,81 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the TTL cache
+
+import unittest
+
+from helpers.cache import TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        """Test that lookups are counted as hits or misses"""
+
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_expiry(self):
+        """Test that entries expire after the ttl"""
+
+        timer = FakeTimer()
+        cache = TTLCache(maxsize=2, ttl=10, timer=timer)
+        cache.set("a", 1)
+
+        timer.now = 9.9
+        self.assertEqual(cache.get("a"), 1)
+        timer.now = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full"""
+
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_invalidation(self):
+        """Test removing entries by key and by value"""
+
+        cache = TTLCache(maxsize=10, ttl=10)
+        cache.set("t1", {"user_uuid": "u1"})
+        cache.set("t2", {"user_uuid": "u1"})
+        cache.set("t3", {"user_uuid": "u2"})
+
+        self.assertTrue(cache.delete("t3"))
+        self.assertFalse(cache.delete("t3"))
+        self.assertEqual(cache.delete_where(lambda s: s["user_uuid"] == "u1"), 2)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["invalidations"], 3)
+
+    def test_disabled(self):
+        """Test that a zero sized cache stores nothing"""
+
+        cache = TTLCache(maxsize=0, ttl=10)
+        cache.set("a", 1)
+
+        self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for request deadlines, the statement tests need the database from .env.development
+
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+
+from psycopg.pq import TransactionStatus
+
+try:
+    from config import SERVICE_POSTGRES_URI
+    from helpers.breaker import CircuitBreaker
+    from services.database.deadlines import current_deadline, use_deadline
+    from services.database.errors import DeadlineExceededError, PoolTimeoutError
+    from services.database.pool import ConnectionPool
+except SystemExit:
+    ConnectionPool = None
+
+
+class FakeConnection:
+    closed = False
+    info = SimpleNamespace(transaction_status=TransactionStatus.IDLE)
+
+    async def close(self):
+        self.closed = True
+
+
+async def connect(dsn):
+    return FakeConnection()
+
+
+@unittest.skipIf(ConnectionPool is None, "needs a configuration (.env.development)")
+class TestUseDeadline(unittest.TestCase):
+    def test_nested_deadlines(self):
+        """Test that a nested block can shorten but not extend the deadline"""
+
+        self.assertIsNone(current_deadline())
+        with use_deadline(10):
+            outer = current_deadline()
+            with use_deadline(60):
+                self.assertIs(current_deadline(), outer)
+            with use_deadline(1):
+                inner = current_deadline()
+                self.assertLess(inner.at, outer.at)
+            self.assertIs(current_deadline(), outer)
+            self.assertFalse(inner.active)
+        self.assertIsNone(current_deadline())
+
+    def test_disabled(self):
+        """Test that a deadline of 0 seconds declares no deadline"""
+
+        with use_deadline(0):
+            self.assertIsNone(current_deadline())
+
+    def test_expired(self):
+        """Test that a deadline only expires while its block is running"""
+
+        with use_deadline(0.01):
+            deadline = current_deadline()
+            self.assertFalse(deadline.expired())
+            time.sleep(0.02)
+            self.assertTrue(deadline.expired())
+        self.assertFalse(deadline.expired())
+
+
+@unittest.skipIf(ConnectionPool is None, "needs a configuration (.env.development)")
+class TestCheckoutDeadlines(unittest.TestCase):
+    def create_pool(self):
+        return ConnectionPool(
+            "fake",
+            minconn=0,
+            maxconn=1,
+            timeout=5,
+            breaker=CircuitBreaker(failure_threshold=1, reset_timeout=5),
+            connect=connect,
+        )
+
+    def test_checkout_waits_until_the_deadline(self):
+        """Test that waiting for a connection ends at the deadline, without counting as a failure"""
+
+        async def run():
+            pool = self.create_pool()
+            await pool.getconn()
+            start = time.monotonic()
+            with use_deadline(0.05):
+                with self.assertRaises(DeadlineExceededError):
+                    await pool.getconn()
+            return time.monotonic() - start, pool.stats()
+
+        elapsed, stats = asyncio.run(run())
+        self.assertLess(elapsed, 1)
+        self.assertEqual(stats["deadline_timeouts"], 1)
+        self.assertEqual(stats["breaker"]["state"], "closed")
+
+    def test_pool_timeout_before_the_deadline(self):
+        """Test that a pool timeout shorter than the deadline still raises PoolTimeoutError"""
+
+        async def run():
+            pool = self.create_pool()
+            await pool.getconn()
+            with use_deadline(5):
+                with self.assertRaises(PoolTimeoutError):
+                    await pool.getconn(timeout=0.05)
+
+        asyncio.run(run())
+
+    def test_passed_deadline(self):
+        """Test that no connection is checked out once the deadline passed"""
+
+        async def run():
+            pool = self.create_pool()
+            with use_deadline(0.01):
+                await asyncio.sleep(0.02)
+                with self.assertRaises(DeadlineExceededError):
+                    await pool.getconn()
+            return pool.stats()
+
+        self.assertEqual(asyncio.run(run())["in_use"], 0)
+
+
+@unittest.skipIf(
+    ConnectionPool is None, "needs a configured database (.env.development)"
+)
+class TestStatementDeadlines(unittest.TestCase):
+    def run_with_pool(self, test):
+        async def run():
+            pool = ConnectionPool(
+                SERVICE_POSTGRES_URI,
+                minconn=0,
+                maxconn=1,
+                breaker=CircuitBreaker(failure_threshold=1, reset_timeout=5),
+            )
+            try:
+                await pool.open()
+                # the pool connects lazily, so check a connection out to see if the database is up
+                await pool.putconn(await pool.getconn())
+            except Exception:
+                await pool.closeall()
+                raise unittest.SkipTest("database is not reachable")
+            try:
+                await test(pool)
+                # the connection is reusable and no deadline leaks into the next checkout
+                conn = await pool.getconn()
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SHOW statement_timeout")
+                    self.assertEqual((await cursor.fetchone())[0], "0")
+                await pool.putconn(conn)
+                self.assertEqual(pool.stats()["breaker"]["state"], "closed")
+            finally:
+                await pool.closeall()
+
+        asyncio.run(run())
+
+    def test_statement_timeout(self):
+        """Test that a statement running past the deadline is stopped by the statement timeout"""
+
+        async def test(pool):
+            with use_deadline(0.2):
+                conn = await pool.getconn()
+                try:
+                    start = time.monotonic()
+                    with self.assertRaises(DeadlineExceededError):
+                        async with conn.cursor() as cursor:
+                            await cursor.execute("SELECT pg_sleep(5)")
+                    self.assertLess(time.monotonic() - start, 1)
+                finally:
+                    await pool.putconn(conn)
+
+        self.run_with_pool(test)
+
+    def test_cancelled_at_the_deadline(self):
+        """Test that the statement running when the deadline passes is cancelled, and later ones refused"""
+
+        async def test(pool):
+            with use_deadline(0.5):
+                conn = await pool.getconn()
+                try:
+                    async with conn.cursor() as cursor:
+                        # each statement is within its timeout, together they are not
+                        await cursor.execute("SELECT pg_sleep(0.3)")
+                        start = time.monotonic()
+                        with self.assertRaises(DeadlineExceededError):
+                            await cursor.execute("SELECT pg_sleep(0.4)")
+                        self.assertLess(time.monotonic() - start, 0.35)
+                        await conn.rollback()
+                        with self.assertRaises(DeadlineExceededError):
+                            await cursor.execute("SELECT 1")
+                finally:
+                    await pool.putconn(conn)
+            self.assertEqual(pool.stats()["deadline_cancels"], 1)
+
+        self.run_with_pool(test)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the in-memory database backend
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+from uuid import uuid4
+
+try:
+    from config import SESSION_MAX_PER_USER
+    from services.database.memory import MemoryDatabase
+except SystemExit:
+    MemoryDatabase = None
+
+
+@unittest.skipIf(MemoryDatabase is None, "needs a configuration (.env.development)")
+class TestMemoryDatabase(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryDatabase()
+        self.db.clear()
+
+    def test_users(self):
+        """Test that usernames stay unique and deleting a user deletes their sessions and statistics"""
+
+        async def run():
+            user = await self.db.create_user("alice", "hash")
+            self.assertIsNone(await self.db.create_user("alice", "other"))
+            other = await self.db.create_user("bob", "hash")
+            self.assertIsNone(await self.db.update_user(other.uuid, username="alice"))
+
+            renamed = await self.db.update_user(user.uuid, username="carol")
+            self.assertEqual(dict(renamed)["username"], "carol")
+            self.assertIsNone(await self.db.get_user(username="alice"))
+            self.assertFalse(
+                await self.db.replace_password_hash(user.uuid, "stale", "new")
+            )
+            self.assertTrue(
+                await self.db.replace_password_hash(user.uuid, "hash", "new")
+            )
+
+            session = await self.db.create_session(user.uuid)
+            await self.db.update_statistics(user.uuid, xp_increment=5)
+            self.assertTrue(await self.db.delete_user(username="carol"))
+            self.assertIsNone(await self.db.get_session(token=str(session["token"])))
+            self.assertEqual(self.db.stats()["statistics"], 0)
+
+        asyncio.run(run())
+
+    def test_sessions(self):
+        """Test that sessions are capped per user and a device only keeps its newest session"""
+
+        async def run():
+            user = await self.db.create_user("alice", "hash")
+            first = await self.db.create_session(user.uuid, device="phone")
+            second = await self.db.create_session(user.uuid, device="phone")
+            self.assertIsNone(await self.db.get_session(token=first["token"]))
+            self.assertIsNotNone(await self.db.get_session(token=second["token"]))
+            self.assertEqual(
+                (await self.db.get_session(user_uuid=user.uuid))["device"], "phone"
+            )
+
+            tokens = [
+                (await self.db.create_session(user.uuid))["token"]
+                for _ in range(SESSION_MAX_PER_USER)
+            ]
+            self.assertIsNone(await self.db.get_session(token=second["token"]))
+            self.assertIsNotNone(await self.db.get_session(token=tokens[0]))
+            self.assertIsNone(await self.db.get_session(token="not-a-token"))
+            self.assertIsNone(await self.db.create_session(uuid4()))
+
+        asyncio.run(run())
+
+    def test_statistics(self):
+        """Test that statistics are created on first read and updated by increments"""
+
+        async def run():
+            user = await self.db.create_user("alice", "hash")
+            self.assertEqual((await self.db.get_statistics(user.uuid)).xp, 0)
+            await self.db.update_statistics(user.uuid, xp_increment=3, wins_increment=1)
+            statistics = await self.db.update_statistics(user.uuid, xp_increment=2)
+            self.assertEqual((statistics.xp, statistics.wins), (5, 1))
+            self.assertIsNone(await self.db.update_statistics(uuid4(), xp_increment=1))
+
+        asyncio.run(run())
+
+    def test_question_tags(self):
+        """Test that batch tag updates report every pair like the Postgres backend"""
+
+        async def run():
+            tag = await self.db.create_tag(
+                SimpleNamespace(name="Science", description="")
+            )
+            question = await self.db.create_question(
+                {"question": "Q?", "difficulty": 1, "options": ["a", "b"], "tags": []}
+            )
+            await self.db.create_question_tag(
+                SimpleNamespace(question_id=question["id"], tag_id=tag.id)
+            )
+
+            pair = {"question_id": question["id"], "tag_id": tag.id}
+            results = await self.db.update_question_tags(
+                [pair, {"question_id": 99, "tag_id": tag.id}],
+                [{"question_id": question["id"], "tag_id": 99}],
+            )
+            self.assertEqual(
+                [result["status"] for result in results],
+                ["already_assigned", "question_not_found", "not_assigned"],
+            )
+
+            # a pair given twice is only assigned or removed once
+            await self.db.update_question_tags([], [pair])
+            results = await self.db.update_question_tags([pair, pair], [])
+            self.assertEqual(
+                [result["status"] for result in results],
+                ["assigned", "already_assigned"],
+            )
+
+            self.assertTrue(await self.db.delete_tag(tag.id))
+            self.assertEqual((await self.db.get_question(question["id"])).tags, [])
+
+        asyncio.run(run())
+
+    def test_import_questions(self):
+        """Test that imports skip existing questions and unknown tags, and report both"""
+
+        async def run():
+            tag = await self.db.create_tag(
+                SimpleNamespace(name="Science", description="")
+            )
+            await self.db.create_question(
+                {"question": "Old?", "difficulty": 1, "options": ["a", "b"]}
+            )
+            result = await self.db.import_questions(
+                [
+                    (1, "Old?", 1, "a", "b", None, None, []),
+                    (2, "New?", 2, "a", "b", "c", None, [tag.id]),
+                    (3, "Bad?", 2, "a", "b", None, None, [42]),
+                ]
+            )
+            self.assertEqual((result["imported"], result["tags"]), (1, 1))
+            self.assertEqual(
+                [error["error"] for error in result["errors"]],
+                ["Question already exists", "Unknown tag id 42"],
+            )
+            questions = [dict(row) async for row in self.db.stream_questions()]
+            self.assertEqual(questions[-1]["options"], ["a", "b", "c"])
+            self.assertEqual(questions[-1]["tags"], [tag.id])
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the schema migrations, the migrate tests need the database from .env.development
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+try:
+    import psycopg
+
+    from config import SERVICE_POSTGRES_URI
+    from services.database.migrations import (
+        current_version,
+        load_migrations,
+        migrate,
+    )
+except SystemExit:
+    load_migrations = None
+
+
+@unittest.skipIf(load_migrations is None, "needs a configuration (.env.development)")
+class TestLoadMigrations(unittest.TestCase):
+    def load(self, *filenames):
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in filenames:
+                with open(os.path.join(directory, filename), "w") as file:
+                    file.write("SELECT 1;")
+            return load_migrations(directory)
+
+    def test_ordered_by_version(self):
+        """Test that migrations are ordered by version, not by file name, and other files are ignored"""
+
+        migrations = self.load(
+            "10_ten.sql",
+            "0002_two.sql",
+            "1_one.sql",
+            "README.md",
+            *[f"{version:04}_filler.sql" for version in range(3, 10)],
+        )
+        self.assertEqual([m.version for m in migrations], list(range(1, 11)))
+        self.assertEqual(
+            (migrations[0].name, migrations[1].name, migrations[-1].name),
+            ("one", "two", "ten"),
+        )
+
+    def test_rejects_duplicate_versions(self):
+        """Test that two migrations with the same version are rejected"""
+
+        with self.assertRaisesRegex(ValueError, "Duplicate migration version 2"):
+            self.load("0001_one.sql", "0002_two.sql", "0002_other.sql")
+
+    def test_rejects_gaps(self):
+        """Test that a missing version is rejected"""
+
+        with self.assertRaisesRegex(ValueError, "Missing migration version 2"):
+            self.load("0001_one.sql", "0003_three.sql")
+        with self.assertRaisesRegex(ValueError, "Missing migration version 1"):
+            self.load("0002_two.sql")
+
+    def test_shipped_migrations(self):
+        """Test that the migrations shipped with the server load"""
+
+        self.assertGreater(len(load_migrations()), 0)
+
+
+@unittest.skipIf(
+    load_migrations is None, "needs a configured database (.env.development)"
+)
+class TestMigrate(unittest.TestCase):
+    def test_idempotent(self):
+        """Test that migrating an up to date database applies nothing"""
+
+        async def run():
+            try:
+                conn = await psycopg.AsyncConnection.connect(SERVICE_POSTGRES_URI)
+            except psycopg.OperationalError:
+                raise unittest.SkipTest("database is not reachable")
+
+            async with conn:
+                await migrate(conn)
+                self.assertEqual(await migrate(conn), [])
+                self.assertEqual(
+                    await current_version(conn), load_migrations()[-1].version
+                )
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
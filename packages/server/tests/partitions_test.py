@@ -0,0 +1,98 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the connection pool partitions
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from psycopg.pq import TransactionStatus
+
+try:
+    from services.database.errors import PoolTimeoutError
+    from services.database.partitions import ADMIN, use_partition
+    from services.database.pool import ConnectionPool
+except SystemExit:
+    ConnectionPool = None
+
+
+class FakeConnection:
+    closed = False
+    info = SimpleNamespace(transaction_status=TransactionStatus.IDLE)
+
+    async def close(self):
+        self.closed = True
+
+
+async def connect(dsn):
+    return FakeConnection()
+
+
+def create_pool():
+    return ConnectionPool(
+        "fake",
+        minconn=0,
+        maxconn=3,
+        timeout=0.05,
+        partitions={ADMIN: 1},
+        connect=connect,
+    )
+
+
+@unittest.skipIf(ConnectionPool is None, "needs a configuration (.env.development)")
+class TestPartitions(unittest.TestCase):
+    def test_limited_partition(self):
+        """Test that a full partition times out while other partitions still get connections"""
+
+        async def run():
+            pool = create_pool()
+            admin = await pool.getconn(partition=ADMIN)
+            with self.assertRaises(PoolTimeoutError):
+                await pool.getconn(partition=ADMIN)
+            await pool.getconn()
+            await pool.getconn()
+
+            await pool.putconn(admin)
+            admin = await pool.getconn(partition=ADMIN)
+            return pool.stats()["partitions"]
+
+        partitions = asyncio.run(run())
+        self.assertEqual(partitions[ADMIN]["in_use"], 1)
+        self.assertEqual(partitions[ADMIN]["checkouts"], 2)
+        self.assertEqual(partitions[ADMIN]["timeouts"], 1)
+        self.assertEqual(partitions[ADMIN]["saturation"], 1)
+        self.assertEqual(partitions["default"]["in_use"], 2)
+        self.assertIsNone(partitions["default"]["limit"])
+
+    def test_waiter_gets_released_slot(self):
+        """Test that a caller waiting on a full partition gets the next connection returned to it"""
+
+        async def run():
+            pool = create_pool()
+            pool.timeout = 1
+            admin = await pool.getconn(partition=ADMIN)
+            waiter = asyncio.create_task(pool.getconn(partition=ADMIN))
+            await asyncio.sleep(0.01)
+            waiting = pool.stats()["partitions"][ADMIN]["waiters"]
+            await pool.putconn(admin)
+            self.assertIs(await waiter, admin)
+            return waiting
+
+        self.assertEqual(asyncio.run(run()), 1)
+
+    def test_declared_partition(self):
+        """Test that calls default to the partition declared for the context, unless they name their own"""
+
+        async def run():
+            pool = create_pool()
+            with use_partition(ADMIN):
+                await pool.getconn()
+                await pool.getconn(partition="gameplay")
+            return pool.stats()["partitions"]
+
+        partitions = asyncio.run(run())
+        self.assertEqual(partitions[ADMIN]["in_use"], 1)
+        self.assertEqual(partitions["gameplay"]["in_use"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Test helpers for asserting how many queries a route may execute
+
+import unittest
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, Optional
+
+if TYPE_CHECKING:
+    from services.database.instrumentation import QueryStats
+
+
+class QueryBudgetTestCase(unittest.TestCase):
+    """
+    A test case with assertions on the number of SQL statements executed, so N+1 regressions fail in tests.
+    """
+
+    def assertQueryBudget(self, response, max_queries: int, msg: Optional[str] = None):
+        """
+        Asserts that the request behind a response executed at most `max_queries` statements.
+
+        Args:
+            response: The response of a request made through the app, e.g. with a `TestClient`.
+            max_queries (int): The maximum number of statements the route may execute.
+            msg (Optional[str]): A message to show on failure, defaults to the route and query count.
+        """
+
+        self.assertIn("X-DB-Queries", response.headers, "Response has no query count")
+        queries = int(response.headers["X-DB-Queries"])
+        if queries > max_queries:
+            request = response.request
+            self.fail(
+                msg
+                or f"{request.method} {request.url.path} executed {queries} queries, budget is {max_queries}"
+            )
+
+    @contextmanager
+    def assertMaxQueries(self, max_queries: int) -> Iterator["QueryStats"]:
+        """
+        Asserts that the database calls made inside the block execute at most `max_queries` statements.
+
+        Args:
+            max_queries (int): The maximum number of statements the block may execute.
+
+        Yields:
+            QueryStats: The counters of the block.
+        """
+
+        # imported lazily, as importing the database service needs a configured environment
+        from services.database.instrumentation import track_queries
+
+        with track_queries() as stats:
+            yield stats
+        if stats.queries > max_queries:
+            self.fail(f"Executed {stats.queries} queries, budget is {max_queries}")
@@ -0,0 +1,96 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Query budgets for the API routes, needs the database from .env.development
+
+import unittest
+import uuid
+
+from query_budget import QueryBudgetTestCase
+
+try:
+    from fastapi.testclient import TestClient
+
+    import main
+    from config import SERVICE_POSTGRES_SHARD_URIS
+except SystemExit:
+    main = None
+
+
+@unittest.skipIf(main is None, "needs a configured database (.env.development)")
+class TestRouteQueryBudgets(QueryBudgetTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(main.app)
+        cls.client.__enter__()
+        cls.username = f"budget{uuid.uuid4().hex[:8]}"
+        response = cls.client.post(
+            "/api/v1/users", json={"username": cls.username, "password": "budget123"}
+        )
+        if response.status_code != 201:
+            cls.client.__exit__(None, None, None)
+            raise unittest.SkipTest("database is not reachable")
+
+        cls.signup = response
+        cls.login = cls.client.post(
+            "/api/v1/sessions", json={"username": cls.username, "password": "budget123"}
+        )
+        token = cls.login.json()["data"]["token"]
+        cls.headers = {"Authorization": f"Bearer {token}"}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.delete("/api/v1/users", headers=cls.headers)
+        cls.client.__exit__(None, None, None)
+
+    def test_signup_and_login(self):
+        """Test that signing up and logging in stay within their query budgets"""
+
+        # with sharding, usernames are also claimed in and resolved through the user directory
+        sharded = int(bool(SERVICE_POSTGRES_SHARD_URIS))
+        self.assertQueryBudget(self.signup, 1 + sharded)
+        self.assertQueryBudget(self.login, 3 + sharded)
+
+    def test_statistics(self):
+        """Test that reading and updating statistics stay within their query budgets"""
+
+        self.assertQueryBudget(
+            self.client.get("/api/v1/statistics", headers=self.headers), 3
+        )
+        self.assertQueryBudget(
+            self.client.patch(
+                "/api/v1/statistics", json={"correct": True}, headers=self.headers
+            ),
+            2,
+        )
+
+    def test_catalog(self):
+        """Test that the catalog routes do not issue a query per row"""
+
+        self.assertQueryBudget(self.client.get("/api/v1/tags", headers=self.headers), 2)
+        self.assertQueryBudget(
+            self.client.get("/api/v1/questions", headers=self.headers), 2
+        )
+        self.assertQueryBudget(
+            self.client.get("/api/v1/questions/1", headers=self.headers), 2
+        )
+        self.assertQueryBudget(
+            self.client.get("/api/v1/question-tags", headers=self.headers), 2
+        )
+
+    def test_question_tag_batch(self):
+        """Test that a batch of tag assignments is a single statement regardless of its size"""
+
+        pairs = [{"question_id": 0, "tag_id": tag_id} for tag_id in range(100)]
+        response = self.client.post(
+            "/api/v1/question-tags/batch",
+            json={"assign": pairs[:50], "remove": pairs[50:]},
+            headers=self.headers,
+        )
+        self.assertQueryBudget(response, 2)
+        self.assertEqual(
+            {result["status"] for result in response.json()["data"]},
+            {"question_not_found", "not_assigned"},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for question bank parsing and validation
+
+import json
+import unittest
+
+from helpers.question_bank import prepare_question_bank, validate_question
+
+
+def jsonl(*rows):
+    return "\n".join(json.dumps(row) for row in rows)
+
+
+class TestValidateQuestion(unittest.TestCase):
+    def test_valid_row(self):
+        """Test that a valid row is normalized and padded to four options"""
+
+        row, error = validate_question(
+            3,
+            {
+                "question": " Capital of France? ",
+                "difficulty": "2",
+                "options": ["Paris", "Rome"],
+                "tags": [2, "1", 2],
+            },
+        )
+        self.assertIsNone(error)
+        self.assertEqual(
+            row, (3, "Capital of France?", 2, "Paris", "Rome", None, None, [1, 2])
+        )
+
+    def test_invalid_rows(self):
+        """Test that rows breaking the Questions table limits are rejected with a reason"""
+
+        base = {"question": "Q?", "difficulty": 1, "options": ["a", "b"]}
+        cases = {
+            "Question": {**base, "question": ""},
+            "Difficulty must be between": {**base, "difficulty": 6},
+            "Difficulty must be an integer": {**base, "difficulty": True},
+            "between 2 and 4 options": {**base, "options": ["a"]},
+            "at most 50 characters": {**base, "options": ["a", "b" * 51]},
+            "unique": {**base, "options": ["a", "a"]},
+            "Tags": {**base, "tags": ["x"]},
+        }
+        for reason, raw in cases.items():
+            row, error = validate_question(1, raw)
+            self.assertIsNone(row)
+            self.assertIn(reason, error)
+
+    def test_invalid_json(self):
+        """Test that a JSONL line which is not JSON is rejected"""
+
+        row, error = validate_question(1, "{not json")
+        self.assertIsNone(row)
+        self.assertTrue(error.startswith("Invalid JSON"))
+
+
+class TestPrepareQuestionBank(unittest.TestCase):
+    def test_csv(self):
+        """Test that CSV banks are parsed with their line numbers and tag lists"""
+
+        content = (
+            "question,difficulty,option1,option2,option3,option4,tags\n"
+            "A?,1,x,y,,,1;3\n"
+            "B?,7,x,y,,,\n"
+        )
+        rows, errors = prepare_question_bank(content, "csv")
+        self.assertEqual(rows, [(2, "A?", 1, "x", "y", None, None, [1, 3])])
+        self.assertEqual(
+            errors, [{"line": 3, "error": "Difficulty must be between 1 and 5"}]
+        )
+
+    def test_csv_missing_columns(self):
+        """Test that a CSV bank without the required columns is refused outright"""
+
+        with self.assertRaises(ValueError):
+            prepare_question_bank("question,difficulty\nA?,1\n", "csv")
+
+    def test_duplicates_keep_first(self):
+        """Test that only the first occurrence of a question is kept"""
+
+        row = {"question": "A?", "difficulty": 1, "options": ["x", "y"]}
+        rows, errors = prepare_question_bank(jsonl(row, row), "jsonl")
+        self.assertEqual([row[0] for row in rows], [1])
+        self.assertEqual(
+            errors, [{"line": 2, "error": "Duplicate of the question on line 1"}]
+        )
+
+    def test_parallel_matches_serial(self):
+        """Test that validating on worker processes gives the same result as inline"""
+
+        content = jsonl(
+            *(
+                {
+                    "question": f"Q{i % 9000}?",
+                    "difficulty": i % 7,
+                    "options": ["x", "y"],
+                }
+                for i in range(12000)
+            )
+        )
+        self.assertEqual(
+            prepare_question_bank(content, "jsonl", workers=3),
+            prepare_question_bank(content, "jsonl", workers=1),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for batched question tag updates, needs the database from .env.development
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+from uuid import uuid4
+
+try:
+    from config import DATABASE_BACKEND
+    from services.database import Database
+    from services.database.errors import DatabaseUnavailableError
+except SystemExit:
+    Database = None
+
+
+@unittest.skipIf(
+    Database is None or DATABASE_BACKEND != "postgres",
+    "needs a configured database (.env.development)",
+)
+class TestUpdateQuestionTags(unittest.TestCase):
+    def test_duplicate_pairs(self):
+        """Test that a pair given twice is only reported as assigned or removed once"""
+
+        async def run():
+            db = Database()
+            await db.open()
+            tag = question = None
+            try:
+                try:
+                    tag = await db.create_tag(
+                        SimpleNamespace(name=f"tag{uuid4().hex[:8]}", description="")
+                    )
+                except DatabaseUnavailableError:
+                    tag = None
+                if tag is None:
+                    raise unittest.SkipTest("database is not reachable")
+                question = await db.create_question(
+                    {
+                        "question": "Q?",
+                        "difficulty": 1,
+                        "options": ["a", "b"],
+                        "tags": [],
+                    }
+                )
+
+                pair = {"question_id": question["id"], "tag_id": tag.id}
+                results = await db.update_question_tags([pair, pair], [])
+                self.assertEqual(
+                    [result["status"] for result in results],
+                    ["assigned", "already_assigned"],
+                )
+
+                results = await db.update_question_tags([], [pair, pair])
+                self.assertEqual(
+                    [result["status"] for result in results],
+                    ["removed", "not_assigned"],
+                )
+            finally:
+                if question:
+                    await db.delete_question(question["id"])
+                if tag:
+                    await db.delete_tag(tag.id)
+                await db.close()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
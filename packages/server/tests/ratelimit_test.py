@@ -0,0 +1,67 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the token bucket rate limiter
+
+import unittest
+
+from helpers.ratelimit import TokenBucketLimiter
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucketLimiter(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.limiter = TokenBucketLimiter(rate=0.5, burst=2, timer=self.timer)
+
+    def test_burst_then_reject(self):
+        """Test that a key is admitted up to its burst, then rejected"""
+
+        self.assertTrue(self.limiter.allow("alice"))
+        self.assertTrue(self.limiter.allow("alice"))
+        self.assertFalse(self.limiter.allow("alice"))
+        self.assertEqual(self.limiter.retry_after("alice"), 2)
+        self.assertEqual(self.limiter.stats()["rejected"], 1)
+
+    def test_refill(self):
+        """Test that tokens refill over time, up to the burst"""
+
+        self.limiter.allow("alice")
+        self.limiter.allow("alice")
+
+        self.timer.now = 2
+        self.assertTrue(self.limiter.allow("alice"))
+        self.assertFalse(self.limiter.allow("alice"))
+
+        self.timer.now = 100
+        self.assertTrue(self.limiter.allow("alice"))
+        self.assertTrue(self.limiter.allow("alice"))
+        self.assertFalse(self.limiter.allow("alice"))
+
+    def test_keys_are_independent(self):
+        """Test that each key has its own bucket"""
+
+        self.limiter.allow("alice")
+        self.limiter.allow("alice")
+
+        self.assertFalse(self.limiter.allow("alice"))
+        self.assertTrue(self.limiter.allow("bob"))
+
+    def test_max_keys(self):
+        """Test that only the most recently used buckets are kept"""
+
+        limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2, timer=self.timer)
+        for key in ("a", "b", "c"):
+            limiter.allow(key)
+
+        self.assertEqual(limiter.stats()["keys"], 2)
+        self.assertTrue(limiter.allow("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for routing reads to read replicas
+
+import asyncio
+import unittest
+
+try:
+    from services.database.replicas import ReplicaSet
+except SystemExit:
+    ReplicaSet = None
+
+
+class FakeCursor:
+    def __init__(self, lag):
+        self.lag = lag
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        if isinstance(self.lag, Exception):
+            raise self.lag
+
+    async def fetchone(self):
+        return [self.lag]
+
+
+class FakeConnection:
+    def __init__(self, lag):
+        self.lag = lag
+
+    def cursor(self):
+        return FakeCursor(self.lag)
+
+
+class FakePool:
+    def __init__(self, name, lag=0.0, transaction=False):
+        self.name = name
+        self.lag = lag
+        self.transaction = transaction
+        self.checked_out = 0
+
+    def in_transaction(self):
+        return self.transaction
+
+    async def getconn(self, timeout=None, partition=None):
+        if isinstance(self.lag, ConnectionError):
+            raise self.lag
+        self.checked_out += 1
+        return FakeConnection(self.lag)
+
+    async def putconn(self, conn):
+        self.checked_out -= 1
+
+    def stats(self):
+        return {"checked_out": self.checked_out}
+
+
+@unittest.skipIf(ReplicaSet is None, "needs a configuration (.env.development)")
+class TestReplicaSet(unittest.TestCase):
+    def setUp(self):
+        self.primary = FakePool("primary")
+        self.replicas = [FakePool("a"), FakePool("b"), FakePool("c")]
+        self.set = ReplicaSet(self.replicas, max_lag=5)
+
+    def reads(self, count, **kwargs):
+        return [
+            self.set.pool_for_read(self.primary, **kwargs).name for _ in range(count)
+        ]
+
+    def test_round_robin(self):
+        """Test that reads take turns over the healthy replicas"""
+
+        asyncio.run(self.set.check_lag())
+        self.assertEqual(self.reads(6), ["a", "b", "c", "a", "b", "c"])
+
+    def test_skips_unhealthy_replicas(self):
+        """Test that replicas which lag too much or fail the check are skipped"""
+
+        self.replicas[0].lag = 10.0
+        self.replicas[2].lag = ConnectionError("replica is down")
+        asyncio.run(self.set.check_lag())
+
+        self.assertEqual(self.reads(3), ["b", "b", "b"])
+        replicas = self.set.stats()["replicas"]
+        self.assertEqual(
+            [(replica["lag"], replica["healthy"]) for replica in replicas],
+            [(10.0, False), (0.0, True), (None, False)],
+        )
+
+        # recovers on the next check
+        self.replicas[0].lag = 1.0
+        asyncio.run(self.set.check_lag())
+        self.assertEqual(sorted(self.reads(2)), ["a", "b"])
+
+    def test_check_errors_release_the_connection(self):
+        """Test that a failing lag query marks the replica unhealthy and returns its connection"""
+
+        asyncio.run(self.set.check_lag())
+        self.replicas[1].lag = RuntimeError("query failed")
+        asyncio.run(self.set.check_lag())
+
+        self.assertEqual(self.replicas[1].checked_out, 0)
+        self.assertFalse(self.set.stats()["replicas"][1]["healthy"])
+
+    def test_primary_reads(self):
+        """Test the reads which stay on the primary"""
+
+        # before the first check no replica is known to be caught up
+        self.assertEqual(self.reads(1), ["primary"])
+        self.assertEqual(self.set.stats()["fallbacks"], 1)
+
+        asyncio.run(self.set.check_lag())
+        self.assertEqual(self.reads(2, force_primary=True), ["primary", "primary"])
+
+        # a transaction holding a primary connection reads its own writes
+        self.primary.transaction = True
+        self.assertEqual(self.reads(2), ["primary", "primary"])
+
+        stats = self.set.stats()
+        self.assertEqual((stats["primary_reads"], stats["replica_reads"]), (5, 0))
+
+    def test_without_replicas(self):
+        """Test that every read goes to the primary when no replica is configured"""
+
+        replicas = ReplicaSet([], max_lag=5)
+        asyncio.run(replicas.check_lag())
+        self.assertIs(replicas.pool_for_read(self.primary), self.primary)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the records returned by the database
+
+import unittest
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    from services.database.rows import Record, record_maker
+except SystemExit:
+    record_maker = None
+
+
+class TagData(BaseModel):
+    id: int
+    name: str
+
+
+@unittest.skipIf(record_maker is None, "needs a configuration (.env.development)")
+class TestRecords(unittest.TestCase):
+    def test_mapping(self):
+        """Test that a record reads like the dictionary of its row"""
+
+        record = record_maker(("id", "name"))([1, "math"])
+
+        self.assertIsInstance(record, Record)
+        self.assertEqual(record.name, "math")
+        self.assertEqual(record["id"], 1)
+        self.assertEqual(dict(record), {"id": 1, "name": "math"})
+        self.assertEqual({**record}, {"id": 1, "name": "math"})
+        self.assertEqual(record.get("missing", 2), 2)
+        with self.assertRaises(KeyError):
+            record["missing"]
+        with self.assertRaises(AttributeError):
+            record.extra = 1
+
+    def test_types_are_shared(self):
+        """Test that queries of the same shape share a record type"""
+
+        make = record_maker(("id", "name"))
+        self.assertIs(make, record_maker(("id", "name")))
+        self.assertIs(type(make([1, "a"])), type(make([2, "b"])))
+        self.assertIsNot(type(make([1, "a"])), type(record_maker(("id",))([1])))
+
+    def test_unusable_names_fall_back_to_dict(self):
+        """Test that columns which cannot be attributes still produce a mapping"""
+
+        for fields in (("?column?",), ("id", "id"), ("keys",), ("class",)):
+            row = record_maker(fields)([1] * len(fields))
+            self.assertIsInstance(row, dict)
+
+    def test_response_path(self):
+        """Test that records are serialized and validated without converting them first"""
+
+        record = record_maker(("id", "name", "description"))([1, "é", None])
+
+        self.assertEqual(
+            to_json(record), '{"id":1,"name":"é","description":null}'.encode()
+        )
+        self.assertEqual(TagData.model_validate(record), TagData(id=1, name="é"))
+
+
+if __name__ == "__main__":
+    unittest.main()
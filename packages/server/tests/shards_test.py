@@ -0,0 +1,162 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for sharding per-user data, the integration tests need two databases in SERVICE_POSTGRES_SHARD_URIS
+
+import unittest
+import uuid
+from collections import Counter
+
+try:
+    from services.database.shards import ShardSet, shard_index
+except SystemExit:
+    shard_index = None
+
+try:
+    import psycopg
+    from fastapi.testclient import TestClient
+
+    import main
+    from config import SERVICE_POSTGRES_SHARD_URIS, SERVICE_POSTGRES_URI
+    from services.database import Database
+except SystemExit:
+    main = None
+    SERVICE_POSTGRES_SHARD_URIS = []
+
+KEYS = [uuid.UUID(int=i * 7919 + 1) for i in range(4000)]
+
+
+@unittest.skipIf(shard_index is None, "needs a configuration (.env.development)")
+class TestShardIndex(unittest.TestCase):
+    def test_in_range_and_stable(self):
+        """Test that a key always maps to the same shard, within the number of shards"""
+
+        for key in KEYS[:100]:
+            index = shard_index(key, 5)
+            self.assertIn(index, range(5))
+            self.assertEqual(index, shard_index(key, 5))
+        self.assertEqual({shard_index(key, 1) for key in KEYS}, {0})
+
+    def test_even_spread(self):
+        """Test that sequential keys spread evenly over the shards"""
+
+        counts = Counter(shard_index(key, 4) for key in KEYS)
+        for count in counts.values():
+            self.assertAlmostEqual(count / len(KEYS), 0.25, delta=0.05)
+
+    def test_adding_a_shard_moves_keys_to_it_only(self):
+        """Test that adding a shard only moves keys onto the new shard, about 1 in N of them"""
+
+        moved = 0
+        for key in KEYS:
+            before, after = shard_index(key, 3), shard_index(key, 4)
+            if before != after:
+                self.assertEqual(after, 3)
+                moved += 1
+        self.assertAlmostEqual(moved / len(KEYS), 0.25, delta=0.05)
+
+    def test_tokens_follow_their_user(self):
+        """Test that session tokens are drawn on the shard of their user"""
+
+        shards = ShardSet(primary="primary", pools=["a", "b", "c"])
+        for user in KEYS[:50]:
+            token = shards.new_token(user)
+            self.assertIs(shards.pool_for(token), shards.pool_for(user))
+
+    def test_unsharded(self):
+        """Test that everything routes to the primary without shards"""
+
+        shards = ShardSet(primary="primary", pools=[])
+        self.assertFalse(shards.enabled)
+        self.assertEqual(shards.pool_for(KEYS[0]), "primary")
+        self.assertEqual(shards.pool_for(None), "primary")
+
+
+@unittest.skipIf(
+    len(SERVICE_POSTGRES_SHARD_URIS) < 2,
+    "needs two databases in SERVICE_POSTGRES_SHARD_URIS (see docker-compose.shards.yml)",
+)
+class TestShardedUsers(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(main.app)
+        cls.client.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.__exit__(None, None, None)
+
+    def count(self, uri, query, params):
+        with psycopg.connect(uri) as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+    def test_user_lives_on_its_shard(self):
+        """Test that a user's rows are written to their shard only, and found from username and token"""
+
+        username = f"shard{uuid.uuid4().hex[:8]}"
+        response = self.client.post(
+            "/api/v1/users", json={"username": username, "password": "shard123"}
+        )
+        self.assertEqual(response.status_code, 201)
+        user = uuid.UUID(response.json()["data"]["uuid"])
+        home = shard_index(user, len(SERVICE_POSTGRES_SHARD_URIS))
+
+        response = self.client.post(
+            "/api/v1/sessions", json={"username": username, "password": "shard123"}
+        )
+        self.assertEqual(response.status_code, 201)
+        headers = {"Authorization": f"Bearer {response.json()['data']['token']}"}
+        response = self.client.patch(
+            "/api/v1/statistics", json={"correct": True}, headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+        for index, uri in enumerate(SERVICE_POSTGRES_SHARD_URIS):
+            expected = int(index == home)
+            for table in ("users WHERE uuid", "statistics WHERE user_uuid"):
+                self.assertEqual(
+                    self.count(uri, f"SELECT COUNT(*) FROM {table} = %s", [user]),
+                    expected,
+                )
+            self.assertEqual(
+                self.count(
+                    uri, "SELECT COUNT(*) FROM sessions WHERE user_uuid = %s", [user]
+                ),
+                expected,
+            )
+
+        directory = "SELECT COUNT(*) FROM User_Directory WHERE user_uuid = %s"
+        self.assertEqual(self.count(SERVICE_POSTGRES_URI, directory, [user]), 1)
+
+        response = self.client.delete("/api/v1/users", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.count(SERVICE_POSTGRES_URI, directory, [user]), 0)
+
+    def test_statistics_in_one_transaction(self):
+        """Test that a route wrapped in a transaction runs on the caller's shard with one checkout"""
+
+        db = Database()
+        pools = {id(pool): pool for pool in [db.connectionPool, *db.shards.pools]}
+
+        def checkouts():
+            return sum(pool.stats()["checkouts"] for pool in pools.values())
+
+        for _ in range(4):
+            username = f"shard{uuid.uuid4().hex[:8]}"
+            self.client.post(
+                "/api/v1/users", json={"username": username, "password": "shard123"}
+            )
+            response = self.client.post(
+                "/api/v1/sessions", json={"username": username, "password": "shard123"}
+            )
+            headers = {"Authorization": f"Bearer {response.json()['data']['token']}"}
+
+            before = checkouts()
+            response = self.client.patch(
+                "/api/v1/statistics", json={"correct": True}, headers=headers
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(checkouts() - before, 1)
+            self.client.delete("/api/v1/users", headers=headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
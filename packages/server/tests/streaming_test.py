@@ -0,0 +1,61 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the streaming JSON and NDJSON responses
+
+import asyncio
+import json
+import unittest
+
+from helpers.streaming import stream_json, stream_ndjson
+
+
+async def items(*values, fail=False):
+    if fail:
+        raise RuntimeError("query failed")
+    for value in values:
+        yield value
+
+
+async def read(response):
+    return b"".join([chunk async for chunk in response.body_iterator]).decode()
+
+
+class TestStreaming(unittest.TestCase):
+    def test_json_matches_buffered_body(self):
+        """Test that a streamed JSON array has the same shape as the buffered response"""
+
+        async def run():
+            return await read(await stream_json(items({"id": 1}, {"id": 2})))
+
+        body = json.loads(asyncio.run(run()))
+        self.assertEqual(
+            body, {"code": 200, "message": "Ok", "data": [{"id": 1}, {"id": 2}]}
+        )
+
+    def test_json_empty(self):
+        """Test that streaming no items yields an empty data array"""
+
+        async def run():
+            return await read(await stream_json(items()))
+
+        self.assertEqual(json.loads(asyncio.run(run()))["data"], [])
+
+    def test_ndjson(self):
+        """Test that every item is written on its own line"""
+
+        async def run():
+            response = await stream_ndjson(items({"a": "é"}, {"b": 2}), "x.jsonl")
+            return response, await read(response)
+
+        response, body = asyncio.run(run())
+        self.assertEqual(body, '{"a":"é"}\n{"b":2}\n')
+        self.assertIn("x.jsonl", response.headers["content-disposition"])
+
+    def test_error_before_first_item(self):
+        """Test that a failure to query raises before the response starts"""
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(stream_json(items(fail=True)))
+
+
+if __name__ == "__main__":
+    unittest.main()
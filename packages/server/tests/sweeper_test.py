@@ -0,0 +1,148 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for the expired session sweeper, the deletion tests need the database from .env.development
+
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from uuid import uuid4
+
+try:
+    from config import DATABASE_BACKEND, SESSION_LIFETIME
+    from services.database import Database
+    from services.database.errors import DatabaseUnavailableError
+    from services.database.memory import MemoryDatabase
+    from services.database.sweeper import SessionSweeper
+except SystemExit:
+    MemoryDatabase = SessionSweeper = None
+
+
+class FakeSessions:
+    def __init__(self, expired: int):
+        self.expired = expired
+        self.limits = []
+
+    async def delete_expired_sessions(self, limit: int) -> int:
+        self.limits.append(limit)
+        deleted = min(limit, self.expired)
+        self.expired -= deleted
+        return deleted
+
+
+@unittest.skipIf(SessionSweeper is None, "needs a configuration (.env.development)")
+class TestSessionSweeper(unittest.TestCase):
+    def test_stops_on_a_short_batch(self):
+        """Test that a sweep deletes batches until one comes back short"""
+
+        db = FakeSessions(expired=25)
+        sweeper = SessionSweeper(db, batch_size=10)
+
+        self.assertEqual(asyncio.run(sweeper.sweep()), 25)
+        self.assertEqual(db.limits, [10, 10, 10])
+        self.assertEqual(asyncio.run(sweeper.sweep()), 0)
+
+        stats = sweeper.stats()
+        self.assertEqual(
+            (stats["sweeps"], stats["reaped_total"], stats["last_reaped"]), (2, 25, 0)
+        )
+
+    def test_stops_after_max_batches(self):
+        """Test that a sweep deletes at most `max_batches` batches, leaving the rest for the next one"""
+
+        db = FakeSessions(expired=100)
+        sweeper = SessionSweeper(db, batch_size=10, max_batches=3)
+
+        self.assertEqual(asyncio.run(sweeper.sweep()), 30)
+        self.assertEqual(db.expired, 70)
+
+
+@unittest.skipIf(MemoryDatabase is None, "needs a configuration (.env.development)")
+class TestMemorySessionSweeper(unittest.TestCase):
+    def test_sweep(self):
+        """Test that sweeping deletes expired sessions only"""
+
+        db = MemoryDatabase()
+        db.clear()
+        sweeper = SessionSweeper(db, batch_size=2)
+
+        async def run():
+            sessions = []
+            for i in range(5):
+                user = await db.create_user(f"sweep{i}", "hash")
+                sessions.append(await db.create_session(user.uuid))
+
+            self.assertEqual(await sweeper.sweep(), 0)
+
+            later = datetime.now() + timedelta(seconds=SESSION_LIFETIME + 1)
+            with mock.patch("services.database.memory.datetime") as clock:
+                clock.now.return_value = later
+                self.assertEqual(await sweeper.sweep(), 5)
+
+            for session in sessions:
+                self.assertIsNone(await db.get_session(token=str(session["token"])))
+
+        asyncio.run(run())
+
+
+@unittest.skipIf(
+    MemoryDatabase is None or DATABASE_BACKEND != "postgres",
+    "needs a configured database (.env.development)",
+)
+class TestDeleteExpiredSessions(unittest.TestCase):
+    def test_every_shard(self):
+        """Test that expired sessions are deleted from every shard, and live ones are kept"""
+
+        async def age(pool, users):
+            conn = await pool.getconn()
+            try:
+                await conn.execute(
+                    """
+                    UPDATE sessions
+                    SET created_at = created_at - make_interval(secs => %s)
+                    WHERE user_uuid = ANY(%s)
+                    """,
+                    [SESSION_LIFETIME + 1, users],
+                )
+                await conn.commit()
+            finally:
+                await pool.putconn(conn)
+
+        async def run():
+            db = Database()
+            await db.open()
+            users = {}
+            try:
+                # one expired and one live user on every shard
+                pools = db.shards.pools or [db.connectionPool]
+                while any(len(users.get(pool, [])) < 2 for pool in pools):
+                    try:
+                        user = await db.create_user(f"sweep{uuid4().hex[:8]}", "hash")
+                    except DatabaseUnavailableError:
+                        user = None
+                    if user is None:
+                        raise unittest.SkipTest("database is not reachable")
+                    users.setdefault(db.shards.pool_for(user.uuid), []).append(
+                        user.uuid
+                    )
+                    await db.create_session(user.uuid)
+
+                for pool in pools:
+                    await age(pool, users[pool][:1])
+                self.assertGreaterEqual(
+                    await db.delete_expired_sessions(1000), len(pools)
+                )
+
+                for pool, uuids in users.items():
+                    self.assertIsNone(await db.get_session(user_uuid=uuids[0]))
+                    self.assertIsNotNone(await db.get_session(user_uuid=uuids[1]))
+            finally:
+                for uuids in users.values():
+                    for user in uuids:
+                        await db.delete_user(uuid=user)
+                await db.close()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+# @authors: adibarra (Alec Ibarra)
+# @description: Testcases for signed session tokens, the revocation tests need the database from .env.development
+
+import asyncio
+import unittest
+from datetime import datetime
+from uuid import uuid4
+
+from helpers.tokens import RevocationList, SessionTokens
+
+try:
+    from config import DATABASE_BACKEND, SESSION_LIFETIME, SESSION_TOKEN_MODE
+    from services.database import Database
+    from services.database.errors import DatabaseUnavailableError
+except SystemExit:
+    Database = None
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionTokens(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.tokens = SessionTokens("secret", lifetime=60, timer=self.timer)
+        self.created_at = datetime(2024, 11, 20, 12, 30, 15, 123456)
+        self.sid, self.user = uuid4(), uuid4()
+
+    def test_round_trip(self):
+        """Test that an issued token verifies to the same claims"""
+
+        token = self.tokens.issue(self.sid, self.user, self.created_at)
+        claims = self.tokens.verify(token)
+
+        self.assertTrue(SessionTokens.is_signed(token))
+        self.assertFalse(SessionTokens.is_signed(self.sid))
+        self.assertEqual(claims["session_id"], self.sid)
+        self.assertEqual(claims["user_uuid"], self.user)
+        self.assertEqual(claims["created_at"], self.created_at)
+
+    def test_rejects_tampering(self):
+        """Test that modified tokens or other secrets are rejected"""
+
+        token = self.tokens.issue(self.sid, self.user, self.created_at)
+        payload, signature = token.split(".")
+        forged = self.tokens.issue(self.sid, uuid4(), self.created_at).split(".")[0]
+
+        self.assertIsNone(self.tokens.verify(f"{forged}.{signature}"))
+        self.assertIsNone(self.tokens.verify(f"{payload}."))
+        self.assertIsNone(self.tokens.verify("not-a-token"))
+        self.assertIsNone(
+            SessionTokens("other", lifetime=60, timer=self.timer).verify(token)
+        )
+
+    def test_expiry(self):
+        """Test that tokens stop verifying after their lifetime"""
+
+        token = self.tokens.issue(self.sid, self.user, self.created_at)
+
+        self.timer.now += 59
+        self.assertIsNotNone(self.tokens.verify(token))
+        self.timer.now += 1
+        self.assertIsNone(self.tokens.verify(token))
+
+
+class TestRevocationList(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.tokens = SessionTokens("secret", lifetime=60, timer=self.timer)
+        self.revocations = RevocationList(lifetime=60, timer=self.timer)
+        created_at = datetime(2024, 11, 20)
+        self.u1, self.u2 = uuid4(), uuid4()
+        self.a = self.tokens.verify(self.tokens.issue(uuid4(), self.u1, created_at))
+        self.b = self.tokens.verify(self.tokens.issue(uuid4(), self.u1, created_at))
+        self.c = self.tokens.verify(self.tokens.issue(uuid4(), self.u2, created_at))
+
+    def test_revoke_session_and_user(self):
+        """Test revoking a single session and every session of a user"""
+
+        for claims in (self.a, self.b, self.c):
+            self.revocations.observe(claims)
+
+        self.revocations.revoke(session_id=self.c["session_id"])
+        self.assertTrue(self.revocations.is_revoked(self.c))
+        self.assertFalse(self.revocations.is_revoked(self.a))
+
+        self.revocations.revoke(user_uuid=self.u1)
+        self.assertTrue(self.revocations.is_revoked(self.a))
+        self.assertTrue(self.revocations.is_revoked(self.b))
+
+    def test_refresh(self):
+        """Test that refreshing revokes seen sessions missing from the database"""
+
+        for claims in (self.a, self.b, self.c):
+            self.revocations.observe(claims)
+
+        self.assertEqual(
+            self.revocations.refresh(
+                lambda ids: {self.a["session_id"], self.c["session_id"]}
+            ),
+            1,
+        )
+        self.assertTrue(self.revocations.is_revoked(self.b))
+        self.assertFalse(self.revocations.is_revoked(self.a))
+
+    def test_refresh_forgets_expired(self):
+        """Test that expired tokens are dropped from the list"""
+
+        self.revocations.observe(self.a)
+        self.revocations.revoke(session_id=self.b["session_id"])
+
+        self.timer.now += 60
+        self.revocations.refresh(lambda ids: set(ids))
+        self.assertEqual(self.revocations.stats()["tracked"], 0)
+        self.assertEqual(self.revocations.stats()["revoked"], 0)
+
+    def test_cutoff_rejects_unseen_tokens(self):
+        """Test that revoking a user with a cutoff rejects tokens never seen, up to the cutoff"""
+
+        later = self.tokens.verify(
+            self.tokens.issue(uuid4(), self.u1, datetime(2024, 11, 21))
+        )
+
+        self.revocations.revoke(user_uuid=self.u1, revoked_at=datetime(2024, 11, 20))
+        self.assertTrue(self.revocations.is_revoked(self.a))
+        self.assertTrue(self.revocations.is_revoked(self.b))
+        self.assertFalse(self.revocations.is_revoked(self.c))
+        self.assertFalse(self.revocations.is_revoked(later))
+
+    def test_apply_cutoffs(self):
+        """Test loading cutoffs recorded by other processes, and forgetting them once expired"""
+
+        self.assertIsNone(self.revocations.cutoffs_since())
+        self.assertEqual(
+            self.revocations.apply_cutoffs(
+                [(self.u1, datetime(2024, 11, 20)), (self.u2, datetime(2024, 11, 19))]
+            ),
+            2,
+        )
+        self.assertTrue(self.revocations.is_revoked(self.a))
+        self.assertFalse(self.revocations.is_revoked(self.c))
+        self.assertLess(self.revocations.cutoffs_since(), datetime(2024, 11, 20))
+
+        # loading the same cutoffs again changes nothing
+        self.assertEqual(
+            self.revocations.apply_cutoffs([(self.u1, datetime(2024, 11, 20))]), 0
+        )
+
+        self.timer.now += 60
+        self.revocations.refresh(lambda ids: set(ids))
+        self.assertEqual(self.revocations.stats()["cutoffs"], 0)
+        self.assertFalse(self.revocations.is_revoked(self.a))
+
+
+@unittest.skipIf(
+    Database is None
+    or DATABASE_BACKEND != "postgres"
+    or SESSION_TOKEN_MODE != "signed",
+    "needs a configured database with signed tokens (.env.development)",
+)
+class TestSignedSessionRevocation(unittest.TestCase):
+    def test_delete_user_revokes_unused_tokens(self):
+        """Test that deleting a user revokes their tokens, here and in processes which never saw them"""
+
+        async def run():
+            db = Database()
+            revocations = db.sessionRevocations
+            await db.open()
+            try:
+                try:
+                    user = await db.create_user(f"rev{uuid4().hex[:8]}", "hash")
+                except DatabaseUnavailableError:
+                    user = None
+                if user is None:
+                    raise unittest.SkipTest("database is not reachable")
+
+                token = (await db.create_session(user.uuid))["token"]
+                self.assertTrue(await db.delete_user(uuid=user.uuid))
+                self.assertIsNone(await db.get_session(token=token))
+
+                # another process, which never saw the token and loads the revocation from the database
+                db.sessionRevocations = RevocationList(SESSION_LIFETIME)
+                await db.refresh_revocations()
+                self.assertIsNone(await db.get_session(token=token))
+            finally:
+                db.sessionRevocations = revocations
+                await db.close()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()